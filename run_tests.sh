@@ -6,6 +6,17 @@ mkdir -p ./build
 rm -r ./build
 
 export VIUACT_DEBUG=true
+export VIUACT_CHECKS=on
+
+# Incremental lexing must give the same tokens as lexing from scratch.
+PYTHONPATH=. python3 ./tools/check_relex.py
+
+# Both parsers must accept the same code, and report the same errors.
+PYTHONPATH=. python3 ./tools/check_parser.py
+
+# Forms must survive a round trip through their binary format.
+PYTHONPATH=. python3 ./tools/check_forms.py
+
 find ./tests -name '*.vt' |
     sort |
     python3 ./test-suite.py
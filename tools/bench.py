@@ -0,0 +1,55 @@
+# Helpers shared by benchmarks in this directory (tools/bench_*.py). A
+# benchmark only provides its workload, and this module takes care of parsing
+# common options and timing.
+#
+# Benchmarks are run as scripts, so this module is imported as "bench" (the
+# directory of a script is on the module search path).
+
+import time
+
+import viuact.core
+import viuact.lexer
+import viuact.parser
+
+
+def parse_repeat(args, repeat):
+    # Return (repeat, remaining args) for a command line that may start with
+    # "--repeat N".
+    if args and args[0] == '--repeat':
+        return (int(args[1]), args[2:],)
+    return (repeat, args,)
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start)
+        best = (elapsed if best is None else min(best, elapsed))
+    return best
+
+def compile_source(source_text):
+    # Compile a module from source text, up to (and including) emission of
+    # its functions.
+    forms = viuact.parser.parse(viuact.lexer.lex(source_text))
+    mod = viuact.core.cc_impl_prepare_module(
+        viuact.core.EXEC_MODULE, '<bench>', forms)
+    return viuact.core.cc_impl_emit_functions(mod, forms)
+
+def run_sizes(args, size_name, time_name, default_sizes, workload):
+    # Time a workload for every size given on the command line (or for the
+    # default sizes) and print a table of results. The workload is called with
+    # the size and returns the function to time, so that preparing inputs is
+    # not measured.
+    repeat, args = parse_repeat(args, 3)
+
+    print('{:>10} {:>12}'.format(size_name, time_name))
+    for size in (list(map(int, args)) or default_sizes):
+        fn = workload(size)
+        try:
+            elapsed = '{:.2f}'.format(1000 * best_of(repeat, fn))
+        except RecursionError:
+            elapsed = 'too deep'
+        print('{:>10} {:>12}'.format(size, elapsed))
+
+    return 0
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Compare time needed to compile a synthetic module with runtime type
+# annotations checked and unchecked (see viuact.util.type_annotations).
+#
+# The mode is selected when the compiler is imported so every measurement runs
+# in a child process, with VIUACT_CHECKS set to "on" or "off". Functions of the
+# module bind, print, compare, and move values around so that many slots and
+# instructions are constructed, and every one of them goes through the
+# predicates.
+#
+# Usage: PYTHONPATH=. python3 tools/bench_checks.py [--repeat N] [FUNCTIONS...]
+
+import os
+import subprocess
+import sys
+
+import bench
+
+
+def make_source(functions):
+    lines = []
+    for i in range(functions):
+        lines.append('(val f{} (i64 bool) -> i64)'.format(i))
+        lines.append(('(let f{} (x b) {{ (let y (+ x {})) (print y)'
+            ' (let z (if b y {})) (print z) z }})').format(i, i, i))
+    lines.append('(val main () -> i64)')
+    lines.append('(let main () (f0 0 true))')
+    return '\n'.join(lines)
+
+def measure(checks, functions, repeat):
+    # Returns the best time in seconds, as measured by a child process.
+    env = dict(os.environ)
+    env['VIUACT_CHECKS'] = checks
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', str(functions), str(repeat)],
+        env = env,
+        stdout = subprocess.PIPE,
+        check = True,
+        universal_newlines = True,
+    )
+    return float(result.stdout)
+
+def main(executable_name, args):
+    if args and args[0] == '--child':
+        source_text = make_source(int(args[1]))
+        print(bench.best_of(
+            int(args[2]),
+            lambda: bench.compile_source(source_text),
+        ))
+        return 0
+
+    repeat, args = bench.parse_repeat(args, 3)
+
+    print('{:>10} {:>14} {:>16} {:>8}'.format(
+        'functions', 'checked [ms]', 'unchecked [ms]', 'speedup'))
+    for functions in (list(map(int, args)) or [250, 500, 1000, 2000]):
+        checked = measure('on', functions, repeat)
+        unchecked = measure('off', functions, repeat)
+        print('{:>10} {:>14.2f} {:>16.2f} {:>7.2f}x'.format(
+            functions,
+            1000 * checked,
+            1000 * unchecked,
+            checked / unchecked,
+        ))
+
+    return 0
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+# Measure time needed to compile synthetic functions with expression-heavy
+# bodies: operator calls, conditionals, and nested blocks. Every subexpression
+# goes through viuact.emit.emit_expr() so such functions stress expression
+# dispatch.
+#
+# Usage: PYTHONPATH=. python3 tools/bench_exprs.py [--repeat N] [FUNCTIONS...]
+
+import sys
+
+import bench
+
+
+def make_source(functions):
+    lines = []
+    for i in range(functions):
+        lines.extend([
+            '(val f{} (i64 i64 bool) -> i64)'.format(i),
+            '(let f{} (x y c) {{'.format(i),
+            '    (let a (+ x (- {} (+ 2 (- 3 1)))))'.format(i),
+            '    (let b (if c (- a 1) (+ y (+ 3 {}))))'.format(i),
+            '    (let d {{ (let t (+ b 3)) (- t (+ 1 {})) }})'.format(i),
+            '    (let e { (let u (- d 2)) { (let v (+ u 1)) (- v 4) } })',
+            '    e',
+            '})',
+        ])
+    lines.append('(val main () -> i64)')
+    lines.append('(let main () (f0 1 2 true))')
+    return '\n'.join(lines)
+
+def workload(functions):
+    source_text = make_source(functions)
+    return lambda: bench.compile_source(source_text)
+
+
+exit(bench.run_sizes(
+    sys.argv[1:],
+    'functions',
+    'cc [ms]',
+    [100, 200, 400],
+    workload,
+))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+# Measure time needed to compile a synthetic module with many functions calling
+# each other. Every call expression and every name reference has to be
+# resolved against all functions of the module (see viuact.core.Module_info)
+# so such modules stress name resolution.
+#
+# Usage: PYTHONPATH=. python3 tools/bench_fns.py [--repeat N] [FUNCTIONS...]
+
+import sys
+
+import bench
+
+
+def make_source(functions):
+    lines = [
+        '(val f0 (i64) -> i64)',
+        '(let f0 (x) (+ x 1))',
+    ]
+    for i in range(1, functions):
+        # Every function calls two functions defined before it, and refers to
+        # its parameter a few times.
+        lines.append('(val f{} (i64) -> i64)'.format(i))
+        lines.append('(let f{} (x) {{ (let y (f{} x)) (f{} y) }})'.format(
+            i,
+            (i - 1),
+            (i // 2),
+        ))
+    lines.append('(val main () -> i64)')
+    lines.append('(let main () (f{} 0))'.format(functions - 1))
+    return '\n'.join(lines)
+
+def workload(functions):
+    source_text = make_source(functions)
+    return lambda: bench.compile_source(source_text)
+
+
+exit(bench.run_sizes(
+    sys.argv[1:],
+    'functions',
+    'cc [ms]',
+    [250, 500, 1000, 2000],
+    workload,
+))
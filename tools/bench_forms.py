@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+# Compare time needed to get forms of a source file by lexing and parsing it,
+# and by loading them from the binary format (see viuact.sl.dump_forms()).
+#
+# Usage: PYTHONPATH=. python3 tools/bench_forms.py [--repeat N] FILE.vt...
+
+import sys
+
+import bench
+import viuact.lexer
+import viuact.parser
+import viuact.sl
+
+
+def main(executable_name, args):
+    repeat, args = bench.parse_repeat(args, 5)
+
+    print('{:>10} {:>10} {:>10} {:>10} {:>8}  {}'.format(
+        'source', 'forms', 'parse [ms]', 'load [ms]', 'speedup', 'file'))
+    for source_file in args:
+        with open(source_file, 'r') as ifstream:
+            source_text = ifstream.read()
+
+        parse = lambda: viuact.parser.parse(viuact.lexer.lex(source_text))
+        data = viuact.sl.dump_forms(parse())
+        load = lambda: viuact.sl.load_forms(data)
+
+        parse_time = bench.best_of(repeat, parse)
+        load_time = bench.best_of(repeat, load)
+        print('{:>10} {:>10} {:>10.2f} {:>10.2f} {:>7.1f}x  {}'.format(
+            len(source_text.encode('utf-8')),
+            len(data),
+            parse_time * 1000,
+            load_time * 1000,
+            parse_time / load_time,
+            source_file,
+        ))
+
+    return 0
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Measure time needed to compile a synthetic function with many let-bindings.
+# Such functions stress the register allocator (see viuact.core.State), as
+# there are lots of live slots, and lots of freed slots waiting for reuse.
+#
+# Usage: PYTHONPATH=. python3 tools/bench_slots.py [--repeat N] [BINDINGS...]
+
+import sys
+
+import bench
+
+
+def make_source(bindings):
+    lines = [
+        '(val main () -> i64)',
+        '(let main () {',
+        '    (let x0 0)',
+    ]
+    for i in range(1, bindings):
+        # Values are moved out of variables when used so a chain of bindings,
+        # each using the previous one, keeps only a few slots live. Every
+        # other binding is never used though, so live slots pile up. Every
+        # few bindings there is a nested block with its own temporaries so
+        # that slots are freed and reused.
+        if i % 2:
+            lines.append('    (let y{} {})'.format(i, i))
+        elif i % 8:
+            lines.append('    (let x{} (+ x{} {}))'.format(i, i - 2, i))
+        else:
+            lines.append('    (let x{} {{ (let t (- x{} 2)) (+ t {}) }})'.format(
+                i, i - 2, i))
+    lines.append('    0')
+    lines.append('})')
+    return '\n'.join(lines)
+
+def workload(bindings):
+    source_text = make_source(bindings)
+    return lambda: bench.compile_source(source_text)
+
+
+exit(bench.run_sizes(
+    sys.argv[1:],
+    'bindings',
+    'cc [ms]',
+    [500, 1000, 2000, 4000],
+    workload,
+))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# Compare memory needed to keep tokens of a source file as separate Lexeme
+# objects (each with its own Token, copied text, and position tuple) and in a
+# token table (see viuact.lexemes.Token_table).
+#
+# Lexeme objects are produced by viuact.lexer.iter_lex() which creates exactly
+# the same objects as the legacy lexer, but does not take quadratic time to do
+# so. Memory is measured with tracemalloc and does not include the source text
+# itself. The table is measured twice: as produced by the lexer, and after the
+# index of line starts was built (ie, after a position was requested).
+#
+# Usage: PYTHONPATH=. python3 tools/bench_tokens.py [LINES...]
+
+import sys
+import tracemalloc
+
+import viuact.lexer
+
+
+def make_source(lines):
+    source = []
+    for i in range(lines // 4):
+        source.extend([
+            '(val f{} (i64 string) -> i64)'.format(i),
+            '(let f{} (x s) {{'.format(i),
+            '    (print (.. "f{}: " s)) ; {}'.format(i, 'trace'),
+            '    (+ x {}) }})'.format(i),
+        ])
+    return '\n'.join(source)
+
+def measure(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (result, size,)
+
+def main(executable_name, args):
+    print('{:>10} {:>10} {:>14} {:>14} {:>14} {:>8}'.format(
+        'lines', 'tokens', 'lexemes [KiB]', 'table [KiB]', '+lines [KiB]',
+        'ratio'))
+    for lines in (list(map(int, args)) or [1000, 10000, 100000]):
+        source_text = make_source(lines)
+
+        lexemes, lexemes_size = measure(
+            lambda: list(viuact.lexer.iter_lex(source_text)))
+        del lexemes
+
+        table, table_size = measure(
+            lambda: viuact.lexer.lex(
+                source_text, viuact.lexer.LEXER_SINGLE_PASS))
+        _, line_index_size = measure(table.line_index)
+
+        print('{:>10} {:>10} {:>14.1f} {:>14.1f} {:>14.1f} {:>7.1f}x'.format(
+            lines,
+            len(table),
+            lexemes_size / 1024,
+            table_size / 1024,
+            (table_size + line_index_size) / 1024,
+            lexemes_size / (table_size + line_index_size),
+        ))
+
+    return 0
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
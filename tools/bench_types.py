@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Stress type inference with long chains of template variables (see
+# viuact.typesystem.state.State).
+#
+# The benchmark mimics what the compiler does for a function polymorphic over
+# many template variables, that threads its parameters through a chain of calls
+# to a polymorphic function:
+#
+#       (val ('a) pick ('a 'a) -> 'a)
+#       (val ('a0 'a1 ... 'aN) chain ('a0 'a1 ... 'aN) -> 'a0)
+#       (let chain (x0 x1 ... xN) {
+#           (let z1 (pick x0 x1))
+#           (let z2 (pick z1 x2))
+#           ...
+#       })
+#
+# and then asks for the types of all parameters (by unifying them with a
+# concrete type, and by stringifying them), which requires following the whole
+# chains of template variables.
+#
+# Usage: PYTHONPATH=. python3 tools/bench_types.py [--repeat N] [LENGTH...]
+
+import sys
+
+import bench
+import viuact.typesystem.state
+import viuact.typesystem.t
+
+
+def run(length):
+    state = viuact.typesystem.state.State()
+    unify = viuact.typesystem.state.unify
+
+    parameters = [
+        state.register_type(viuact.typesystem.t.Template('a{}'.format(i)))
+        for i
+        in range(length)
+    ]
+
+    current = parameters[0]
+    for each in parameters[1:]:
+        # Every call to pick registers a fresh instance of its template
+        # variable, unifies it with types of arguments, and the type of the
+        # result is whatever the variable was bound to.
+        pick = state.register_type(viuact.typesystem.t.Template('a'))
+        unify(state, pick, current)
+        unify(state, pick, each)
+        current = state.variable(pick)
+
+    i64 = viuact.typesystem.t.Value('i64')
+    for each in parameters:
+        unify(state, each, i64)
+    for each in parameters:
+        state.stringify_type(each)
+
+def workload(length):
+    return lambda: run(length)
+
+
+exit(bench.run_sizes(
+    sys.argv[1:],
+    'length',
+    'infer [ms]',
+    [250, 500, 1000, 2000, 4000],
+    workload,
+))
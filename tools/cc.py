@@ -6,10 +6,13 @@ import sys
 
 import viuact.util.help
 import viuact.util.log
+import viuact.util.type_annotations
 import viuact.errors
 import viuact.lexer
 import viuact.parser
+import viuact.forms
 import viuact.core
+import viuact.driver
 
 
 HELP = '''{NAME}
@@ -18,6 +21,10 @@ HELP = '''{NAME}
 {SYNOPSIS}
     {exec_tool} src/%arg(file).vt
     {exec_blank} -r src src/%arg(file).vt
+    {exec_blank} %arg(file).vt...
+    {exec_blank} %arg(directory)
+    {exec_blank} -j %arg(jobs) %arg(directory)
+    {exec_blank} --check %arg(file).vt...
     {exec_blank} --version
     {exec_blank} --help
 
@@ -26,6 +33,24 @@ HELP = '''{NAME}
     Compiler from Viuact to Viua VM assembly language. Viuact is a high-level
     programming language with a Lisp-like syntax.
 
+    %text
+    Many source files may be compiled by a single invocation of the compiler.
+    If a directory is given, it is used as a source root and all source files
+    inside it are compiled. Modules are compiled before modules that import
+    them. Errors in one file do not stop compilation of others, and output
+    files are the same as if each file was compiled separately.
+
+    %text
+    Modules that do not import each other may be compiled in parallel (see
+    the %opt(-j) option).
+
+    %text
+    Modules are only compiled if they are out of date, ie. their source files,
+    interfaces of modules they import, or the compiler changed since they were
+    last compiled (this is recorded in %fg(const).manifest.json%r file in the
+    output directory). Output files are only written if their contents change
+    so build tools do not rebuild things needlessly.
+
 {OPTIONS}
     %opt(--help)
         Display this message.
@@ -37,6 +62,20 @@ HELP = '''{NAME}
         %text
         Display information about the environment that the compiler will use.
 
+    %opt(--check)
+        %text
+        Only check if source files are correct (ie, they parse and type-check)
+        without producing any output files. Only diagnostics are printed. Any
+        number of files may be given. All of them are checked even if errors
+        are found in some, and the exit code is non-zero if any of them failed.
+
+    %opt(-j) %arg(jobs)
+        %text
+        Compile up to %arg(jobs) modules at the same time, each in a separate
+        process. A module is compiled as soon as all modules it imports are
+        compiled. Output files are the same as with serial compilation, which
+        is the default (ie, %opt(-j) 1).
+
     %opt(-r)
         %text
         Override source root inferred by the compiler.
@@ -131,28 +170,14 @@ HELP = '''{NAME}
 EXECUTABLE = 'viuact-cc'
 
 
-def report_error(source_file_name, e, human = True):
-    viuact.util.log.error(
-        s = e.what(),
-        path = source_file_name,
-        pos = e.at(human = human),
-    )
-    for each in e.notes():
-        viuact.util.log.note(
-            s = each,
-            path = source_file_name,
-            pos = e.at(human = human),
-        )
-
-    for each in e.fallout():
-        report_error(source_file_name, e, human)
-
 def parse_options(args):
     options = {
         'source_root': '.',
         'stop_after_tokenisation': False,
         'stop_after_parsing': False,
         'show_env': False,
+        'check_only': False,
+        'jobs': 1,
     }
 
     i = 0
@@ -168,22 +193,20 @@ def parse_options(args):
             options['stop_after_parsing'] = True
         elif each in ('--env',):
             options['show_env'] = True
+        elif each in ('--check',):
+            options['check_only'] = True
+        elif each in ('-j', '--jobs',):
+            i += 1
+            options['jobs'] = int(args[i])
         else:
             break
 
         i += 1
 
-    source_file = None
-    if i < len(args):
-        source_file = args[i]
-
-    return (options, source_file,)
+    return (options, args[i:],)
 
 DEFAULT_SOURCE_ROOT = '.'
 
-SOURCE_KIND_EXEC = 'exec'
-SOURCE_KIND_LINK = 'link'
-
 def get_source_location(options, raw_path):
     working_directory = (os.getcwd() + os.path.sep)
 
@@ -225,11 +248,22 @@ def get_source_location(options, raw_path):
         os.path.normpath(source_file),
     )
 
-def determine_source_kind(source_file):
-    file_name = os.path.split(source_file)[1]
-    if (file_name[0].isupper() or file_name == 'mod.vt'):
-        return SOURCE_KIND_LINK
-    return SOURCE_KIND_EXEC
+def expand_inputs(options, paths):
+    # Turn paths given on the command line into (source root, source file)
+    # pairs. Directories are source roots and every source file inside them is
+    # used.
+    inputs = []
+    for each in paths:
+        if os.path.isdir(each):
+            source_root = os.path.normpath(each)
+            inputs.extend(
+                (source_root, source_file,)
+                for source_file
+                in viuact.driver.find_source_files(source_root)
+            )
+        else:
+            inputs.append(get_source_location(options, each))
+    return inputs
 
 def main(executable_name, args):
     if '--version' in args:
@@ -254,21 +288,58 @@ def main(executable_name, args):
         viuact.util.log.note('use --help to learn about correct invocation')
         exit(1)
 
-    options, source_file = parse_options(args)
+    options, source_files = parse_options(args)
     if options['show_env']:
         print('VIUACT_DEBUG={}'.format(os.environ.get('VIUACT_DEBUG', 'false')))
         print('VIUACT_LIBRARY_PATH={}'.format(viuact.env.library_path()))
         print('VIUACT_CORE_DIR={}'.format(viuact.env.core_directory('')))
         print('VIUACT_OUTPUT_DIR={}'.format(viuact.env.output_directory()))
+        print('VIUACT_CACHE={}'.format(
+            'on' if viuact.env.cache_enabled() else 'off'))
+        print('VIUACT_CHECKS={}'.format(
+            'on' if viuact.util.type_annotations.checks_enabled() else 'off'))
+        print('VIUACT_LEXER={}'.format(viuact.env.lexer_engine(
+            viuact.lexer.LEXER_SINGLE_PASS)))
+        print('VIUACT_PARSER={}'.format(viuact.env.parser_engine(
+            viuact.parser.PARSER_ONE_PASS)))
+        print('VIUACT_CODEGEN={}'.format(viuact.env.codegen_engine(
+            viuact.core.CODEGEN_SERIAL)))
         return 0
 
-    if source_file is None:
+    if not source_files:
         viuact.util.log.error('no source file given')
         viuact.util.log.note('use --help to learn about correct invocation')
         exit(1)
 
+    if options['jobs'] < 1:
+        viuact.util.log.error('number of jobs must be at least 1')
+        exit(1)
+
+    batch = (len(source_files) > 1 or os.path.isdir(source_files[0]))
+    stop_early = (options['stop_after_tokenisation']
+            or options['stop_after_parsing'])
+    if batch and stop_early:
+        viuact.util.log.error('tokens and forms can be printed for only one'
+                ' source file')
+        exit(1)
+
+    if options['check_only']:
+        exit(viuact.driver.run(
+            expand_inputs(options, source_files),
+            viuact.driver.check_unit,
+            options['jobs'],
+        ))
+    if batch:
+        exit(viuact.driver.run(
+            expand_inputs(options, source_files),
+            viuact.driver.compile_unit,
+            options['jobs'],
+        ))
+
+    source_file = source_files[0]
+
     source_root, source_file = get_source_location(options, source_file)
-    source_kind = determine_source_kind(source_file)
+    source_kind = viuact.driver.determine_source_kind(source_file)
 
     # print('file: {}'.format(source_file))
     # print('root: {}'.format(source_root))
@@ -280,6 +351,17 @@ def main(executable_name, args):
             viuact.util.colors.colorise_repr('white', source_full_path)))
         exit(1)
 
+    module_name = viuact.driver.determine_module_name(source_kind, source_file)
+    output_directory = viuact.env.output_directory()
+
+    if (not stop_early) and viuact.core.up_to_date(
+            source_root,
+            source_file,
+            module_name,
+            output_directory):
+        viuact.util.log.debug('cc: up to date: %s', source_file)
+        exit(0)
+
     source_text = ''
     with open(source_full_path, 'r') as ifstream:
         source_text = ifstream.read()
@@ -298,14 +380,6 @@ def main(executable_name, args):
             print(json.dumps(viuact.parser.to_data(forms), indent = 2))
             exit(0)
 
-        module_name = (
-            viuact.core.EXEC_MODULE
-            if (source_kind == SOURCE_KIND_EXEC) else
-            source_file.rsplit('.', maxsplit = 1)[0].replace('/', '::')
-        )
-
-        output_directory = viuact.env.output_directory()
-
         viuact.core.cc(
             source_root,
             source_file,
@@ -314,7 +388,7 @@ def main(executable_name, args):
             output_directory,
         )
     except viuact.errors.Error as e:
-        report_error(source_file, e, human = True)
+        viuact.driver.report_error(source_file, e, human = True)
         exit(1)
 
 main(sys.argv[0], sys.argv[1:])
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Check that forms survive a round trip through the binary format (see
+# viuact.sl.dump_forms() and viuact.sl.load_forms()). Forms of every source
+# file, and of a few snippets exercising corner cases of the format, are
+# dumped and loaded back, and the loaded forms must be the same as the parsed
+# ones: same classes, texts, and positions.
+#
+# Usage: PYTHONPATH=. python3 tools/check_forms.py [FILE.vt...]
+
+import glob
+import sys
+
+import viuact.lexer
+import viuact.parser
+import viuact.sl
+
+
+SNIPPETS = (
+    # Lengths of texts are stored in bytes, not in characters.
+    ('<non-ascii>', '\n'.join((
+        '(let main () {',
+        '    (print "Gdańsk żółw")',
+        '    (print "after")',
+        '    (print "∀x. 🦀") ; żółw',
+        '    0',
+        '})',
+    ))),
+)
+
+def check_text(source_file, text):
+    forms = viuact.parser.parse(viuact.lexer.lex(text))
+    loaded = viuact.sl.load_forms(viuact.sl.dump_forms(forms))
+    if viuact.parser.to_data(loaded) == viuact.parser.to_data(forms):
+        return True
+    print('{}: loaded forms differ from parsed ones'.format(source_file))
+    return False
+
+def main(executable_name, args):
+    sources = list(SNIPPETS)
+    for each in (args or sorted(glob.glob('tests/src/*.vt'))):
+        with open(each, 'r') as ifstream:
+            sources.append((each, ifstream.read(),))
+
+    failures = 0
+    for source_file, text in sources:
+        failures += int(not check_text(source_file, text))
+
+    print('{} sources, {} failures'.format(len(sources), failures))
+    return (1 if failures else 0)
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
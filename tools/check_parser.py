@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# Check the one-pass parser against the legacy parser (see viuact.parser). Valid
+# source files are parsed as they are, and then with random edits that break
+# their structure: a brace is removed, added, or replaced by another one. For
+# every text the one-pass parser must produce the same forms as the legacy
+# parser, or fail with a diagnostic if the legacy parser fails. It may only
+# crash where the legacy parser crashes too.
+#
+# Diagnostics themselves are not required to be the same. The legacy parser
+# wraps infix operators before it looks at braces, so a misplaced brace next to
+# a :: or a . may be taken as an operand and reported somewhere else (or not
+# reported at all, and the parser crashes). Texts for which diagnostics differ
+# are counted, and printed with --verbose.
+#
+# Usage: PYTHONPATH=. python3 tools/check_parser.py [--seed N] [--edits N] [--verbose] [FILE.vt...]
+
+import contextlib
+import glob
+import io
+import random
+import sys
+
+import viuact.errors
+import viuact.lexer
+import viuact.parser
+
+
+BRACES = '(){}'
+
+def outcome(tokens, engine):
+    # Parsers may log something before they fail. It is not compared.
+    with contextlib.redirect_stdout(io.StringIO()), \
+            contextlib.redirect_stderr(io.StringIO()):
+        try:
+            forms = viuact.parser.parse(tokens, engine)
+            return ('forms', viuact.parser.to_data(forms),)
+        except viuact.errors.Error as e:
+            return ('error', e.what(), e.at(), tuple(e.notes()),)
+        except Exception as e:
+            return ('crash', type(e).__name__,)
+
+def random_edit(rng, text):
+    braces = [i for i, c in enumerate(text) if c in BRACES]
+    action = rng.choice(('remove', 'insert', 'replace',))
+    if action == 'insert' or not braces:
+        offset = rng.randint(0, len(text))
+        return (text[:offset] + rng.choice(BRACES) + text[offset:])
+
+    offset = rng.choice(braces)
+    inserted = ('' if action == 'remove' else rng.choice(BRACES))
+    return (text[:offset] + inserted + text[offset + 1:])
+
+def check_text(source_file, text, verbose):
+    # Return None if the text is fine, 'differs' if the diagnostics differ, and
+    # 'fails' if the one-pass parser is wrong.
+    try:
+        tokens = viuact.lexer.lex(text)
+    except viuact.errors.Error:
+        return None
+
+    expected = outcome(tokens, viuact.parser.PARSER_LEGACY)
+    got = outcome(tokens, viuact.parser.PARSER_ONE_PASS)
+    if got == expected:
+        return None
+
+    result = 'fails'
+    if expected[0] != 'forms' and got[0] == 'error':
+        result = 'differs'
+    if result == 'differs' and not verbose:
+        return result
+
+    line = (expected[2][0] if expected[0] == 'error' else None)
+    print('{}: one-pass parser {} legacy{}'.format(
+        source_file,
+        ('differs from' if result == 'differs' else 'fails against'),
+        ('' if line is None else ' (error on line {})'.format(line + 1)),
+    ))
+    print('    legacy:   {}'.format(expected[:3]))
+    print('    one-pass: {}'.format(got[:3]))
+    return result
+
+def main(executable_name, args):
+    seed = 0
+    edits = 50
+    verbose = False
+    while args and args[0] in ('--seed', '--edits', '--verbose',):
+        if args[0] == '--verbose':
+            verbose = True
+            args = args[1:]
+            continue
+        if args[0] == '--seed':
+            seed = int(args[1])
+        else:
+            edits = int(args[1])
+        args = args[2:]
+
+    rng = random.Random(seed)
+    source_files = (args or sorted(glob.glob('tests/src/*.vt')))
+
+    results = {'differs': 0, 'fails': 0,}
+    for each in source_files:
+        with open(each, 'r') as ifstream:
+            text = ifstream.read()
+
+        texts = [text] + [random_edit(rng, text) for _ in range(edits)]
+        for t in texts:
+            result = check_text(each, t, verbose)
+            if result is not None:
+                results[result] += 1
+
+    print('{} files, {} edits each, {} different diagnostics, {} failures'.format(
+        len(source_files),
+        edits,
+        results['differs'],
+        results['fails'],
+    ))
+    failures = results['fails']
+    return (1 if failures else 0)
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
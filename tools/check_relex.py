@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# Check incremental lexing (see viuact.lexer.relex()) against lexing the whole
+# text again. Source files are edited at random places, by removing some text
+# and inserting some other text (random characters, or a piece of the same
+# file), and the token table produced by relex() must be the same as the one
+# produced by lexing the edited text from scratch. If the edited text can not
+# be lexed, relex() must fail too.
+#
+# Edits are applied one after another to the table produced by relex() so
+# that any mistakes accumulate instead of being thrown away after each edit.
+#
+# Usage: PYTHONPATH=. python3 tools/check_relex.py [--seed N] [--edits N] [FILE.vt...]
+
+import glob
+import random
+import sys
+
+import viuact.errors
+import viuact.lexer
+
+
+ALPHABET = '()[]{}<>"\\;*.:-+=!/& \n\t_\'~aAzZ09'
+
+def rows_of(tokens):
+    return [
+        (tokens.kinds()[n], tokens.offset(n), tokens.end(n), tokens.at(n),)
+        for n
+        in range(len(tokens))
+    ]
+
+def lex_or_none(fn):
+    try:
+        return fn()
+    except viuact.errors.Error:
+        return None
+
+def random_edit(rng, text):
+    offset = rng.randint(0, len(text))
+    removed = rng.randint(0, min(8, len(text) - offset))
+    if text and rng.random() < 0.5:
+        start = rng.randint(0, len(text) - 1)
+        inserted = text[start : start + rng.randint(1, 16)]
+    else:
+        inserted = ''.join(
+            rng.choice(ALPHABET)
+            for _
+            in range(rng.randint(0, 4))
+        )
+    return (offset, removed, inserted,)
+
+def check_file(rng, source_file, edits):
+    with open(source_file, 'r') as ifstream:
+        text = ifstream.read()
+
+    tokens = viuact.lexer.lex(text, viuact.lexer.LEXER_SINGLE_PASS)
+    failures = 0
+    for _ in range(edits):
+        offset, removed, inserted = random_edit(rng, tokens.source())
+        edited = (tokens.source()[:offset]
+                + inserted
+                + tokens.source()[offset + removed:])
+
+        expected = lex_or_none(lambda: viuact.lexer.lex(
+            edited, viuact.lexer.LEXER_SINGLE_PASS))
+        got = lex_or_none(lambda: viuact.lexer.relex(
+            tokens, offset, removed, inserted))
+
+        ok = (
+            (expected is None and got is None)
+            or (expected is not None and got is not None
+                and got.source() == edited
+                and rows_of(got) == rows_of(expected))
+        )
+        if not ok:
+            failures += 1
+            print('{}: relex({}, {}, {}) differs from lex()'.format(
+                source_file,
+                offset,
+                removed,
+                repr(inserted),
+            ))
+
+        # Continue from the correct table so that one mistake is reported
+        # once. Texts which can not be lexed are abandoned.
+        if expected is not None:
+            tokens = expected
+
+    return failures
+
+def main(executable_name, args):
+    seed = 0
+    edits = 200
+    while args and args[0] in ('--seed', '--edits',):
+        if args[0] == '--seed':
+            seed = int(args[1])
+        else:
+            edits = int(args[1])
+        args = args[2:]
+
+    rng = random.Random(seed)
+    source_files = (args or sorted(glob.glob('tests/src/*.vt')))
+
+    failures = 0
+    for each in source_files:
+        failures += check_file(rng, each, edits)
+
+    print('{} files, {} edits each, {} failures'.format(
+        len(source_files),
+        edits,
+        failures,
+    ))
+    return (1 if failures else 0)
+
+
+exit(main(sys.argv[0], sys.argv[1:]))
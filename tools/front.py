@@ -8,6 +8,7 @@ import sys
 
 import viuact.util.help
 import viuact.env
+import viuact.library
 
 
 HELP = '''{NAME}
@@ -17,7 +18,7 @@ HELP = '''{NAME}
     {exec_tool} <%fg(man_const)tool%r> [%arg(option)...] [%arg(arg)]
     {exec_blank} --version
     {exec_blank} --help
-    {exec_blank} --env
+    {exec_blank} --env [--modules]
     {exec_blank} cc     --mode %fg(man_var)MODE%r %arg(file).vt
     {exec_blank} opt    %arg(file).asm
     {exec_blank} fmt    %arg(file).vt
@@ -64,6 +65,11 @@ HELP = '''{NAME}
         %text
         Display information about the environment that the compiler will use.
 
+    %opt(--env) %opt(--modules)
+        %text
+        Also display modules that can be imported, and the interface files
+        the compiler will use for them.
+
 {EXAMPLES}
     %text
     Some examples to give you a taste of how to use this program.
@@ -215,6 +221,11 @@ def main(executable_name, args):
                     (len(prefix) * ' '),
                     each,
                 ))
+        if '--modules' in args:
+            modules = viuact.library.modules()
+            width = max((len(name) for name, _ in modules), default = 0)
+            for name, path in modules:
+                print('{}  {}'.format(name.ljust(width), path))
         # if viuact.env.VIUACT_DUMP_INTERMEDIATE:
         #     prefix = 'VIUACT_DUMP_INTERMEDIATE:'
         #     print('{} {}'.format(
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import viuact
+import viuact.env
+import viuact.util.log
+
+
+# Persistent cache of prepared interface modules.
+#
+# Importing a module means finding its interface file (.vti), lexing and
+# parsing it, and preparing a module out of the forms (see
+# viuact.core.cc_impl_prepare_module()). The result only depends on the
+# contents of the interface file, interface files of the modules it imports
+# (transitively), and the compiler itself. Prepared modules are thus stored
+# in the cache directory (see viuact.env.cache_directory()) and subsequent
+# compiler invocations skip straight to a ready module.
+#
+# An entry is keyed by the import path, the path to and digest of the
+# interface file, and the fingerprint of the compiler. The key does not cover
+# the modules imported by the interface: each prepared module records the
+# resolved interface file and its digest for every module it depends on, and
+# an entry is only used if all of them still resolve to the same files with
+# the same contents.
+#
+# The cache also keeps bodies of compiled functions (see
+# viuact.core.cc_impl_emit_functions()). Bodies of all functions of a module
+# are kept in one entry, keyed by the name and source file of the module, and
+# the fingerprint of the compiler. Inside the entry bodies are keyed by digests
+# of the functions' forms. Each body records what the function read from
+# modules while it was being compiled (signatures of called functions, enums,
+# records, exceptions) and is only used if all these reads give the same
+# results again.
+#
+# The cache is an optimisation so any problem with it (missing, unreadable, or
+# corrupted entries, failures to write) is treated as a miss.
+
+CACHE_VERSION = 1
+CACHE_FINGERPRINT_PLACEHOLDER = 'CODE'
+
+cache_compiler_fingerprint = None
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_digest(path):
+    with open(path, 'rb') as ifstream:
+        return digest(ifstream.read())
+
+def compiler_fingerprint():
+    global cache_compiler_fingerprint
+    if cache_compiler_fingerprint is not None:
+        return cache_compiler_fingerprint
+
+    fingerprint = viuact.__code__
+    if fingerprint == CACHE_FINGERPRINT_PLACEHOLDER:
+        # The compiler is not installed (the fingerprint is set by the Makefile
+        # during installation) so compute it from the sources, similarly to
+        # what the Makefile does.
+        package_root = os.path.dirname(os.path.abspath(viuact.__file__))
+        sources = []
+        for root, dirs, files in os.walk(package_root):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            sources.extend(sorted(
+                os.path.join(root, each)
+                for each
+                in files
+                if each.endswith('.py')
+            ))
+
+        h = hashlib.sha384()
+        for each in sources:
+            with open(each, 'rb') as ifstream:
+                h.update(ifstream.read())
+        fingerprint = h.hexdigest()
+
+    cache_compiler_fingerprint = fingerprint
+    return cache_compiler_fingerprint
+
+def entry_path(import_path, interface_file, contents_digest):
+    key = digest('\0'.join((
+        str(CACHE_VERSION),
+        compiler_fingerprint(),
+        import_path,
+        os.path.abspath(interface_file),
+        contents_digest,
+    )).encode('utf-8'))
+    return os.path.join(
+        viuact.env.cache_directory(),
+        'modules',
+        key[:2],
+        '{}.pickle'.format(key),
+    )
+
+def dependencies_valid(dependencies, resolve):
+    for import_path, (interface_file, contents_digest) in dependencies.items():
+        if resolve(import_path) != interface_file:
+            return False
+        try:
+            if file_digest(interface_file) != contents_digest:
+                return False
+        except OSError:
+            return False
+    return True
+
+def read_entry(path, what):
+    try:
+        with open(path, 'rb') as ifstream:
+            return pickle.load(ifstream)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        viuact.util.log.debug('cache: ignoring broken entry %s for %s: %s',
+            path,
+            what,
+            e,
+        )
+        return None
+
+def write_entry(path, what, value):
+    entry_directory = os.path.dirname(path)
+    try:
+        os.makedirs(entry_directory, exist_ok = True)
+
+        # Write to a temporary file first and then move it in place so that
+        # concurrently running compilers never see half-written entries.
+        fd, tmp_path = tempfile.mkstemp(dir = entry_directory, suffix = '.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as ofstream:
+                pickle.dump(value, ofstream, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, pickle.PicklingError) as e:
+        viuact.util.log.debug('cache: could not store %s: %s',
+            what,
+            e,
+        )
+
+def load(import_path, interface_file, contents_digest, resolve):
+    if not viuact.env.cache_enabled():
+        return None
+
+    path = entry_path(import_path, interface_file, contents_digest)
+    mod = read_entry(path, import_path)
+    if mod is None:
+        return None
+
+    if not dependencies_valid(mod.dependencies(), resolve):
+        viuact.util.log.debug('cache: stale entry for %s', import_path)
+        return None
+
+    return mod
+
+def store(import_path, interface_file, contents_digest, mod):
+    if not viuact.env.cache_enabled():
+        return
+
+    path = entry_path(import_path, interface_file, contents_digest)
+    write_entry(path, import_path, mod)
+
+def fns_entry_path(module_name, source_file):
+    key = digest('\0'.join((
+        str(CACHE_VERSION),
+        compiler_fingerprint(),
+        module_name,
+        source_file,
+    )).encode('utf-8'))
+    return os.path.join(
+        viuact.env.cache_directory(),
+        'functions',
+        key[:2],
+        '{}.pickle'.format(key),
+    )
+
+def load_fns(module_name, source_file):
+    if not viuact.env.cache_enabled():
+        return {}
+
+    path = fns_entry_path(module_name, source_file)
+    return (read_entry(path, module_name) or {})
+
+def store_fns(module_name, source_file, entries):
+    if not viuact.env.cache_enabled():
+        return
+
+    path = fns_entry_path(module_name, source_file)
+    write_entry(path, module_name, entries)
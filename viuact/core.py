@@ -1,10 +1,18 @@
+import collections
+import concurrent.futures
 import enum
 import hashlib
+import heapq
+import io
 import os
 
 import viuact.util.log
+import viuact.cache
 import viuact.env
+import viuact.library
+import viuact.manifest
 import viuact.forms
+import viuact.lexemes
 import viuact.typesystem.t
 import viuact.typesystem.state
 
@@ -25,6 +33,14 @@ def typeof(value):
     return str(type(value))[8:-2]
 
 
+def find_file(path, extension):
+    file_name = '{}.{}'.format(path.replace('::', '/'), extension)
+    return viuact.library.find(file_name)
+
+def find_interface_file(path):
+    return find_file(path, 'vti')
+
+
 class Module_info:
     def __init__(self, name, source_file):
         self._name = name
@@ -33,20 +49,31 @@ class Module_info:
         self._functions = {}
         self._function_signatures = {}
 
+        # Functions and signatures indexed by base name, and then by arity, ie.
+        # {base name => {arity => function or signature}}. Call expressions and
+        # name references only know the base name so without the index they
+        # would have to look at every function of the module.
+        self._functions_by_name = {}
+        self._function_signatures_by_name = {}
+
         self._enums = {}
         self._records = {}
         self._exceptions = {}
 
         self._imports = {}
+        self._dependencies = {}
 
     def name(self):
         return self._name
 
+    def source_file(self):
+        return self._source_file
+
     def make_fn(self, name, parameters):
         n = '{}/{}'.format(name, len(parameters))
         if n not in self._function_signatures:
             raise viuact.errors.No_signature_for_function(
-                pos = name.tok().at(),
+                pos = name.tok(),
                 fn = n,
             )
 
@@ -54,6 +81,8 @@ class Module_info:
             'base_name': str(name),
             'arity': len(parameters),
         }
+        self._functions_by_name.setdefault(str(name), {})[len(parameters)] = (
+            self._functions[n])
         # viuact.util.log.print('module info [{}]: visible local fn {}'.format(
         #     self._name,
         #     n,
@@ -70,6 +99,8 @@ class Module_info:
             'return': return_type,
             'template_parameters': template_parameters,
         }
+        self._function_signatures_by_name.setdefault(str(name), {})[
+            len(parameters)] = self._function_signatures[n]
         return self
 
     def is_fn_defined(self, name):
@@ -81,6 +112,22 @@ class Module_info:
     def signature(self, fn_name):
         return self._function_signatures[fn_name]
 
+    def signatures_of(self, base_name):
+        # Signatures of all arities of a function, in order of declaration.
+        return list(self._function_signatures_by_name.get(base_name, {}).values())
+
+    def has_fn(self, base_name):
+        return (base_name in self._functions_by_name)
+
+    def fns_of(self, base_name):
+        # Functions of all arities defined with the given base name, in the
+        # same format as returned by fns().
+        return [
+            ('{}/{}'.format(base_name, arity), v,)
+            for arity, v
+            in self._functions_by_name.get(base_name, {}).items()
+        ]
+
     def fns(self, local = None, imported = None):
         res = []
         for k, v in self._functions.items():
@@ -95,7 +142,7 @@ class Module_info:
     def make_enum(self, name, fields, template_parameters):
         if len(template_parameters) > 1:
             raise viuact.errors.Fail(
-                name.tok().at(),
+                name.tok(),
                 'FIXME enums support at most one type parameter',
             )
         self._enums[str(name)] = {
@@ -141,40 +188,111 @@ class Module_info:
         # FIXME error checking
         return self._exceptions[str(name)]
 
-    def make_import(self, path):
-        def find_file_impl(path, extension):
-            ld_path = viuact.env.library_path().split(':')
+    def make_import(self, path, pos = (0, 0,)):
+        interface_file, contents_digest, mod = module_registry().prepare(
+            path, pos)
 
-            file_name = '{}.{}'.format(path.replace('::', '/'), extension)
+        self._imports[path] = mod
 
-            for each in ld_path:
-                candidate = os.path.join(each, file_name)
-                if os.path.isfile(candidate):
-                    return candidate
+        # Record the interface files this module depends on, including the
+        # ones imported by the imported module.
+        self._dependencies[path] = (interface_file, contents_digest,)
+        self._dependencies.update(mod.dependencies())
 
-            return None
+        return path
 
-        find_interface_file = lambda p: find_file_impl(p, 'vti')
+    def imported(self, path):
+        return self._imports[path]
 
-        interface_file = find_interface_file(path)
+    def imports(self):
+        return list(self._imports.keys())
 
-        source_text = ''
-        with open(interface_file, 'r') as ifstream:
-            source_text = ifstream.read()
+    def dependencies(self):
+        return self._dependencies
 
-        tokens = viuact.lexer.lex(source_text)
-        forms = viuact.parser.parse(tokens)
-        mod = cc_impl_prepare_module(path, interface_file, forms)
+class Module_registry:
+    # Modules imported during a compilation session. Every import path is
+    # prepared at most once and the resulting module is shared by all modules
+    # importing it, no matter how deep in the import graph they are.
+    def __init__(self):
+        self._modules = {}      # import path => (interface file, digest, module)
+        self._preparing = []    # import paths being prepared, outermost first
 
-        self._imports[path] = mod
+    def prepare(self, path, pos = (0, 0,)):
+        if path in self._modules:
+            return self._modules[path]
 
-        return path
+        if path in self._preparing:
+            cycle = self._preparing[self._preparing.index(path):]
+            raise viuact.errors.Import_cycle(pos, cycle + [path])
 
-    def imported(self, path):
-        return self._imports[path]
+        self._preparing.append(path)
+        try:
+            interface_file, contents_digest, mod, cached = cc_impl_load_interface(
+                path)
+        finally:
+            self._preparing.pop()
+
+        if cached:
+            self.adopt(mod)
+
+        self._modules[path] = (interface_file, contents_digest, mod,)
+        return self._modules[path]
+
+    def adopt(self, mod):
+        # Modules loaded from the cache bring their imports with them. They are
+        # valid (the cache checked them), so register the ones not yet known
+        # and share the already registered ones.
+        for each in mod.imports():
+            if each in self._modules:
+                mod._imports[each] = self._modules[each][2]
+                continue
+            imported = mod.imported(each)
+            self.adopt(imported)
+            interface_file, contents_digest = mod.dependencies()[each]
+            self._modules[each] = (interface_file, contents_digest, imported,)
+
+    def modules(self):
+        return list(self._modules.keys())
+
+    def forget(self, path):
+        # Drop a module, and all modules depending on it, eg. after its
+        # interface file was written by the compiler. They will be prepared
+        # again the next time they are imported.
+        for each, (_, _, mod,) in list(self._modules.items()):
+            if (each == path) or (path in mod.dependencies()):
+                del self._modules[each]
+
+current_module_registry = Module_registry()
+
+def module_registry():
+    return current_module_registry
+
+def cc_impl_load_interface(path):
+    interface_file = find_interface_file(path)
+
+    source_bytes = b''
+    with open(interface_file, 'rb') as ifstream:
+        source_bytes = ifstream.read()
+    contents_digest = viuact.cache.digest(source_bytes)
+
+    mod = viuact.cache.load(
+        path,
+        interface_file,
+        contents_digest,
+        resolve = find_interface_file,
+    )
+    if mod is not None:
+        return (interface_file, contents_digest, mod, True,)
+
+    tokens = viuact.lexer.lex(source_bytes.decode('utf-8'))
+    forms = viuact.parser.parse(tokens)
+    mod = cc_impl_prepare_module(
+        path, interface_file, forms, interface = True)
+    viuact.cache.store(path, interface_file, contents_digest, mod)
+
+    return (interface_file, contents_digest, mod, False,)
 
-    def imports(self):
-        return list(self._imports.keys())
 
 class Scope:
     def __init__(self, state):
@@ -190,6 +308,114 @@ class Scope:
     def exit(self, *args):
         self.__exit__(*args)
 
+class Slot_queue:
+    # Slots (freed or cancelled) waiting to be reused. Slots of each register
+    # set are kept in the order in which they were put in the queue, and are
+    # taken out in the same order.
+    #
+    # Checking if a slot is in the queue, putting it in, and taking the first
+    # one out are O(1). Maximum index of the slots in the queue is found using
+    # a heap from which indexes of slots that were already taken out are
+    # removed lazily.
+    def __init__(self):
+        self._slots = {}    # register set => OrderedDict(index => slot)
+        self._indexes = {}  # register set => heap of negated indexes
+
+    def __contains__(self, slot):
+        return (slot.index in self._slots.get(slot.register_set, ()))
+
+    def __iter__(self):
+        for each in self._slots.values():
+            yield from each.values()
+
+    def __len__(self):
+        return sum(map(len, self._slots.values()))
+
+    def append(self, slot):
+        register_set = slot.register_set
+        if register_set not in self._slots:
+            self._slots[register_set] = collections.OrderedDict()
+            self._indexes[register_set] = []
+        self._slots[register_set][slot.index] = slot
+        heapq.heappush(self._indexes[register_set], -slot.index)
+
+    def extend(self, slots):
+        for each in slots:
+            self.append(each)
+
+    def clear(self):
+        self._slots.clear()
+        self._indexes.clear()
+
+    def pop(self, register_set):
+        slots = self._slots.get(register_set)
+        if not slots:
+            return None
+        _, slot = slots.popitem(last = False)
+        return slot
+
+    def max_index(self, register_set):
+        slots = self._slots.get(register_set)
+        if not slots:
+            return None
+        indexes = self._indexes[register_set]
+        while -indexes[0] not in slots:
+            heapq.heappop(indexes)
+        return -indexes[0]
+
+class Symbol_table:
+    # Slots and names of a single function, shared by all scopes (states) of
+    # the function. Scopes are numbered by their nesting level: the function's
+    # body is at level 0, scopes nested in it at level 1, etc.
+    #
+    # Names and slots are looked up in the table directly instead of walking
+    # the chain of scopes from the innermost to the outermost one. Each scope
+    # keeps an undo log of names it defined so that they are removed from the
+    # table when the scope is erased.
+    ALLOCATED = 'allocated'
+    FREED = 'freed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self):
+        self.levels = []    # [State], a state for each level
+        self.names = {}     # name => {level => slot}
+        self.slots = {}     # (index, register set) => (level, status)
+        self.permanent = {} # slot string => {level}
+        self.queued = set() # levels with freed or cancelled slots
+
+    def queued_levels(self, first, last):
+        return sorted(l for l in self.queued if first <= l <= last)
+
+    def name(self, level, name, slot):
+        self.names.setdefault(name, {})[level] = slot
+        self.levels[level]._named_slots.append(name)
+
+    def unname(self, level, name):
+        levels = self.names.get(name)
+        if levels is not None:
+            levels.pop(level, None)
+
+    def lookup(self, level, name):
+        levels = self.names.get(name)
+        if not levels:
+            return None
+        if level in levels:
+            return levels[level]
+        visible = [l for l in levels if l < level]
+        return (levels[max(visible)] if visible else None)
+
+    def status(self, level, slot):
+        # Status of a slot as seen from a scope at the given level. Slots of
+        # scopes nested deeper than that are not visible.
+        found = self.slots.get((slot.index, slot.register_set,))
+        if found is None or found[0] > level:
+            return (None, None,)
+        return found
+
+    def permanent_level(self, level, slot):
+        levels = [l for l in self.permanent.get(slot.to_string(), ()) if l <= level]
+        return (max(levels) if levels else None)
+
 class State:
     def __init__(self, fn, upper = None, parent = None, special = 0, types =
             None):
@@ -203,10 +429,12 @@ class State:
         self._next_slot_index = {
             Register_set.LOCAL: 1,
         }
-        self._named_slots = {}
-        self._allocated_slots = []
-        self._freed_slots = []
-        self._cancelled_slots = []
+        self._named_slots = []              # undo log of names defined in
+                                            # this scope
+        self._allocated_slots = {}          # (index, register set) => None
+        self._allocated_indexes = []        # heap of (negated index, register set)
+        self._freed_slots = Slot_queue()
+        self._cancelled_slots = Slot_queue()
         self._permanent_slots = set()
 
         self._types = (viuact.typesystem.state.State() if types is None else types)
@@ -217,6 +445,11 @@ class State:
         # state.
         self._active = True
 
+        self._table = (Symbol_table() if parent is None else parent._table)
+        self._level = (0 if parent is None else (parent._level + 1))
+        del self._table.levels[self._level:]
+        self._table.levels.append(self)
+
         if parent is not None:
             for k, v in self._parent._next_slot_index.items():
                 self._next_slot_index[k] = v
@@ -233,45 +466,65 @@ class State:
         return result
 
     def push_pressure(self, register_set):
-        if self._parent is None:
-            return
+        # Only the active (innermost) scope allocates slots, so enclosing
+        # scopes never have lower next slot index than the scopes they
+        # enclose. Thus, there is no need to go further than the first scope
+        # which already has high enough next slot index.
         n = self._next_slot_index[register_set]
-        p = self._parent._next_slot_index[register_set]
-        self._parent._next_slot_index[register_set] = max(n, p)
-        self._parent.push_pressure(register_set)
+        each = self._parent
+        while each is not None and each._next_slot_index[register_set] < n:
+            each._next_slot_index[register_set] = n
+            each = each._parent
 
     def push_deallocations(self):
-        if self._parent is None:
-            return
-
-        self._parent._cancelled_slots.extend(self._cancelled_slots)
-        self._cancelled_slots.clear()
-
-        self._parent._freed_slots.extend(self._freed_slots)
-        self._freed_slots.clear()
-
-        self._parent.push_deallocations()
+        # Slots freed and cancelled in this scope and all the enclosing ones
+        # are moved to the outermost scope, in order from the outermost to the
+        # innermost.
+        table = self._table
+        root = table.levels[0]
+        for level in table.queued_levels(1, self._level):
+            each = table.levels[level]
+            table.queued.discard(level)
+            table.queued.add(0)
+            for slot in each._cancelled_slots:
+                table.slots[(slot.index, slot.register_set,)] = (
+                    0, Symbol_table.CANCELLED,)
+            root._cancelled_slots.extend(each._cancelled_slots)
+            each._cancelled_slots.clear()
+
+            for slot in each._freed_slots:
+                table.slots[(slot.index, slot.register_set,)] = (
+                    0, Symbol_table.FREED,)
+            root._freed_slots.extend(each._freed_slots)
+            each._freed_slots.clear()
+
+    def release_slot(self, slot, status):
+        # Remove an allocated slot from the scope (which need not be active)
+        # that owns it.
+        self.remove_allocated(slot)
+        if slot.name in self._table.names:
+            self._table.unname(self._level, slot.name)
+        key = (slot.index, slot.register_set,)
+        self._table.slots[key] = (self._level, status,)
 
     def deallocate_slot(self, slot):
         self.assert_active()
         if slot.is_void():
             return
 
-        try:
-            if slot in self._freed_slots:
-                raise viuact.errors.Double_deallocation(slot)
-            if slot in self._cancelled_slots:
-                raise viuact.errors.Deallocation_of_cancelled(slot)
-            self._allocated_slots.remove((slot.index, slot.register_set,))
-            if slot.name in self._named_slots:
-                del self._named_slots[slot.name]
-            self.remove_type(slot)
-            self._freed_slots.append(slot)
-        except ValueError:
-            if self._parent:
-                self._parent.as_active(State.deallocate_slot, slot)
-            else:
-                raise
+        level, status = self._table.status(self._level, slot)
+        if status == Symbol_table.FREED:
+            raise viuact.errors.Double_deallocation(slot)
+        if status == Symbol_table.CANCELLED:
+            raise viuact.errors.Deallocation_of_cancelled(slot)
+        if status is None:
+            raise ValueError(slot.to_string())
+
+        owner = self._table.levels[level]
+        owner.release_slot(slot, Symbol_table.FREED)
+        owner.as_active(State.remove_type, slot)
+        owner._freed_slots.append(slot)
+        self._table.queued.add(level)
         return self
 
     def deallocate_slot_if_anonymous(self, slot):
@@ -282,6 +535,8 @@ class State:
     def mark_permanent(self, slot):
         self.assert_active()
         self._permanent_slots.add(slot.to_string())
+        self._table.permanent.setdefault(slot.to_string(), set()).add(
+            self._level)
 
     def is_permanent(self, slot):
         return (slot.to_string() in self._permanent_slots)
@@ -291,40 +546,73 @@ class State:
         if slot.is_void():
             return self
 
-        try:
-            if slot in self._cancelled_slots:
-                raise viuact.errors.Double_cancel(slot)
-            if slot in self._freed_slots:
-                raise viuact.errors.Cancel_of_deallocated(slot)
-            if self.is_permanent(slot):
-                return self
-            self._allocated_slots.remove((slot.index, slot.register_set,))
-            if slot.name in self._named_slots:
-                del self._named_slots[slot.name]
-            self._cancelled_slots.append(slot)
-        except ValueError:
-            if self._parent:
-                self._parent.as_active(State.cancel_slot, slot)
-            else:
-                raise
+        # The innermost scope that either owns the slot or marked it as
+        # permanent decides what happens. Ownership is checked first if it is
+        # the same scope.
+        level, status = self._table.status(self._level, slot)
+        permanent = self._table.permanent_level(self._level, slot)
+        if permanent is not None and (status is None or permanent > level):
+            return self
+        if status == Symbol_table.CANCELLED:
+            raise viuact.errors.Double_cancel(slot)
+        if status == Symbol_table.FREED:
+            raise viuact.errors.Cancel_of_deallocated(slot)
+        if status is None:
+            raise ValueError(slot.to_string())
+        if permanent == level:
+            return self
+
+        owner = self._table.levels[level]
+        owner.release_slot(slot, Symbol_table.CANCELLED)
+        owner._cancelled_slots.append(slot)
+        self._table.queued.add(level)
         return self
 
     def find_free_slot(self, register_set):
-        for each in self._cancelled_slots:
-            if each.register_set == register_set:
-                self._cancelled_slots.remove(each)
-                return each
-        for each in self._freed_slots:
-            if each.register_set == register_set:
-                self._freed_slots.remove(each)
-                return each
-        if self._parent is not None:
-            return self._parent.find_free_slot(register_set)
+        table = self._table
+        for level in reversed(table.queued_levels(0, self._level)):
+            each = table.levels[level]
+            found = each._cancelled_slots.pop(register_set)
+            if found is None:
+                found = each._freed_slots.pop(register_set)
+            if not (each._cancelled_slots or each._freed_slots):
+                table.queued.discard(level)
+            if found is not None:
+                del table.slots[(found.index, found.register_set,)]
+                return found
         return None
 
+    def add_allocated(self, index, register_set):
+        self._allocated_slots[(index, register_set,)] = None
+        heapq.heappush(self._allocated_indexes, (-index, register_set.value,))
+        self._table.slots[(index, register_set,)] = (
+            self._level, Symbol_table.ALLOCATED,)
+
+    def remove_allocated(self, slot):
+        try:
+            del self._allocated_slots[(slot.index, slot.register_set,)]
+            return True
+        except KeyError:
+            return False
+
+    def is_allocated(self, slot):
+        return ((slot.index, slot.register_set,) in self._allocated_slots)
+
+    def max_allocated_index(self):
+        # Note that the maximum is taken over all register sets. Indexes of
+        # slots that are no longer allocated are removed from the heap lazily.
+        if not self._allocated_slots:
+            return None
+        indexes = self._allocated_indexes
+        while True:
+            i, r = indexes[0]
+            if (-i, Register_set(r),) in self._allocated_slots:
+                return -i
+            heapq.heappop(indexes)
+
     def insert_allocated(self, slot):
         self.assert_active()
-        self._allocated_slots.append( (slot.index, slot.register_set,) )
+        self.add_allocated(slot.index, slot.register_set)
         return self
 
     def allocate_slot(self, register_set):
@@ -337,21 +625,21 @@ class State:
             self.push_pressure(register_set)
         else:
             i = found_freed.index
-        self._allocated_slots.append( (i, register_set,) )
+        self.add_allocated(i, register_set)
         return i
 
     def all_allocated_slots(self):
-        slots = self._allocated_slots[:]
+        slots = list(self._allocated_slots)
         if self._parent is not None:
             slots.extend(self._parent.all_allocated_slots())
         return slots
     def all_freed_slots(self):
-        slots = self._freed_slots[:]
+        slots = list(self._freed_slots)
         if self._parent is not None:
             slots.extend(self._parent.all_freed_slots())
         return slots
     def all_cancelled_slots(self):
-        slots = self._cancelled_slots[:]
+        slots = list(self._cancelled_slots)
         if self._parent is not None:
             slots.extend(self._parent.all_cancelled_slots())
         return slots
@@ -371,7 +659,7 @@ class State:
 
         # Use None as name to create anonymous slots.
         if name is not None:
-            self._named_slots[name] = slot
+            self._table.name(self._level, name, slot)
 
         return slot
 
@@ -398,30 +686,22 @@ class State:
         return slot.as_disposable()
 
     def slot_of(self, name):
-        try:
-            return self._named_slots[name]
-        except KeyError:
-            if self._parent is None:
-                raise
-            return self._parent.slot_of(name)
+        slot = self._table.lookup(self._level, name)
+        if slot is None:
+            raise KeyError(name)
+        return slot
 
     def name_slot(self, slot, name):
-        x = (slot.index, slot.register_set,)
-        if x not in self._allocated_slots:
-            if self._parent:
-                return self._parent.name_slot(slot, name)
+        level, status = self._table.status(self._level, slot)
+        if status != Symbol_table.ALLOCATED:
             raise KeyError(slot.to_string())
-        self._named_slots[name] = slot
+        self._table.name(level, name, slot)
         return self
 
     def actual_pressure(self, register_set):
         n = self._next_slot_index[register_set]
-        a = self._allocated_slots
-        f = list(filter(
-            lambda i: i.register_set == register_set, self._freed_slots))
-
-        a = (max(list(map(lambda x: x[0], a))) if a else None)
-        f = (max(list(map(lambda x: x.index, f))) if f else None)
+        a = self.max_allocated_index()
+        f = self._freed_slots.max_index(register_set)
 
         if a is not None:
             a = (a + 1)
@@ -464,7 +744,11 @@ class State:
 
     def erase(self):
         self.assert_active()
-        for each in self._allocated_slots:
+        # FIXME Only every other slot is deallocated here. This mimics what
+        # happened when the allocated slots were kept in a list that was
+        # modified while being iterated over. Register allocation (and thus the
+        # generated code) depends on it so it is kept until fixed on purpose.
+        for each in list(self._allocated_slots)[::2]:
             i, r = each
             self.deallocate_slot(Slot(
                 name = None,
@@ -473,6 +757,21 @@ class State:
             ))
         self.push_deallocations()
         self._parent._special = self._special
+        self.rollback()
+
+    def rollback(self):
+        # Remove everything this scope put in the symbol table. Slots that are
+        # still allocated (see the FIXME above) are lost together with the
+        # scope.
+        table = self._table
+        for each in self._allocated_slots:
+            del table.slots[each]
+        for each in self._named_slots:
+            table.unname(self._level, each)
+        for each in self._permanent_slots:
+            table.permanent[each].discard(self._level)
+        table.queued = set(l for l in table.queued if l < self._level)
+        del table.levels[self._level:]
 
     def fn(self):
         return self._fn
@@ -482,44 +781,38 @@ class State:
         self._special += 1
         return n
 
-    def _set_type_of(self, slot, t):
+    def _check_typed_slot(self, slot, what):
         if type(slot) is not Slot:
-            raise TypeError('cannot set type of non-slot {}: {}'.format(
+            raise TypeError('cannot {} type of non-slot {}: {}'.format(
+                what,
                 typeof(slot),
                 slot,
             ))
         if slot.is_void():
-            raise TypeError('cannot set type of void slot')
-        key = slot.to_string()
-        if (slot.index, slot.register_set,) not in self._allocated_slots:
-            raise KeyError(slot.to_string())
-        return self._types.store(key, t)
+            raise TypeError('cannot {} type of void slot'.format(what))
 
-    def _get_type_of(self, slot):
-        if type(slot) is not Slot:
-            raise TypeError('cannot get type of non-slot {}: {}'.format(
-                typeof(slot),
-                slot,
-            ))
-        if slot.is_void():
-            raise TypeError('cannot get type of void slot')
+    def type_of(self, slot, t = None):
+        # Types are stored for slots allocated in the scope or any of the
+        # enclosing ones. Errors are reported the same way they would be by
+        # the outermost scope.
+        self._check_typed_slot(slot, ('get' if t is None else 'set'))
         key = slot.to_string()
-        if (slot.index, slot.register_set,) not in self._allocated_slots:
-            raise viuact.errors.Read_of_untyped_slot(slot)
-        t = self._types.load(key)
-        return t
+        level, status = self._table.status(self._level, slot)
+        allocated = (status == Symbol_table.ALLOCATED)
 
-    def type_of(self, slot, t = None):
+        if t is not None:
+            if not allocated:
+                raise KeyError(slot.to_string())
+            return self._types.store(key, t)
+
+        if not allocated:
+            raise viuact.errors.Read_of_untyped_slot(slot)
         try:
-            if t is None:
-                return self._get_type_of(slot)
-            else:
-                return self._set_type_of(slot, t)
-        except (KeyError, viuact.errors.Read_of_untyped_slot,):
-            if self._parent:
-                return self._parent.type_of(slot, t)
-            else:
+            return self._types.load(key)
+        except KeyError:
+            if level == 0:
                 raise
+            raise viuact.errors.Read_of_untyped_slot(slot)
 
     def remove_type(self, slot):
         self.assert_active()
@@ -564,18 +857,25 @@ class Fn_cc:
         self.body.append(line)
         return self
 
+# Body of a function compiled only to check it (see check()). Instructions are
+# still emitted, because types are inferred while emitting them, but they are
+# thrown away immediately.
+class Fn_check(Fn_cc):
+    def append(self, line):
+        return self
+
 class CC_out:
     def __init__(self, main):
         self.main = main
         self.nested = {}
 
 
-def cc_fn(mod, fn):
-    viuact.util.log.debug('cc.fn: {}::{}/{}'.format(
+def cc_fn(mod, fn, check = False):
+    viuact.util.log.debug('cc.fn: %s::%s/%d',
         mod.name(),
         fn.name(),
         len(fn.parameters()),
-    ))
+    )
 
     fn_name = '{}/{}'.format(fn.name(), len(fn.parameters()))
     main_fn_name = (
@@ -584,7 +884,7 @@ def cc_fn(mod, fn):
         fn_name)
     signature = mod.signature(fn_name)
 
-    viuact.util.log.debug('cc.fn:   {}'.format(
+    viuact.util.log.debug(lambda: 'cc.fn:   {}'.format(
         signature_to_string(fn_name, signature)
     ))
 
@@ -595,11 +895,11 @@ def cc_fn(mod, fn):
         blueprint[t] = types.register_type(t)
 
     if blueprint:
-        viuact.util.log.debug('cc.fn: blueprint = {}'.format(blueprint))
+        viuact.util.log.debug('cc.fn: blueprint = %s', blueprint)
 
     st = State(fn = main_fn_name, types = types)
 
-    main_fn = Fn_cc(main_fn_name)
+    main_fn = (Fn_check if check else Fn_cc)(main_fn_name)
     out = CC_out(main_fn)
 
     for i, each in enumerate(fn.parameters()):
@@ -630,9 +930,10 @@ def cc_fn(mod, fn):
         )
     except Exception:
         viuact.util.log.error('during compilation of {}'.format(main_fn_name))
-        viuact.util.log.error('dumping body emitted so far')
-        for each in main_fn.body:
-            viuact.util.log.raw(each.to_string())
+        if not check:
+            viuact.util.log.error('dumping body emitted so far')
+            for each in main_fn.body:
+                viuact.util.log.raw(each.to_string())
         raise
     if result != result_slot:
         main_fn.append(Move.make_move(
@@ -643,9 +944,9 @@ def cc_fn(mod, fn):
     try:
         return_t = signature['return'].concretise(blueprint)
         result_t = st.type_of(result)
-        viuact.util.log.debug('cc.fn: return_t = {}'.format(
+        viuact.util.log.debug(lambda: 'cc.fn: return_t = {}'.format(
             return_t.to_string()))
-        viuact.util.log.debug('cc.fn: result_t = {}'.format(
+        viuact.util.log.debug(lambda: 'cc.fn: result_t = {}'.format(
             result_t.to_string()))
         st.unify_types(return_t, result_t)
     except viuact.typesystem.state.Cannot_unify:
@@ -669,12 +970,13 @@ def cc_fn(mod, fn):
             'infinite loop encountered during type dump'
         )
 
-    main_fn.body.insert(0, Verbatim(''))
-    main_fn.body.insert(0, Verbatim('allocate_registers %{} local'.format(
-        # st.static_pressure(),
-        st.actual_pressure(Register_set.LOCAL),
-    )))
-    main_fn.append(Verbatim('return'))
+    if not check:
+        main_fn.body.insert(0, Verbatim(''))
+        main_fn.body.insert(0, Verbatim('allocate_registers %{} local'.format(
+            # st.static_pressure(),
+            st.actual_pressure(Register_set.LOCAL),
+        )))
+        main_fn.append(Verbatim('return'))
 
     viuact.util.log.debug('------ 8< ------')
 
@@ -772,7 +1074,7 @@ def signature_of_record_to_string(name, sig, indent):
     fmt = '(type {} {{\n{}\n}})'
 
     fields = []
-    viuact.util.log.raw(sig)
+    viuact.util.log.trace('%s', sig)
     for f, v in sig['fields'].items():
         fields.append((INDENT * (indent + 1)) + '(val {} {})'.format(
             f,
@@ -782,12 +1084,12 @@ def signature_of_record_to_string(name, sig, indent):
     return fmt.format(name, '\n'.join(fields))
 
 
-def cc_impl_prepare_module(module_name, source_file, forms):
+def cc_impl_prepare_module(module_name, source_file, forms, interface = False):
     mod = Module_info(module_name, source_file)
 
     for each in filter(lambda x: type(x) is viuact.forms.Import, forms):
         try:
-            mod.make_import(each.path())
+            mod.make_import(each.path(), each.first_token())
         except Exception:
             viuact.util.log.error('during import of {}'.format(
                 viuact.util.colors.colorise_repr('white', each.path())
@@ -827,25 +1129,37 @@ def cc_impl_prepare_module(module_name, source_file, forms):
 
         if type(fn_spec) is viuact.forms.Fn:
             raise viuact.errors.No_signature_for_function(
-                fn_spec.first_token().at(),
+                fn_spec.first_token(),
                 fn_spec.name(),
             )
 
         if type(fn_spec) is not viuact.forms.Val_fn_spec:
             continue
 
-        fn_impl = forms[i]
+        fn_impl = (forms[i] if i < len(forms) else None)
+
+        # Interface files contain only signatures of functions.
+        if interface and type(fn_impl) is not viuact.forms.Fn:
+            mod.make_fn_signature(
+                name = fn_spec.name(),
+                parameters = [cc_parameter_type(mod, t) for t in fn_spec.parameter_types()],
+                return_type = cc_type(mod, fn_spec.return_type()),
+                template_parameters = [
+                    cc_type(mod, t) for t in fn_spec.template_parameters()],
+            )
+            continue
+
         i += 1
 
         if type(fn_impl) is not viuact.forms.Fn:
             raise viuact.errors.Signature_with_no_implementation(
-                fn_spec.first_token().at(),
+                fn_spec.first_token(),
                 fn_spec.to_string(),
             )
 
         if str(fn_spec.name()) != str(fn_impl.name()):
             raise viuact.errors.Mismatched_val_and_let_function(
-                fn_impl.first_token().at(),
+                fn_impl.first_token(),
                 fn_spec.name(),
                 fn_impl.name(),
             )
@@ -864,17 +1178,408 @@ def cc_impl_prepare_module(module_name, source_file, forms):
 
     return mod
 
-def cc_impl_emit_functions(mod, forms):
-    fns = []
+# Reads of a module (and modules it imports) made while compiling a function.
+# The function's body depends only on its form and on the results of these
+# reads, so they decide whether a cached body may be reused (see
+# cc_impl_emit_functions() and viuact.cache.load_fns()).
+#
+# Reads are recorded as {(route, method, arguments) => value}, where route is
+# the sequence of import paths leading from the compiled module to the module
+# that was read. Reads of things that do not exist are recorded too (as
+# Module_reads.MISSING), as defining them may change the compiled body.
+class Module_reads:
+    MISSING = object()
+
+    def __init__(self, mod, route, reads):
+        self._mod = mod
+        self._route = route
+        self._reads = reads
+
+    def read(self, method, *args):
+        args = tuple(map(str, args))
+        key = (self._route, method, args,)
+        try:
+            value = getattr(self._mod, method)(*args)
+        except KeyError:
+            self._reads[key] = Module_reads.MISSING
+            raise
+        self._reads.setdefault(key, value)
+        return value
+
+    def name(self):
+        return self._mod.name()
+
+    def signature(self, fn_name):
+        return self.read('signature', fn_name)
+
+    def signatures(self):
+        return self.read('signatures')
+
+    def signatures_of(self, base_name):
+        return self.read('signatures_of', base_name)
+
+    def has_fn(self, base_name):
+        return self.read('has_fn', base_name)
+
+    def fns_of(self, base_name):
+        return self.read('fns_of', base_name)
+
+    def is_fn_defined(self, name):
+        return self.read('is_fn_defined', name)
+
+    def enum(self, name):
+        return self.read('enum', name)
+
+    def record(self, name):
+        return self.read('record', name)
+
+    def exception(self, name):
+        return self.read('exception', name)
+
+    def imported(self, path):
+        return Module_reads(
+            self.read('imported', path),
+            self._route + (path,),
+            self._reads,
+        )
+
+# Kinds of values known to stable_digest(), {type => kind}. Values are walked
+# a lot so their kinds are determined once per type.
+stable_digest_kinds = {}
+
+def stable_digest_kind(t):
+    kind = stable_digest_kinds.get(t)
+    if kind is not None:
+        return kind
+
+    if t in (type(None), bool, int, str,) or issubclass(t, enum.Enum):
+        kind = 'atom'
+    elif t in (list, tuple,):
+        kind = 'sequence'
+    elif t is dict:
+        kind = 'dict'
+    elif issubclass(t, viuact.lexemes.Token):
+        kind = 'token'
+    elif issubclass(t, viuact.lexemes.Lexeme):
+        kind = 'lexeme'
+    elif issubclass(t, viuact.forms.Form):
+        kind = 'form'
+    elif t is Module_info:
+        kind = 'module'
+    elif hasattr(t, 'to_string'):
+        kind = 'type'
+    else:
+        kind = 'unknown'
+
+    stable_digest_kinds[t] = kind
+    return kind
+
+def stable_digest(value):
+    # Digest of a value (a form, a signature, a type...) that depends neither on
+    # positions of tokens nor on identities of objects, so it stays the same
+    # when a function is moved inside its source file, or between compiler
+    # invocations.
+    parts = []
+    put = parts.append
+    kinds = stable_digest_kinds
+
+    def walk(x):
+        t = type(x)
+        kind = (kinds.get(t) or stable_digest_kind(t))
+        if kind == 'form':
+            put(t.__qualname__)
+            for k, v in x.__dict__.items():
+                if k != '_first_token':
+                    put(k)
+                    walk(v)
+            put(')')
+        elif kind == 'lexeme':
+            put(t.__qualname__)
+            put(repr(str(x._token)))
+        elif kind == 'atom':
+            put(repr(x))
+        elif kind == 'sequence':
+            put('[')
+            for each in x:
+                walk(each)
+                put(',')
+            put(']')
+        elif kind == 'dict':
+            put('{')
+            for k, v in x.items():
+                walk(k)
+                put(':')
+                walk(v)
+                put(',')
+            put('}')
+        elif kind == 'token':
+            put(repr(str(x)))
+        elif kind == 'module':
+            put('<module {}>'.format(x.name()))
+        elif kind == 'type':
+            put('<{} {}>'.format(type(x).__qualname__, x.to_string()))
+        else:
+            raise TypeError('no stable digest of <{}>'.format(typeof(x)))
+
+    walk(value)
+    return hashlib.sha256(''.join(parts).encode('utf-8')).hexdigest()
+
+# Digests of reads are memoised in a dictionary, {(route, method, arguments) =>
+# digest}, which lives as long as the compilation of one module: many
+# functions read the same things (eg, signatures of commonly called functions)
+# and results of reads do not change while functions are compiled.
+def digest_read(read_digests, key, value):
+    if key not in read_digests:
+        read_digests[key] = (
+            None
+            if value is Module_reads.MISSING else
+            stable_digest(value))
+    return read_digests[key]
+
+def digest_reads(reads, read_digests):
+    # Return None if any of the values cannot be digested. Bodies of functions
+    # which made such reads are not cached.
+    try:
+        return [
+            key + (digest_read(read_digests, key, value),)
+            for key, value
+            in reads.items()
+        ]
+    except TypeError:
+        return None
+
+def reads_valid(mod, reads, read_digests):
+    for route, method, args, digest in reads:
+        key = (route, method, args,)
+        if key not in read_digests:
+            try:
+                m = mod
+                for each in route:
+                    m = m.imported(each)
+                value = getattr(m, method)(*args)
+            except KeyError:
+                value = Module_reads.MISSING
+            try:
+                digest_read(read_digests, key, value)
+            except TypeError:
+                return False
+        if read_digests[key] != digest:
+            return False
+    return True
+
+def cc_fn_recorded(mod, fn, check, read_digests):
+    # Compile a function and, unless read_digests is None, also return digests
+    # of the reads of modules made while compiling it, and records of whatever
+    # was logged while compiling it (it is written out as usual, too).
+    if read_digests is None:
+        return (cc_fn(mod, fn, check), None, None,)
+    reads = {}
+    records = []
+    try:
+        with viuact.util.log.Recorded(records):
+            out = cc_fn(Module_reads(mod, (), reads), fn, check)
+    finally:
+        viuact.util.log.replay(records)
+    return (out, digest_reads(reads, read_digests), records,)
+
+def cc_out_of_lines(name, lines, check):
+    main_fn = (Fn_check if check else Fn_cc)(name)
+    main_fn.body = [Verbatim(line) for line in lines]
+    return CC_out(main_fn)
+
+CODEGEN_SERIAL = 'serial'
+CODEGEN_PARALLEL = 'parallel'
+
+# Engines compile the given functions and yield the results in order, one by
+# one, so that the caller may interleave them with cached functions.
+def emit_functions_serial(mod, fns, check, read_digests):
+    for each in fns:
+        yield cc_fn_recorded(mod, each, check, read_digests)
+
+# Functions of a module are compiled independently of each other: every one of
+# them gets its own type state and its own slots, and only reads the prepared
+# module. Functions of big modules can thus be compiled by a pool of worker
+# processes.
+#
+# Workers get their own copy of the prepared module when they are started, and
+# send back rendered instructions of the functions (and whatever they logged
+# while compiling them). Results are put together in source order so the output
+# (and the log) is the same as in a serial build.
+#
+# If a function fails to compile it is compiled again in the parent process.
+# Functions before it were compiled successfully so the error raised is the
+# same as in a serial build.
+PARALLEL_MIN_FNS = 32
+PARALLEL_PIECES_PER_JOB = 4
+
+parallel_worker_args = None
+
+def parallel_worker_init(mod, fns, check, read_digests):
+    global parallel_worker_args
+    parallel_worker_args = (mod, fns, check, read_digests,)
+
+def parallel_worker_emit(i):
+    mod, fns, check, read_digests = parallel_worker_args
+    records = []
+    try:
+        with viuact.util.log.Recorded(records):
+            out, reads, _ = cc_fn_recorded(mod, fns[i], check, read_digests)
+    except Exception:
+        # Leave reporting the error to the parent process.
+        return None
+    return (
+        out.main.name,
+        [each.to_string() for each in out.main.body],
+        records,
+        reads,
+    )
+
+def emit_functions_parallel(mod, fns, check, read_digests, jobs = None):
+    if len(fns) < PARALLEL_MIN_FNS:
+        yield from emit_functions_serial(mod, fns, check, read_digests)
+        return
+
+    jobs = (jobs or os.cpu_count() or 1)
+    chunk = max(1, len(fns) // (jobs * PARALLEL_PIECES_PER_JOB))
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers = jobs,
+            initializer = parallel_worker_init,
+            initargs = (mod, fns, check, read_digests,)) as executor:
+        results = executor.map(
+            parallel_worker_emit,
+            range(len(fns)),
+            chunksize = chunk,
+        )
+        for each, result in zip(fns, results):
+            if result is None:
+                yield cc_fn_recorded(mod, each, check, read_digests)
+                continue
+
+            name, body, records, reads = result
+            viuact.util.log.replay(records)
+            yield (
+                cc_out_of_lines(name, body, check),
+                reads,
+                (records if reads is not None else None),
+            )
+
+CODEGEN_ENGINES = {
+    CODEGEN_SERIAL: emit_functions_serial,
+    CODEGEN_PARALLEL: emit_functions_parallel,
+}
+
+def cc_impl_emit_functions(mod, forms, check = False, engine = None):
+    if engine is None:
+        engine = viuact.env.codegen_engine(CODEGEN_SERIAL)
+    if engine not in CODEGEN_ENGINES:
+        raise viuact.env.Invalid_environment_variable(
+            'VIUACT_CODEGEN', engine)
+
+    raw = list(filter(lambda x: type(x) is viuact.forms.Fn, forms))
+
+    # Bodies of functions are cached (see viuact.cache) so after an edit only
+    # the functions affected by it are compiled again. Checking does not use
+    # the cache.
+    #
+    # Whatever was logged while compiling a function (eg, warnings) is cached
+    # with its body and written again when the body is reused, in source order,
+    # so the log is the same as if the function was compiled. The log depends
+    # on the log level so bodies cached at a different level are not reused.
+    read_digests = (
+        {}
+        if (not check and viuact.env.cache_enabled()) else
+        None)
+    digests = [None] * len(raw)
+    outs = [None] * len(raw)
+    cached = {}
+    entries = {}
+    if read_digests is not None:
+        cached = viuact.cache.load_fns(mod.name(), mod.source_file())
+        for i, each in enumerate(raw):
+            try:
+                digests[i] = stable_digest(each)
+            except TypeError:
+                continue
+
+            entry = cached.get(digests[i])
+            if entry is None:
+                continue
+            if entry.get('level') != viuact.util.log.log_level:
+                continue
+            if not reads_valid(mod, entry['reads'], read_digests):
+                viuact.util.log.debug('cache: stale body of %s', entry['name'])
+                continue
+
+            entries[digests[i]] = entry
+            outs[i] = cc_out_of_lines(entry['name'], entry['body'], check)
 
-    for each in filter(lambda x: type(x) is viuact.forms.Fn, forms):
-        out = cc_fn(mod, each)
-        fns.append({ 'name': out.main.name, 'out': out, 'raw': each, })
+    misses = [i for i, each in enumerate(outs) if each is None]
+    compiled = CODEGEN_ENGINES[engine](
+        mod,
+        [raw[i] for i in misses],
+        check,
+        read_digests,
+    )
+
+    # Functions before index replayed were either compiled or had their log
+    # written again.
+    replayed = 0
+    def replay(until):
+        nonlocal replayed
+        for i in range(replayed, until):
+            viuact.util.log.replay(entries[digests[i]]['log'])
+        replayed = until
+
+    for i in misses:
+        replay(i)
+        out, reads, log = next(compiled)
+        replayed = (i + 1)
+
+        outs[i] = out
+        if reads is None or digests[i] is None:
+            continue
 
-    return fns
+        # Instructions are rendered once, for both the cache and the output.
+        lines = [each.to_string() for each in out.main.body]
+        entries[digests[i]] = {
+            'name': out.main.name,
+            'body': lines,
+            'reads': reads,
+            'log': log,
+            'level': viuact.util.log.log_level,
+        }
+        outs[i] = cc_out_of_lines(out.main.name, lines, check)
+    compiled.close()
+    replay(len(raw))
+
+    # Bodies of functions that are no longer in the module are dropped.
+    if read_digests is not None and entries != cached:
+        viuact.cache.store_fns(mod.name(), mod.source_file(), entries)
+
+    return [
+        { 'name': out.main.name, 'out': out, 'raw': each, }
+        for each, out
+        in zip(raw, outs)
+    ]
+
+# Files whose contents did not change are not written again, so their
+# modification times stay the same and tools like make do not rebuild things
+# depending on them. Return true if the file was written.
+def write_if_changed(path, contents):
+    try:
+        with open(path, 'rb') as ifstream:
+            if ifstream.read() == contents:
+                return False
+    except FileNotFoundError:
+        pass
+
+    with open(path, 'wb') as ofstream:
+        ofstream.write(contents)
+    return True
 
 def cc_impl_save_implementation(mod, fns, build_directory, output_file):
-    with open(os.path.join(build_directory, output_file), 'w') as ofstream:
+    with io.StringIO() as ofstream:
         print = lambda s: ofstream.write('{}\n'.format(s))
         for each in mod.imports():
             print('.import: [[static]] {}'.format(each))
@@ -900,21 +1605,25 @@ def cc_impl_save_implementation(mod, fns, build_directory, output_file):
                 print('    {}'.format(line.to_string()))
             print('.end')
 
+        return write_if_changed(
+            os.path.join(build_directory, output_file),
+            ofstream.getvalue().encode('utf-8'),
+        )
+
 def cc_impl_save_interface(mod, file_paths, roots):
     source_file, output_file = file_paths
     source_root, build_directory = roots
 
-    src_interface_file = '{}.vti'.format(source_file.rsplit('.', maxsplit=1)[0])
-    out_interface_file = '{}.vti'.format(output_file.rsplit('.', maxsplit=1)[0])
+    # Modules importing this one only need to be compiled again if its
+    # interface changes so the interface file is left alone if it did not.
+    src_interface_file = interface_file_of(source_file)
+    out_interface_file = interface_file_of(output_file)
+    out_interface_path = os.path.join(build_directory, out_interface_file)
     if os.path.isfile(os.path.join(source_root, src_interface_file)):
-        shutil.copyfile(
-            src = os.path.join(source_root, src_interface_file),
-            dst = os.path.join(build_directory, out_interface_file),
-        )
-        return
+        with open(os.path.join(source_root, src_interface_file), 'rb') as ifstream:
+            return write_if_changed(out_interface_path, ifstream.read())
 
-    out_interface_path = os.path.join(build_directory, out_interface_file)
-    with open(out_interface_path, 'w') as ofstream:
+    with io.StringIO() as ofstream:
         print = lambda s: ofstream.write('{}\n'.format(s))
         print(';')
         print('; This interface file was automatically generated.')
@@ -936,16 +1645,44 @@ def cc_impl_save_interface(mod, file_paths, roots):
             sig = mod.signature(fn)
             print(signature_to_string(sig['base_name'], sig))
 
-def cc(source_root, source_file, module_name, forms, build_directory):
+        return write_if_changed(
+            out_interface_path,
+            ofstream.getvalue().encode('utf-8'),
+        )
+
+def interface_file_of(path):
+    return '{}.vti'.format(path.rsplit('.', maxsplit=1)[0])
+
+def output_file_of(source_file):
     base_output_file = (os.path.splitext(source_file)[0] + '.asm')
-    output_file = os.path.normpath(base_output_file)
+    return os.path.normpath(base_output_file)
+
+def cc_impl_inputs(source_root, source_file, module_name):
+    # Interface files put next to source files are copied instead of being
+    # generated, so they are inputs too (even if they do not exist yet).
+    inputs = [os.path.join(source_root, source_file)]
+    if module_name != EXEC_MODULE:
+        inputs.append(os.path.join(source_root, interface_file_of(source_file)))
+    return [os.path.abspath(each) for each in inputs]
+
+def up_to_date(source_root, source_file, module_name, build_directory):
+    # See viuact.manifest for what it means for a module to be up to date.
+    return viuact.manifest.up_to_date(
+        build_directory,
+        output_file_of(source_file),
+        cc_impl_inputs(source_root, source_file, module_name),
+        resolve = find_interface_file,
+    )
 
-    viuact.util.log.debug('cc: [{}]/{} -> {}/{}'.format(
+def cc(source_root, source_file, module_name, forms, build_directory):
+    output_file = output_file_of(source_file)
+
+    viuact.util.log.debug('cc: [%s]/%s -> %s/%s',
         source_root,
         source_file,
         build_directory,
         output_file,
-    ))
+    )
 
     mod = cc_impl_prepare_module(module_name, source_file, forms)
     fns = cc_impl_emit_functions(mod, forms)
@@ -953,10 +1690,34 @@ def cc(source_root, source_file, module_name, forms, build_directory):
     output_directory = os.path.split(os.path.join(build_directory, output_file))[0]
     os.makedirs(output_directory, exist_ok = True)
 
+    outputs = [output_file]
     cc_impl_save_implementation(mod, fns, build_directory, output_file)
     if module_name != EXEC_MODULE:
-        cc_impl_save_interface(
+        outputs.append(interface_file_of(output_file))
+        changed = cc_impl_save_interface(
             mod,
             (source_file, output_file,),
             (source_root, build_directory,),
         )
+        if changed:
+            # The interface may have been written to one of the library roots,
+            # and modules compiled later in the same session may import it.
+            viuact.library.forget()
+            module_registry().forget(module_name)
+
+    viuact.manifest.record(build_directory, output_file, viuact.manifest.make_entry(
+        build_directory,
+        cc_impl_inputs(source_root, source_file, module_name),
+        mod.dependencies(),
+        outputs,
+    ))
+
+def check(source_file, module_name, forms):
+    # Check a module without producing any output: signatures are prepared, and
+    # types are inferred and unified for every function, but no files are
+    # written. Errors are reported by raising exceptions, just as for cc().
+    viuact.util.log.debug('check: %s', source_file)
+
+    mod = cc_impl_prepare_module(module_name, source_file, forms)
+    cc_impl_emit_functions(mod, forms, check = True)
+    return mod
@@ -0,0 +1,299 @@
+import concurrent.futures
+import os
+import traceback
+
+import viuact.core
+import viuact.env
+import viuact.errors
+import viuact.forms
+import viuact.lexer
+import viuact.library
+import viuact.parser
+import viuact.typesystem.t
+import viuact.util.colors
+import viuact.util.log
+
+
+# Driver of the compiler: compiles (or checks) batches of source files, either
+# one after another in the current process, or spread over a pool of worker
+# processes.
+#
+# A unit is a source file ready to be compiled, ie. lexed and parsed, with its
+# module name determined. Units are compiled in an order in which every module
+# is compiled before modules that import it, so that its interface file is
+# written before it is needed.
+
+SOURCE_KIND_EXEC = 'exec'
+SOURCE_KIND_LINK = 'link'
+
+
+def report_error(source_file_name, e, human = True):
+    viuact.util.log.error(
+        s = e.what(),
+        path = source_file_name,
+        pos = e.at(human = human),
+    )
+    for each in e.notes():
+        viuact.util.log.note(
+            s = each,
+            path = source_file_name,
+            pos = e.at(human = human),
+        )
+
+    for each in e.fallout():
+        report_error(source_file_name, e, human)
+
+def determine_source_kind(source_file):
+    file_name = os.path.split(source_file)[1]
+    if (file_name[0].isupper() or file_name == 'mod.vt'):
+        return SOURCE_KIND_LINK
+    return SOURCE_KIND_EXEC
+
+def determine_module_name(source_kind, source_file):
+    return (
+        viuact.core.EXEC_MODULE
+        if (source_kind == SOURCE_KIND_EXEC) else
+        source_file.rsplit('.', maxsplit = 1)[0].replace('/', '::')
+    )
+
+def find_source_files(source_root):
+    source_files = []
+    for root, dirs, files in os.walk(source_root):
+        # Hidden directories (eg, the cache) never contain source files.
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        source_files.extend(sorted(
+            os.path.relpath(os.path.join(root, each), source_root)
+            for each
+            in files
+            if each.endswith('.vt')
+        ))
+    return source_files
+
+def load_unit(source_root, source_file):
+    source_full_path = os.path.join(source_root, source_file)
+    if not os.path.isfile(source_full_path):
+        viuact.util.log.error('not a file: {}'.format(
+            viuact.util.colors.colorise_repr('white', source_full_path)))
+        return None
+
+    with open(source_full_path, 'r') as ifstream:
+        source_text = ifstream.read()
+
+    try:
+        forms = viuact.parser.parse(viuact.lexer.lex(source_text))
+    except viuact.errors.Error as e:
+        report_error(source_file, e, human = True)
+        return None
+
+    return {
+        'source_root': source_root,
+        'source_file': source_file,
+        'module_name': determine_module_name(
+            determine_source_kind(source_file),
+            source_file,
+        ),
+        'forms': forms,
+    }
+
+def imports_of(unit):
+    return [
+        each.path()
+        for each
+        in unit['forms']
+        if type(each) is viuact.forms.Import
+    ]
+
+def order_units(units):
+    # Interfaces of modules must be written before modules importing them are
+    # compiled, so put every module after the modules it imports. Otherwise,
+    # keep the order in which the files were given.
+    modules = {
+        each['module_name'] : each
+        for each
+        in units
+        if each['module_name'] != viuact.core.EXEC_MODULE
+    }
+
+    ordered = []
+    visited = set()
+    def visit(unit):
+        key = (unit['source_root'], unit['source_file'],)
+        if key in visited:
+            return
+        visited.add(key)
+        for each in imports_of(unit):
+            if each in modules:
+                visit(modules[each])
+        ordered.append(unit)
+
+    for each in units:
+        visit(each)
+    return ordered
+
+def check_unit(unit):
+    viuact.core.check(
+        unit['source_file'],
+        unit['module_name'],
+        unit['forms'],
+    )
+
+def compile_unit(unit):
+    if viuact.core.up_to_date(
+            unit['source_root'],
+            unit['source_file'],
+            unit['module_name'],
+            viuact.env.output_directory()):
+        viuact.util.log.debug('cc: up to date: %s', unit['source_file'])
+        return
+    viuact.core.cc(
+        unit['source_root'],
+        unit['source_file'],
+        unit['module_name'],
+        unit['forms'],
+        viuact.env.output_directory(),
+    )
+
+def run_unit(unit, action):
+    try:
+        action(unit)
+    except viuact.errors.Error as e:
+        report_error(unit['source_file'], e, human = True)
+        return False
+    except Exception:
+        # A crash of the compiler on one file must not prevent other files
+        # from being compiled.
+        viuact.util.log.error('internal compiler error', path = unit['source_file'])
+        traceback.print_exc()
+        return False
+    finally:
+        viuact.typesystem.t.forget_interned_types()
+    return True
+
+def run_serial(units, action):
+    # All units are processed in the same compilation session so modules
+    # imported by many of them are prepared only once.
+    success = True
+    for each in units:
+        success = (run_unit(each, action) and success)
+    return success
+
+def parallel_worker_run(source_root, source_file, action):
+    # Other workers may have written interface files since this one last
+    # looked for them. Modules prepared by this worker stay valid though: a
+    # unit is only dispatched after all modules it imports were compiled.
+    viuact.library.forget()
+
+    # Forms are not sent to workers. Parsing them again is cheaper than
+    # pickling them.
+    unit = load_unit(source_root, source_file)
+    if unit is None:
+        return False
+    return run_unit(unit, action)
+
+def run_parallel(units, action, jobs):
+    # Units are nodes of the import graph. A unit is dispatched to a worker as
+    # soon as all the modules it imports (that are compiled in the same batch)
+    # are compiled, so independent modules are compiled in parallel.
+    modules = {
+        each['module_name'] : i
+        for i, each
+        in enumerate(units)
+        if each['module_name'] != viuact.core.EXEC_MODULE
+    }
+    waiting_for = [
+        set(modules[m] for m in imports_of(each) if modules.get(m, i) != i)
+        for i, each
+        in enumerate(units)
+    ]
+    dependants = [[] for _ in units]
+    for i, each in enumerate(waiting_for):
+        for d in each:
+            dependants[d].append(i)
+
+    success = True
+    pending = list(range(len(units)))
+    running = {}
+
+    # A unit that could not be compiled because of a failure of the worker
+    # (not of the compiler) is reported as failed, and units importing it are
+    # not compiled at all. If the pool itself is broken (eg, a worker was
+    # killed) no more units can be dispatched, so the ones not dispatched yet
+    # are reported as not compiled.
+    def fail(i, reason):
+        failed = [(i, reason,)]
+        while failed:
+            i, reason = failed.pop()
+            report_error(
+                units[i]['source_file'],
+                viuact.errors.Fail((0, 0,), reason),
+            )
+            for each in dependants[i]:
+                if each in pending:
+                    pending.remove(each)
+                    failed.append((each, 'not compiled: {} was not compiled'.format(
+                        units[i]['module_name']),))
+    broken = False
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        while pending or running:
+            if broken:
+                while pending:
+                    fail(pending.pop(0), 'not compiled: worker processes died')
+                if not running:
+                    break
+
+            ready = [i for i in pending if not waiting_for[i]]
+            if not ready and not running:
+                # Only modules importing each other are left. Compile them in
+                # order, just as a serial build would.
+                ready = pending[:1]
+
+            for i in ready:
+                pending.remove(i)
+                future = executor.submit(
+                    parallel_worker_run,
+                    units[i]['source_root'],
+                    units[i]['source_file'],
+                    action,
+                )
+                running[future] = i
+
+            done, _ = concurrent.futures.wait(
+                running,
+                return_when = concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                i = running.pop(future)
+                try:
+                    success = (future.result() and success)
+                except Exception as e:
+                    success = False
+                    broken = (broken or isinstance(
+                        e, concurrent.futures.process.BrokenProcessPool))
+                    fail(i, 'internal compiler error: {}: {}'.format(
+                        type(e).__name__, e))
+                    continue
+                for each in dependants[i]:
+                    waiting_for[each].discard(i)
+
+    return success
+
+def run(inputs, action, jobs = 1):
+    # Inputs are (source root, source file) pairs. Return value is the exit
+    # code of the compiler.
+    units = []
+    success = True
+    for source_root, source_file in inputs:
+        unit = load_unit(source_root, source_file)
+        if unit is None:
+            success = False
+            continue
+        units.append(unit)
+
+    units = order_units(units)
+    if jobs > 1 and len(units) > 1:
+        success = (run_parallel(units, action, jobs) and success)
+    else:
+        success = (run_serial(units, action) and success)
+
+    return (0 if success else 1)
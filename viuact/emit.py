@@ -145,7 +145,7 @@ def emit_builtin_call(mod, body, st, result, form):
     if form.callee_name() == 'print':
         if len(form.arguments()) != 1:
             raise viuact.errors.Invalid_arity(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 s = 'print',
             ).note('expected {} argument(s), got {}'.format(
                 1,
@@ -167,7 +167,7 @@ def emit_builtin_call(mod, body, st, result, form):
             arg_t = sc.type_of(slot)
             if arg_t == viuact.typesystem.t.Void():
                 raise viuact.errors.Read_of_void(
-                    pos = form.arguments()[0].first_token().at(),
+                    pos = form.arguments()[0].first_token(),
                     by = 'print function',
                 )
 
@@ -183,7 +183,7 @@ def emit_builtin_call(mod, body, st, result, form):
     elif form.callee_name() == 'Copy::copy':
         if len(form.arguments()) != 1:
             raise viuact.errors.Invalid_arity(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 s = 'Copy::copy',
             ).note('expected {} argument(s), got {}'.format(
                 1,
@@ -201,7 +201,7 @@ def emit_builtin_call(mod, body, st, result, form):
             arg_t = sc.type_of(slot)
             if arg_t == viuact.typesystem.t.Void():
                 raise viuact.errors.Read_of_void(
-                    pos = form.arguments()[0].first_token().at(),
+                    pos = form.arguments()[0].first_token(),
                     by = 'Copy::copy function',
                 )
 
@@ -231,7 +231,7 @@ def emit_indirect_fn_call(mod, body, st, result, form):
     called_fn_name = 'from variable {}'.format(name)
     if len(fn_t.parameter_types()) != len(form.arguments()):
         e = viuact.errors.Invalid_arity(
-            form.to().name().tok().at(),
+            form.to().name().tok(),
             s = called_fn_name,
         ).note('expected {} argument(s), got {}'.format(
             viuact.util.colors.colorise('white', len(fn_t.parameter_types())),
@@ -261,20 +261,20 @@ def emit_indirect_fn_call(mod, body, st, result, form):
 
         if len(got_positional) < len(need_positional):
             raise viuact.errors.Missing_positional_argument(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
                 need_positional[len(got_positional)],
             ).note('function signature: {}'.format(fn_t.to_string()))
         if len(got_positional) > len(need_positional):
             raise viuact.errors.Too_many_positional_arguments(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
                 (len(need_positional), len(got_positional),),
             ).note('function signature: {}'.format(fn_t.to_string()))
         for param_name, param_value in need_labelled:
             if str(param_name) not in got_labelled:
                 raise viuact.errors.Missing_labelled_argument(
-                    form.to().name().tok().at(),
+                    form.to().name().tok(),
                     called_fn_name,
                     str(param_name),
                 ).note('function signature: {}'.format(fn_t.to_string()))
@@ -311,7 +311,7 @@ def emit_indirect_fn_call(mod, body, st, result, form):
                 st.unify_types(param_t.t(), arg_t)
             except viuact.typesystem.state.Cannot_unify:
                 raise viuact.errors.Bad_argument_type(
-                    arg.first_token().at(),
+                    arg.first_token(),
                     called_fn_name,
                     (
                         viuact.util.colors.colorise_wrap('white',
@@ -344,10 +344,10 @@ def emit_indirect_fn_call(mod, body, st, result, form):
     return result
 
 def get_fn_candidates(form, mod):
-    viuact.util.log.raw('fn candidates for: {} ({})'.format(
+    viuact.util.log.trace('fn candidates for: %s (%s)',
         form.to(),
         typeof(form.to()),
-    ))
+    )
 
     basic_name = (
            (type(form.to()) is viuact.lexemes.Name)
@@ -364,27 +364,22 @@ def get_fn_candidates(form, mod):
             arity = len(form.arguments()),
         )
 
-        candidates = list(filter(
-            lambda each: (each.split('/')[0] == base_name),
-            mod.signatures(),
-        ))
+        candidates = mod.signatures_of(base_name)
         if not candidates:
             raise viuact.errors.Unknown_function(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
             )
 
-        candidates = list(map(lambda each: mod.signature(each), candidates))
-
-        viuact.util.log.raw('candidates: {}'.format(candidates))
+        viuact.util.log.trace('candidates: %s', candidates)
         return candidates, mod, called_fn_name, mangled_fn_name
 
     if type(form.to()) is viuact.forms.Name_path:
         called_mod_path = '::'.join(map(str, form.to().mod()))
-        viuact.util.log.raw('called mod path = {}'.format(called_mod_path))
+        viuact.util.log.trace('called mod path = %s', called_mod_path)
 
         called_mod = mod.imported(called_mod_path)
-        viuact.util.log.raw('called mod = {}'.format(called_mod))
+        viuact.util.log.trace('called mod = %s', called_mod)
 
         base_name = str(form.to().name().tok())
         called_fn_name = '{name}/{arity}'.format(
@@ -396,21 +391,18 @@ def get_fn_candidates(form, mod):
             arity = len(form.arguments()),
         )
 
-        viuact.util.log.raw('x', called_fn_name)
-        viuact.util.log.raw('y', list(map(type, called_mod.signatures())))
-        candidates = list(filter(
-            lambda each: (each.split('/')[0] == base_name),
-            called_mod.signatures(),
-        ))
-        viuact.util.log.raw('z', candidates)
+        viuact.util.log.trace('x %s', called_fn_name)
+        viuact.util.log.trace(lambda: 'y {}'.format(
+            list(map(type, called_mod.signatures()))))
+        candidates = called_mod.signatures_of(base_name)
+        viuact.util.log.trace(lambda: 'z {}'.format(
+            list(map(lambda _: '{}/{}'.format(base_name, _['arity']), candidates))))
         if not candidates:
             raise viuact.errors.Unknown_function(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
             )
 
-        candidates = list(map(lambda each: called_mod.signature(each), candidates))
-
         return candidates, called_mod, called_fn_name, '{}::{}'.format(
             called_mod_path,
             mangled_fn_name,
@@ -430,7 +422,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
     )))
     if signature is None:
         e = viuact.errors.Invalid_arity(
-            form.to().name().tok().at(),
+            form.to().name().tok(),
             called_fn_name,
         )
         for each in candidates:
@@ -451,11 +443,11 @@ def emit_direct_fn_call(mod, body, st, result, form):
     type_signature = called_mod.signature(called_fn_name)
     if (called_mod.name() == mod.name()) and not mod.is_fn_defined(called_fn_name):
         raise viuact.errors.Call_to_undefined_function(
-            form.to().name().tok().at(),
+            form.to().name().tok(),
             called_fn_name,
         )
 
-    viuact.util.log.debug('fn.call: sig = {}'.format(type_signature))
+    viuact.util.log.debug('fn.call: sig = %s', type_signature)
 
     args = []
     if True:
@@ -477,20 +469,20 @@ def emit_direct_fn_call(mod, body, st, result, form):
 
         if len(got_positional) < len(need_positional):
             raise viuact.errors.Missing_positional_argument(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
                 need_positional[len(got_positional)],
             ).note('function signature: {}'.format(type_signature.to_string()))
         if len(got_positional) < len(need_positional):
             raise viuact.errors.Too_many_positional_arguments(
-                form.to().name().tok().at(),
+                form.to().name().tok(),
                 called_fn_name,
                 (len(need_positional), len(got_positional),),
             ).note('function signature: {}'.format(type_signature.to_string()))
         for param_name, param_value in need_labelled:
             if str(param_name) not in got_labelled:
                 raise viuact.errors.Missing_labelled_argument(
-                    form.to().name().tok().at(),
+                    form.to().name().tok(),
                     called_fn_name,
                     str(param_name),
                 ).note('function signature: {}'.format(type_signature.to_string()))
@@ -505,9 +497,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
     tmp = {}
     for each in type_signature['template_parameters']:
         tmp[viuact.typesystem.t.Template(each.name()[1:])] = st.register_template_variable(each)
-    viuact.util.log.debug('fn.call: polymorphic blueprint = {}'.format(
-        tmp,
-    ))
+    viuact.util.log.debug('fn.call: polymorphic blueprint = %s', tmp)
 
     for _, each in type_signature['parameters']:
         if type(each) is viuact.typesystem.t.Value:
@@ -522,7 +512,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
                 typeof(each),
             ))
             raise None
-    viuact.util.log.debug('fn.call: parameter types = {}'.format(
+    viuact.util.log.debug(lambda: 'fn.call: parameter types = {}'.format(
         ' '.join(map(lambda _: _.to_string(), parameter_types)),
     ))
 
@@ -554,7 +544,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
                 argument_types.append(st.unify_types(param_t, arg_t))
             except viuact.typesystem.state.Cannot_unify:
                 raise viuact.errors.Bad_argument_type(
-                    arg.first_token().at(),
+                    arg.first_token(),
                     called_fn_name,
                     (i + 1),
                     st._types.stringify_type(param_t, human_readable = True),
@@ -565,7 +555,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
             # reporting?
             sc.deallocate_slot(slot)
 
-    viuact.util.log.debug('fn.call: argument types = {}'.format(
+    viuact.util.log.debug(lambda: 'fn.call: argument types = {}'.format(
         ' '.join(map(lambda _: _.to_string(), argument_types)),
     ))
     # viuact.util.log.debug('fn.call: type state = ↲')
@@ -575,7 +565,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
     # to assign type to a void).
     if not result.is_void():
         return_t = type_signature['return'].concretise(tmp)
-        viuact.util.log.debug('fn.call: return_t = {}'.format(
+        viuact.util.log.debug(lambda: 'fn.call: return_t = {}'.format(
             return_t.to_string(),
         ))
 
@@ -583,7 +573,7 @@ def emit_direct_fn_call(mod, body, st, result, form):
         if return_t.polymorphic():
             result_t = st._types.variable(return_t)
 
-        viuact.util.log.debug('fn.call: result_t = {}'.format(
+        viuact.util.log.debug(lambda: 'fn.call: result_t = {}'.format(
             result_t.to_string(),
         ))
         st.type_of(result, result_t)
@@ -616,7 +606,7 @@ def emit_fn_call(mod, body, st, result, form):
 def emit_operator_concat(mod, body, st, result, expr):
     if len(expr.arguments()) < 2:
         raise viuact.errors.Invalid_arity(
-            pos = expr.operator().tok().at(),
+            pos = expr.operator().tok(),
             s = str(expr.operator()),
             kind = viuact.errors.Invalid_arity.OPERATOR,
         ).note('expected at least 2 arguments, got {}'.format(
@@ -645,7 +635,7 @@ def emit_operator_concat(mod, body, st, result, expr):
         )
 
         lhs_t = sc.type_of(lhs_slot)
-        viuact.util.log.debug('op.concat: 1st [{}] arg_t = {}'.format(
+        viuact.util.log.debug(lambda: 'op.concat: 1st [{}] arg_t = {}'.format(
             lhs_slot.to_string(),
             lhs_t.to_string(),
         ))
@@ -659,7 +649,7 @@ def emit_operator_concat(mod, body, st, result, expr):
             )))
 
         rhs_t = sc.type_of(rhs_slot)
-        viuact.util.log.debug('op.concat: 2nd [{}] arg_t = {}'.format(
+        viuact.util.log.debug(lambda: 'op.concat: 2nd [{}] arg_t = {}'.format(
             rhs_slot.to_string(),
             rhs_t.to_string(),
         ))
@@ -687,7 +677,7 @@ def emit_operator_concat(mod, body, st, result, expr):
                 expr = each,
             )
             arg_t = sc.type_of(rhs_slot)
-            viuact.util.log.debug('op.concat: {}th [{}] arg_t = {}'.format(
+            viuact.util.log.debug(lambda: 'op.concat: {}th [{}] arg_t = {}'.format(
                 (i + 3),
                 rhs_slot.to_string(),
                 arg_t.to_string(),
@@ -713,7 +703,7 @@ def emit_operator_concat(mod, body, st, result, expr):
 def emit_arithmetic_operator(mod, body, st, result, expr):
     if len(expr.arguments()) < 2:
         raise viuact.errors.Invalid_arity(
-            pos = expr.operator().tok().at(),
+            pos = expr.operator().tok(),
             s = str(expr.operator()),
             kind = viuact.errors.Invalid_arity.OPERATOR,
         ).note('expected at least 2 arguments, got {}'.format(
@@ -758,7 +748,7 @@ def emit_arithmetic_operator(mod, body, st, result, expr):
         ret_t = sc.type_of(lhs_slot)
         if not Type.Int.is_integer_type(ret_t):
             raise viuact.errors.Type_mismatch(
-                pos = args[0].first_token().at(),
+                pos = args[0].first_token(),
                 a = '<any integer type>',
                 b = ret_t.to_string(),
             ).note('arithmetic operator {} requires integer operands'.format(
@@ -793,7 +783,7 @@ def emit_arithmetic_operator(mod, body, st, result, expr):
 def emit_comparison_operator(mod, body, st, result, expr):
     if len(expr.arguments()) != 2:
         raise viuact.errors.Invalid_arity(
-            pos = expr.operator().tok().at(),
+            pos = expr.operator().tok(),
             s = str(expr.operator()),
             kind = viuact.errors.Invalid_arity.OPERATOR,
         ).note('expected 2 arguments, got {}'.format(
@@ -926,7 +916,7 @@ def emit_enum_ctor_call(mod, body, st, result, form):
         )
     except KeyError:
         raise viuact.errors.Unknown_enum(
-            enum_name.tok().at(),
+            enum_name.tok(),
             enum_name,
         )
 
@@ -934,7 +924,7 @@ def emit_enum_ctor_call(mod, body, st, result, form):
         field = enum['fields'][str(enum_field)]
     except KeyError:
         raise viuact.errors.Invalid_enum_field(
-            enum_field.tok().at(),
+            enum_field.tok(),
             enum_name,
             enum_field,
         )
@@ -1163,7 +1153,7 @@ def emit_if(mod, body, st, result, expr):
 def emit_match(mod, body, st, result, expr):
     if not expr.arms():
         raise viuact.errors.Match_with_no_arms(
-            expr.first_token().at(),
+            expr.first_token(),
         )
 
     guard_slot = st.get_slot(name = None)
@@ -1363,7 +1353,7 @@ def emit_match(mod, body, st, result, expr):
             if ((str(field.name()) not in matched_fields) and not
                     catchall_encountered):
                 raise viuact.errors.Missing_with_clause(
-                    expr.guard().first_token().at(),
+                    expr.guard().first_token(),
                     str(field.name()),
                     str(guard_t.name()),
                 )
@@ -1372,7 +1362,7 @@ def emit_match(mod, body, st, result, expr):
         for field in matched_tags:
             if str(field) in already_matched:
                 raise viuact.errors.Duplicated_with_clause(
-                    field.tok().at(),
+                    field.tok(),
                     str(field),
                     str(guard_t.name()),
                 )
@@ -1380,7 +1370,7 @@ def emit_match(mod, body, st, result, expr):
 
         if not catchall_encountered:
             raise viuact.errors.Mismatched_with_clauses(
-                expr.guard().first_token().at(),
+                expr.guard().first_token(),
                 str(guard_t.name()),
             )
 
@@ -1396,7 +1386,7 @@ def emit_match(mod, body, st, result, expr):
             except viuact.typesystem.state.Cannot_unify as e:
                 a_t, b_t = e.args
                 raise viuact.errors.Type_mismatch(
-                    expr.arms()[i].tag().tok().at(),
+                    expr.arms()[i].tag().tok(),
                     a_t,
                     b_t,
                 ).note('between tags {} and {}'.format(
@@ -1426,10 +1416,7 @@ def emit_match(mod, body, st, result, expr):
 
 def emit_fn_ref(mod, body, st, result, expr):
     fn_name = str(expr.name())
-    candidates = list(filter(
-        lambda x: x[1]['base_name'] == fn_name,
-        mod.fns(),
-    ))
+    candidates = mod.fns_of(fn_name)
 
     # We can assume that there is always at least one candidate because this
     # function's only caller is emit_name_ref() - which calls it when it detects
@@ -1470,7 +1457,8 @@ def emit_fn_ref(mod, body, st, result, expr):
         else:
             parameter_types.append(viuact.typesystem.t.Fn.Labelled_parameter(param_name, t))
 
-    viuact.util.log.raw(list(map(lambda _: _.to_string(), parameter_types)))
+    viuact.util.log.trace(lambda: str(list(map(
+        lambda _: _.to_string(), parameter_types))))
 
     st.type_of(result, viuact.typesystem.t.Fn(
         rt = fn_sig['return'].concretise(tmp),
@@ -1481,7 +1469,7 @@ def emit_fn_ref(mod, body, st, result, expr):
     return result
 
 def emit_name_ref(mod, body, st, result, expr):
-    if any(map(lambda x: x[1]['base_name'] == str(expr.name()), mod.fns())):
+    if mod.has_fn(str(expr.name())):
         return emit_fn_ref(mod, body, st, result, expr)
 
     if result.is_void():
@@ -1489,7 +1477,7 @@ def emit_name_ref(mod, body, st, result, expr):
             str(expr.name()),
         ))
         raise viuact.errors.Destination_cannot_be_void(
-            pos = expr.name().tok().at(),
+            pos = expr.name().tok(),
             s = 'name-ref to {} variable'.format(
                 viuact.util.colors.colorise_wrap('white', str(expr.name())),
             ),
@@ -1505,7 +1493,7 @@ def emit_name_ref(mod, body, st, result, expr):
         slot = st.slot_of(str(expr.name()))
         t = st.type_of(slot)
         if result.inhibit_dereference():
-            viuact.util.log.debug('name-ref of {} creates a pointer: {} <- {}'.format(
+            viuact.util.log.debug(lambda: 'name-ref of {} creates a pointer: {} <- {}'.format(
                 str(expr.name()),
                 result.to_string(),
                 slot.to_string(),
@@ -1516,7 +1504,7 @@ def emit_name_ref(mod, body, st, result, expr):
                 dest = result,
             ))
         else:
-            viuact.util.log.debug('name-ref of {} moves a value: to {} from {}'.format(
+            viuact.util.log.debug(lambda: 'name-ref of {} moves a value: to {} from {}'.format(
                 str(expr.name()),
                 result.to_string(),
                 slot.to_string(),
@@ -1536,7 +1524,7 @@ def emit_throw(mod, body, st, result, expr):
 
         if ex and expr.bare():
             raise viuact.errors.Invalid_arity(
-                pos = expr.tag().tok().at(),
+                pos = expr.tag().tok(),
                 s = str(expr.tag()),
                 kind = viuact.errors.Invalid_arity.EX_CTOR,
             ).note(
@@ -1549,7 +1537,7 @@ def emit_throw(mod, body, st, result, expr):
 
         if not ex and not expr.bare():
             raise viuact.errors.Invalid_arity(
-                pos = expr.tag().tok().at(),
+                pos = expr.tag().tok(),
                 s = str(expr.tag()),
                 kind = viuact.errors.Invalid_arity.EX_CTOR,
             ).note(
@@ -1599,13 +1587,13 @@ def emit_catch_arm(mod, body, st, result, expr):
         ex_t = mod.exception(str(expr.tag()))
     except KeyError:
         raise viuact.errors.Unknown_exception(
-            expr.tag().tok().at(),
+            expr.tag().tok(),
             expr.tag(),
         )
 
     if (not expr.bare()) and ex_t is None:
         raise viuact.errors.Bind_of_exception_with_no_value(
-            expr.first_token().at(),
+            expr.first_token(),
             expr.tag(),
             expr.name(),
         )
@@ -1638,7 +1626,7 @@ def emit_catch_arm(mod, body, st, result, expr):
 def emit_try(mod, body, st, result, expr):
     if not expr.arms():
         raise viuact.errors.Try_with_no_arms(
-            expr.first_token().at(),
+            expr.first_token(),
         )
 
     try_arm_id = hashlib.sha1(
@@ -1729,7 +1717,7 @@ def emit_record_ctor(mod, body, st, result, expr):
                 st.unify_types(field_t, r_t)
             except viuact.typesystem.state.Cannot_unify:
                 raise viuact.errors.Bad_type_of_record_field(
-                    pos = each.value().first_token().at(),
+                    pos = each.value().first_token(),
                     record = str(record_type.name()),
                     field = str(each.name()),
                     declared = field_t.to_string(),
@@ -1792,124 +1780,71 @@ def emit_record_field_access(mod, body, st, result, expr):
         st.type_of(result, field_t)
     return result
 
-def emit_expr(mod, body, st, result, expr):
-    if type(expr) is viuact.forms.Fn_call:
-        return emit_fn_call(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            form = expr,
-        )
-    if type(expr) is viuact.forms.Operator_call:
-        return emit_operator_call(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Compound_expr:
-        return emit_compound_expr(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Primitive_literal:
-        return emit_primitive_literal(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Name_ref:
-        try:
-            return emit_name_ref(mod, body, st, result, expr)
-        except KeyError:
-            raise viuact.errors.Read_of_unbound_variable(
-                expr.name().tok().at(),
-                str(expr.name()),
-            )
-    if type(expr) is viuact.forms.Let_binding:
-        if not result.is_void():
-            st.cancel_slot(result)
-        return emit_let_binding(
-            mod = mod,
-            body = body,
-            st = st,
-            binding = expr,
-        )
-    if type(expr) is viuact.forms.If:
-        return emit_if(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Enum_ctor_call:
-        return emit_enum_ctor_call(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            form = expr,
-        )
-    if type(expr) is viuact.forms.Match:
-        return emit_match(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Throw:
-        return emit_throw(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Try:
-        return emit_try(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Record_ctor:
-        return emit_record_ctor(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Record_field_access:
-        return emit_record_field_access(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result,
-            expr = expr,
-        )
-    if type(expr) is viuact.forms.Inhibit_dereference:
-        return emit_expr(
-            mod = mod,
-            body = body,
-            st = st,
-            result = result.inhibit_dereference(True),
-            expr = expr.expr(),
+def emit_name_ref_expr(mod, body, st, result, expr):
+    try:
+        return emit_name_ref(mod, body, st, result, expr)
+    except KeyError:
+        raise viuact.errors.Read_of_unbound_variable(
+            expr.name().tok(),
+            str(expr.name()),
         )
-    if type(expr) is viuact.forms.Raw_slot:
-        return expr.slot()
-    if type(expr) is viuact.forms.Drop:
-        return Slot.make_void()
-    viuact.util.log.fixme('failed to emit expression: {}'.format(
-        typeof(expr)))
-    raise None
+
+def emit_let_binding_expr(mod, body, st, result, expr):
+    if not result.is_void():
+        st.cancel_slot(result)
+    return emit_let_binding(
+        mod = mod,
+        body = body,
+        st = st,
+        binding = expr,
+    )
+
+def emit_inhibit_dereference(mod, body, st, result, expr):
+    return emit_expr(
+        mod = mod,
+        body = body,
+        st = st,
+        result = result.inhibit_dereference(True),
+        expr = expr.expr(),
+    )
+
+def emit_raw_slot(mod, body, st, result, expr):
+    return expr.slot()
+
+def emit_drop(mod, body, st, result, expr):
+    return Slot.make_void()
+
+# Emitters of expressions indexed by type of the form. Every emitter is called
+# with the same arguments as emit_expr(), in the same order. Emitters for new
+# kinds of forms are added with register_expr_emitter().
+EXPR_EMITTERS = {
+    viuact.forms.Fn_call: emit_fn_call,
+    viuact.forms.Operator_call: emit_operator_call,
+    viuact.forms.Compound_expr: emit_compound_expr,
+    viuact.forms.Primitive_literal: emit_primitive_literal,
+    viuact.forms.Name_ref: emit_name_ref_expr,
+    viuact.forms.Let_binding: emit_let_binding_expr,
+    viuact.forms.If: emit_if,
+    viuact.forms.Enum_ctor_call: emit_enum_ctor_call,
+    viuact.forms.Match: emit_match,
+    viuact.forms.Throw: emit_throw,
+    viuact.forms.Try: emit_try,
+    viuact.forms.Record_ctor: emit_record_ctor,
+    viuact.forms.Record_field_access: emit_record_field_access,
+    viuact.forms.Inhibit_dereference: emit_inhibit_dereference,
+    viuact.forms.Raw_slot: emit_raw_slot,
+    viuact.forms.Drop: emit_drop,
+}
+
+def register_expr_emitter(form_type, emitter):
+    EXPR_EMITTERS[form_type] = emitter
+    return emitter
+
+def emit_expr(mod, body, st, result, expr):
+    try:
+        emitter = EXPR_EMITTERS[type(expr)]
+    except KeyError:
+        viuact.util.log.fixme('failed to emit expression: {}'.format(
+            typeof(expr)))
+        raise None
+    return emitter(mod, body, st, result, expr)
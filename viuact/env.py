@@ -7,6 +7,9 @@ class Environment_error(Exception):
 class Undefined_environment_variable(Environment_error):
     pass
 
+class Invalid_environment_variable(Environment_error):
+    pass
+
 
 LIBRARY_PATH = '/opt/lib/viuact:/usr/local/lib/viuact:/usr/lib/viuact'
 
@@ -27,6 +30,21 @@ def core_directory(default = None):
 def output_directory(default = 'build/_default'):
     return os.environ.get('VIUACT_OUTPUT_DIR', default)
 
+def cache_directory():
+    return os.path.join(output_directory(), '.cache')
+
+def cache_enabled():
+    return (os.environ.get('VIUACT_CACHE', 'on') != 'off')
+
+def lexer_engine(default):
+    return os.environ.get('VIUACT_LEXER', default)
+
+def parser_engine(default):
+    return os.environ.get('VIUACT_PARSER', default)
+
+def codegen_engine(default):
+    return os.environ.get('VIUACT_CODEGEN', default)
+
 # Variables to consider:
 #
 #   VIUACT_STDLIB_HEADERS_DIR
@@ -39,5 +57,30 @@ def output_directory(default = 'build/_default'):
 #   VIUA_ASM_EXEC, VIUA_VM_EXEC
 #       Path to viua-asm or viua-vm executable to use. Useful for switches.
 #
+#   VIUACT_CACHE
+#       Set to "off" to disable the cache of prepared interface modules and
+#       compiled function bodies (kept in .cache subdirectory of
+#       VIUACT_OUTPUT_DIR). Useful when debugging the compiler.
+#
+#   VIUACT_CHECKS
+#       Set to "off" to disable runtime checks of types of values passed around
+#       inside the compiler (see viuact.util.type_annotations). They are also
+#       disabled when Python runs with optimisations enabled (python -O).
+#       Makes the compiler faster.
+#
+#   VIUACT_LEXER
+#       Lexer engine to use: "single-pass" (the default) or "legacy". Useful
+#       for comparing token streams produced by both engines.
+#
+#   VIUACT_PARSER
+#       Parser to use: "one-pass" (the default), "parallel", or "legacy". The
+#       parallel parser spreads top-level forms of big source files over all
+#       CPUs. Legacy is useful for comparing forms produced by the parsers.
+#
+#   VIUACT_CODEGEN
+#       Code generator to use: "serial" (the default) or "parallel". The
+#       parallel code generator spreads functions of big modules over all CPUs.
+#       Output is the same for both.
+#
 #   VIUA_ASM_FLAGS
 #       A list of additional flags to include when invoking viua-asm.
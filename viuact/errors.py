@@ -1,4 +1,5 @@
 import viuact.util.colors
+import viuact.lexemes
 
 
 ################################################################################
@@ -6,13 +7,20 @@ import viuact.util.colors
 #
 class Error(Exception):
     def __init__(self, pos):
-        self.line = pos[0]
-        self.character = pos[1]
+        # Position is either a (line, character) tuple, a token, or a lexeme.
+        # Position of a token is resolved only when the error is reported.
+        self._position = pos
         self._fallout = []
         self._notes = []
 
     def at(self, human = False):
-        return (self.line + int(human), self.character + int(human),)
+        pos = self._position
+        if isinstance(pos, viuact.lexemes.Lexeme):
+            pos = pos.tok()
+        if isinstance(pos, viuact.lexemes.Token):
+            pos = pos.at()
+        line, character = pos
+        return (line + int(human), character + int(human),)
 
     def what(self):
         return ' '.join(str(type(self))[8:-2].split('.')[-1].lower().split('_'))
@@ -121,6 +129,18 @@ class Signature_with_no_implementation(Parser_error):
     def what(self):
         return '{}: {}'.format(super().what(), self.bad)
 
+class Import_cycle(Parser_error):
+    def __init__(self, pos, cycle):
+        super().__init__(pos)
+        self.bad = cycle  # [str], the first and last path are the same
+
+    def what(self):
+        return '{}: {}'.format(super().what(), ' -> '.join(
+            viuact.util.colors.colorise_wrap('white', each)
+            for each
+            in self.bad
+        ))
+
 
 ################################################################################
 # Errors that occur during code emission.
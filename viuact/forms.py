@@ -6,6 +6,9 @@ import viuact.lexemes
 class Form:
     forms = []
 
+    # Not all forms are created with a first token (eg, compound expressions).
+    _first_token = None
+
     def __init__(self, ft):
         # First token is used to report approximate position of the form inside
         # source file in case it is involved in an error.
@@ -1,7 +1,11 @@
+import array
+import bisect
 import re
 
 
 class Token:
+    __slots__ = ('_position', '_text',)
+
     def __init__(self, pos, text):
         self._position = pos
         self._text = text
@@ -12,12 +16,31 @@ class Token:
     def at(self):
         return self._position
 
+# Token synthesised by the compiler from another token, eg. a parenthesis
+# inserted while rewriting infix forms. It has its own text, but its position
+# is taken from the token it was derived from (optionally shifted by a number
+# of characters) when it is requested.
+class Derived_token(Token):
+    __slots__ = ('_base', '_shift',)
+
+    def __init__(self, base, text, shift = 0):
+        self._base = base
+        self._text = text
+        self._shift = shift
+
+    def at(self):
+        line, character = self._base.at()
+        return (line, character + self._shift,)
+
+    def __reduce__(self):
+        return (Derived_token, (self._base, self._text, self._shift,))
+
 
 class Lexeme:
     patterns = []
 
     def __init__(self, token):
-        if type(token) is not Token:
+        if not isinstance(token, Token):
             raise TypeError(
                 'token is not of type \'viuact.lexemes.Token\': {}'.format(
                     str(type(token))[8:-2],))
@@ -32,6 +55,9 @@ class Lexeme:
     def tok(self):
         return self._token
 
+    def __reduce__(self):
+        return (type(self), (self._token,))
+
 class Comment(Lexeme):
     pattern = None
 
@@ -265,3 +291,136 @@ class Exception_name(Phantom):
 
 class Record_ctor_field(Phantom):
     pass
+
+
+# Lexers produce lots of tokens and keeping each of them as a separate Lexeme
+# object (with its own Token object, copied text, and position tuple) is
+# wasteful. A token table stores tokens column-wise instead: each column is
+# a compact array, and the text of a token is a slice of the source buffer
+# taken only when somebody asks for it.
+#
+# Tokens only record their offsets in the source. Lines and characters are
+# resolved using an index of line starts built the first time a position is
+# requested - in practice: when a diagnostic is reported.
+#
+# Indexing the table returns a view: an instance of the lexeme class of the
+# token whose Token is a reference to a row of the table. Views are cheap to
+# create and can be used anywhere a Lexeme can be used, so the parser does not
+# have to know where its tokens came from.
+class Token_view(Token):
+    __slots__ = ('_table', '_index',)
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __str__(self):
+        return self._table.text(self._index)
+
+    def at(self):
+        return self._table.at(self._index)
+
+    def __reduce__(self):
+        return (Token_view, (self._table, self._index,))
+
+class Line_index:
+    def __init__(self, source):
+        self._starts = array.array('I', [0])
+
+        n = source.find('\n')
+        while n != -1:
+            self._starts.append(n + 1)
+            n = source.find('\n', n + 1)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def position(self, offset):
+        line = (bisect.bisect_right(self._starts, offset) - 1)
+        return (line, offset - self._starts[line],)
+
+class Token_table:
+    def __init__(self, source):
+        self._source = source
+
+        # Kind of the token is its index in the Lexeme.patterns list.
+        self._kinds = array.array('B')
+
+        # Offset of the first character of the token in the source, and length
+        # of the token.
+        self._starts = array.array('I')
+        self._lengths = array.array('I')
+
+        self._line_index = None
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        return self.kind(n)(token = Token_view(self, n))
+
+    def __iter__(self):
+        return self.rows(0, len(self))
+
+    def rows(self, first, last):
+        return map(self.__getitem__, range(first, last))
+
+    def append(self, kind, start, length):
+        self._kinds.append(kind)
+        self._starts.append(start)
+        self._lengths.append(length)
+        return self
+
+    def source(self):
+        return self._source
+
+    def line_index(self):
+        if self._line_index is None:
+            self._line_index = Line_index(self._source)
+        return self._line_index
+
+    def position(self, offset):
+        return self.line_index().position(offset)
+
+    # Make a table for text by replacing rows [first, last) of this table with
+    # all rows of the replacement table. Replacement must be a table of the same
+    # text, and rows following it are shifted by the difference between lengths
+    # of the old and new text.
+    def splice(self, text, first, last, replacement):
+        delta = (len(text) - len(self._source))
+
+        table = Token_table(text)
+        table._kinds = (self._kinds[:first]
+                + replacement._kinds
+                + self._kinds[last:])
+        table._starts = (self._starts[:first]
+                + replacement._starts
+                + array.array('I', (each + delta for each in self._starts[last:])))
+        table._lengths = (self._lengths[:first]
+                + replacement._lengths
+                + self._lengths[last:])
+        return table
+
+    def kind(self, n):
+        return Lexeme.patterns[self._kinds[n]]
+
+    def kinds(self):
+        return self._kinds
+
+    def text(self, n):
+        start = self._starts[n]
+        return self._source[start : start + self._lengths[n]]
+
+    def offset(self, n):
+        return self._starts[n]
+
+    def offsets(self):
+        return self._starts
+
+    def end(self, n):
+        return (self._starts[n] + self._lengths[n])
+
+    def at(self, n):
+        return self.position(self._starts[n])
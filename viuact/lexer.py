@@ -1,10 +1,19 @@
+import bisect
+import codecs
+import re
+
 import viuact.util.log
+import viuact.env
 import viuact.errors
 import viuact.lexemes
 import viuact.sl
 
 
-def lex(text):
+LEXER_SINGLE_PASS = 'single-pass'
+LEXER_LEGACY = 'legacy'
+
+
+def lex_legacy(text):
     tokens = []
 
     # Position in analysed text.
@@ -47,8 +56,11 @@ def lex(text):
                 text = s,
             )))
 
-            position_line += s.count('\n')
-            position_char = (len(s) - s.rfind('\n') - 1)
+            if '\n' in s:
+                position_line += s.count('\n')
+                position_char = (len(s) - s.rfind('\n') - 1)
+            else:
+                position_char += len(s)
             position_offset = n
             i = n
 
@@ -88,7 +100,11 @@ def lex(text):
                             text = s,
                     )))
 
-                    position_char = n + 1
+                    if '\n' in s:
+                        position_line += s.count('\n')
+                        position_char = (len(s) - s.rfind('\n') - 1)
+                    else:
+                        position_char += len(s)
                     position_offset = n + 1
                     i = n + 1
 
@@ -130,6 +146,285 @@ def lex(text):
     return tokens
 
 
+# The single-pass lexer compiles patterns of all lexemes into one alternation.
+# Alternatives are tried left to right, so the first lexeme (in the order of
+# viuact.lexemes.Lexeme.patterns) that matches wins - exactly as it did when
+# each pattern was tried in turn.
+#
+# Every lexeme gets a named group; the name of the group that matched tells us
+# which lexeme was found.
+def make_master_pattern(lexemes):
+    alternatives = []
+    kinds = {}
+    for i, each in enumerate(lexemes):
+        if each.pattern is None:
+            continue
+        alternatives.append('(?P<{}>{})'.format(
+            each.__name__,
+            each.pattern.pattern,
+        ))
+        kinds[each.__name__] = i
+    return (re.compile('|'.join(alternatives)), kinds,)
+
+MASTER_PATTERN, MASTER_PATTERN_KINDS = make_master_pattern(
+    viuact.lexemes.Lexeme.patterns)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+STRING_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+
+KIND_COMMENT = viuact.lexemes.Lexeme.patterns.index(viuact.lexemes.Comment)
+KIND_STRING = viuact.lexemes.Lexeme.patterns.index(viuact.lexemes.String)
+
+# Scan text starting at offset i, and call emit(kind, start, length) for every
+# token found. Return the offset at which scanning stopped.
+#
+# If the text is not final (ie, more text may follow it) scanning stops before
+# the first token that could turn out to be different if the rest of the text
+# was known: unterminated comments and strings, and tokens too close to the end
+# of the text to be sure they are complete (eg, a "-" could be a part of "->",
+# and "le" could be a part of "let").
+#
+# If until is given, it is called with the offset of every token before the
+# token is scanned, and scanning stops if it returns true.
+SCAN_LOOKAHEAD = 3
+
+def scan(text, i, final, emit, position, until = None):
+    master = MASTER_PATTERN.match
+    whitespace = WHITESPACE_PATTERN.match
+    string = STRING_PATTERN.match
+
+    end = len(text)
+    while i < end:
+        res = whitespace(text, i)
+        if res is not None:
+            i = res.end()
+            continue
+
+        if until is not None and until(i):
+            return i
+
+        if text.startswith('(*', i):
+            balance = 1
+            n = (i + 2)
+
+            while balance:
+                opening = text.find('(*', n)
+                closing = text.find('*)', n)
+                if closing == -1:
+                    n = end
+                    break
+                if opening != -1 and opening < closing:
+                    balance += 1
+                    n = (opening + 2)
+                else:
+                    balance -= 1
+                    n = (closing + 2)
+
+            if balance and not final:
+                return i
+
+            emit(KIND_COMMENT, i, (n - i))
+            i = n
+
+            continue
+
+        if text[i] == ';':
+            n = text.find('\n', i + 1)
+            if n == -1:
+                if not final:
+                    return i
+                n = end
+
+            emit(KIND_COMMENT, i, (n - i))
+            i = n + 1
+
+            continue
+
+        if text[i] == '"':
+            res = string(text, i)
+            if res is not None:
+                n = res.end()
+
+                emit(KIND_STRING, i, (n - i))
+                i = n
+
+                continue
+            if not final:
+                return i
+
+        res = master(text, i)
+        if not final and (end - (i if res is None else res.end())) < SCAN_LOOKAHEAD:
+            return i
+        if res is None:
+            raise viuact.errors.Unexpected_character(
+                pos = position(i),
+                s = text[i],
+            )
+
+        n = res.end()
+        emit(MASTER_PATTERN_KINDS[res.lastgroup], i, (n - i))
+        i = n
+
+    return i
+
+def lex_single_pass(text):
+    tokens = viuact.lexemes.Token_table(text)
+    scan(text, 0, True, tokens.append, tokens.position)
+    return tokens
+
+
+# Streaming lexer. Source text is read in chunks and tokens are yielded as soon
+# as they are recognised so that the whole token list (or even the whole text)
+# does not have to be kept in memory.
+#
+# The source may be a str, a file object (opened in text or binary mode), an
+# mmap object, or any other bytes-like object. Bytes are decoded as UTF-8.
+CHUNK_SIZE = (64 * 1024)
+
+def iter_chunks(source, chunk_size = CHUNK_SIZE):
+    if type(source) is str:
+        yield source
+        return
+
+    if hasattr(source, 'read'):
+        read = source.read
+    else:
+        view = memoryview(source)
+        offset = 0
+        def read(size):
+            nonlocal offset
+            chunk = view[offset : offset + size]
+            offset += len(chunk)
+            return bytes(chunk)
+
+    decoder = None
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        if type(chunk) is not str:
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final = True)
+        if tail:
+            yield tail
+
+def iter_lex(source, chunk_size = CHUNK_SIZE):
+    # Text that was not consumed yet, and the offset of its beginning in the
+    # whole source. The character preceding the unconsumed text is kept in the
+    # buffer as patterns may look at it (eg, to find a word boundary).
+    buffer = ''
+    buffer_offset = 0
+    keep = 0
+
+    # Line number and offset of the beginning of the line of the last token, so
+    # that positions can be computed by looking only at newlines between
+    # consecutive tokens.
+    line = 0
+    line_start = 0
+    cursor = 0
+
+    found = []
+    emit = lambda kind, start, length: found.append((kind, start, length,))
+
+    def position(n):
+        nonlocal line, line_start, cursor
+        newlines = buffer.count('\n', cursor, n)
+        if newlines:
+            line += newlines
+            line_start = (buffer_offset + buffer.rfind('\n', cursor, n) + 1)
+        cursor = n
+        return (line, (buffer_offset + n - line_start),)
+
+    chunks = iter_chunks(source, chunk_size)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = (chunk is None)
+        if chunk:
+            buffer += chunk
+
+        stop = scan(buffer, keep, final, emit, position)
+
+        for kind, start, length in found:
+            yield viuact.lexemes.Lexeme.patterns[kind](
+                token = viuact.lexemes.Token(
+                    pos = position(start),
+                    text = buffer[start : start + length],
+            ))
+        found.clear()
+
+        # Drop consumed text, but remember to account for newlines in it.
+        position(stop)
+        trim = max(stop - 1, 0)
+        buffer = buffer[trim:]
+        buffer_offset += trim
+        cursor -= trim
+        keep = (stop - trim)
+
+
+# Incremental lexing. Given a token table of some text and an edit of that text
+# (offset, length of removed text, and inserted text) produce a token table of
+# the edited text by lexing only the part that could have changed.
+#
+# Lexing restarts at the end of the last token that ends before the edit (token
+# boundaries are always outside of comments and strings), and stops as soon as
+# it reaches, past the edit, an offset where a token started before the edit.
+# The scanner looks at most one character back, so from that point onwards the
+# old tokens are still valid and are only shifted.
+def relex(tokens, offset, removed, inserted):
+    text = (tokens.source()[:offset]
+            + inserted
+            + tokens.source()[offset + removed:])
+    delta = (len(inserted) - removed)
+    edit_end = (offset + len(inserted))
+
+    first = bisect.bisect_left(tokens.offsets(), offset)
+    while first and tokens.end(first - 1) >= offset:
+        first -= 1
+    restart = (tokens.end(first - 1) if first else 0)
+
+    last = len(tokens)
+    def resynchronised(i):
+        nonlocal last
+        if (i - 1) < edit_end:
+            return False
+        n = bisect.bisect_left(tokens.offsets(), (i - delta))
+        if n < len(tokens) and tokens.offset(n) == (i - delta):
+            last = n
+            return True
+        return False
+
+    replacement = viuact.lexemes.Token_table(text)
+    scan(
+        text,
+        restart,
+        True,
+        replacement.append,
+        replacement.position,
+        until = resynchronised,
+    )
+
+    return tokens.splice(text, first, last, replacement)
+
+
+LEXERS = {
+    LEXER_SINGLE_PASS: lex_single_pass,
+    LEXER_LEGACY: lex_legacy,
+}
+
+def lex(text, engine = None):
+    if engine is None:
+        engine = viuact.env.lexer_engine(LEXER_SINGLE_PASS)
+    if engine not in LEXERS:
+        raise viuact.env.Invalid_environment_variable(
+            'VIUACT_LEXER', engine)
+    return LEXERS[engine](text)
+
+
 def to_data(tokens):
     type_to_tag = {}
     for i, each in enumerate(viuact.lexemes.Lexeme.patterns):
@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+import time
+
+import viuact.env
+import viuact.util.log
+
+
+# Index of files available in library path (see viuact.env.library_path()).
+#
+# Looking a module up by checking every directory of the library path for the
+# file is expensive when there are many imports, and even more so on network
+# filesystems. Instead, each library root is scanned once and the resulting
+# index (file name relative to the root => full path) is used to answer all
+# lookups. Roots earlier in the library path take precedence over later ones,
+# just as if they were checked in order.
+#
+# The index is stored in a manifest in the cache directory (see
+# viuact.env.cache_directory()) so that it is reused by subsequent compiler
+# invocations. The manifest records modification times of all directories of
+# every root, and a root is rescanned only if any of them changed (a file was
+# added to, removed from, or renamed in it).
+#
+# A directory modified in the same instant as it was scanned could be modified
+# again without its modification time changing (filesystems have limited
+# timestamp resolution). Modification times of such directories are not
+# recorded, which forces a rescan next time.
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = 'library.json'
+
+# How old (in nanoseconds) must a directory's modification time be to be
+# trusted.
+MTIME_GRACE_PERIOD = 2 * (10 ** 9)
+
+library_index = None        # (library path, {file name => full path})
+
+
+def scan_root(root):
+    directories = {}
+    files = []
+
+    now = time.time_ns()
+    seen = set()
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        directory = os.path.join(root, relative)
+        try:
+            st = os.stat(directory)
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            # Missing roots are not an error: the default library path
+            # contains directories that need not exist.
+            directories[relative] = None
+            continue
+
+        # Symbolic links may form loops.
+        if (st.st_dev, st.st_ino,) in seen:
+            continue
+        seen.add((st.st_dev, st.st_ino,))
+
+        directories[relative] = (
+            st.st_mtime_ns
+            if (now - st.st_mtime_ns) > MTIME_GRACE_PERIOD else
+            -1
+        )
+        for each in entries:
+            # Hidden files and directories (eg, the cache directory when
+            # output directory is also a library root) never contain modules.
+            if each.name.startswith('.'):
+                continue
+            name = os.path.join(relative, each.name)
+            try:
+                if each.is_dir():
+                    pending.append(name)
+                elif each.is_file():
+                    files.append(name)
+            except OSError:
+                continue
+
+    return {
+        'directories': directories,
+        'files': sorted(files),
+    }
+
+def root_valid(root, scanned):
+    for relative, mtime in scanned['directories'].items():
+        try:
+            current = os.stat(os.path.join(root, relative)).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            current = None
+        if current != mtime:
+            return False
+    return True
+
+def manifest_path():
+    return os.path.join(viuact.env.cache_directory(), MANIFEST_FILE)
+
+def load_manifest():
+    if not viuact.env.cache_enabled():
+        return {}
+    try:
+        with open(manifest_path(), 'r') as ifstream:
+            manifest = json.load(ifstream)
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest['roots']
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        viuact.util.log.debug('library: ignoring broken manifest %s: %s',
+            manifest_path(),
+            e,
+        )
+        return {}
+
+def store_manifest(roots):
+    if not viuact.env.cache_enabled():
+        return
+
+    path = manifest_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir = os.path.dirname(path), suffix = '.tmp')
+        try:
+            with os.fdopen(fd, 'w') as ofstream:
+                json.dump({
+                    'version': MANIFEST_VERSION,
+                    'roots': roots,
+                }, ofstream)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        viuact.util.log.debug('library: could not store manifest: %s', e)
+
+def build_index(library_path):
+    manifest = load_manifest()
+
+    roots = {}
+    changed = False
+    for root in library_path.split(':'):
+        if root in roots:
+            continue
+        scanned = manifest.get(root)
+        if scanned is None or not root_valid(root, scanned):
+            viuact.util.log.debug('library: scanning %s', root)
+            scanned = scan_root(root)
+            changed = True
+        roots[root] = scanned
+
+    if changed:
+        # Keep roots that are not in the current library path: they are
+        # probably going to be used again.
+        store_manifest({ **manifest, **roots })
+
+    index = {}
+    for root in library_path.split(':'):
+        for each in roots[root]['files']:
+            index.setdefault(each, os.path.join(root, each))
+    return index
+
+def index():
+    global library_index
+    library_path = viuact.env.library_path()
+    if library_index is None or library_index[0] != library_path:
+        library_index = (library_path, build_index(library_path),)
+    return library_index[1]
+
+def forget():
+    # Drop the in-memory index, eg, after files were written to library roots.
+    global library_index
+    library_index = None
+
+def find(file_name):
+    return index().get(os.path.normpath(file_name))
+
+def modules(extension = 'vti'):
+    suffix = '.{}'.format(extension)
+    return sorted(
+        (name[:-len(suffix)].replace(os.sep, '::'), path,)
+        for name, path
+        in index().items()
+        if name.endswith(suffix)
+    )
@@ -0,0 +1,169 @@
+import fcntl
+import json
+import os
+
+import viuact.cache
+import viuact.util.log
+
+
+# Build manifest of an output directory.
+#
+# For every compiled module the manifest records what its output files (.asm,
+# and .vti for modules that are not executables) were produced from: digests
+# of the source files, interface files of imported modules (transitively)
+# with their digests, and the fingerprint of the compiler. It also records
+# digests of the output files themselves.
+#
+# A module is up to date if all of these are still the same, ie. its sources
+# were not edited, imported interfaces did not change, the compiler is the
+# same, and nobody touched the output files. Up to date modules are not
+# compiled again.
+#
+# The manifest is an optimisation so any problem with it (missing, unreadable,
+# or corrupted file, failures to write) means that modules are compiled.
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = '.manifest.json'
+MANIFEST_LOCK_FILE = '.manifest.lock'
+
+
+def manifest_path(build_directory):
+    return os.path.join(build_directory, MANIFEST_FILE)
+
+# Many compilers may record their outputs in the same manifest at the same
+# time: workers of a parallel build, or separate invocations of the compiler
+# (eg, run by make -j). Updates of the manifest are serialised by a lock on a
+# separate file, so the manifest itself can be replaced while the lock is held.
+class Manifest_lock:
+    def __init__(self, build_directory):
+        self._path = os.path.join(build_directory, MANIFEST_LOCK_FILE)
+        self._lock = None
+
+    def __enter__(self):
+        self._lock = open(self._path, 'a')
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.close()
+            raise
+        return self
+
+    def __exit__(self, *args):
+        # Closing the file releases the lock.
+        self._lock.close()
+        return False
+
+def file_digest_or_none(path):
+    try:
+        return viuact.cache.file_digest(path)
+    except OSError:
+        return None
+
+def load(build_directory):
+    path = manifest_path(build_directory)
+    try:
+        with open(path, 'r') as ifstream:
+            data = json.load(ifstream)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        viuact.util.log.debug('manifest: ignoring broken manifest %s: %s',
+            path,
+            e,
+        )
+        return {}
+
+    if type(data) is not dict or data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('artifacts', {})
+
+def make_entry(build_directory, inputs, dependencies, outputs):
+    # Inputs are paths to source files, outputs are paths relative to the build
+    # directory, and dependencies are {import path => (interface file, digest)}
+    # as recorded by viuact.core.Module_info.
+    return {
+        'compiler': viuact.cache.compiler_fingerprint(),
+        'inputs': {
+            each : file_digest_or_none(each)
+            for each
+            in inputs
+        },
+        'interfaces': {
+            import_path : [interface_file, contents_digest]
+            for import_path, (interface_file, contents_digest)
+            in dependencies.items()
+        },
+        'outputs': {
+            each : file_digest_or_none(os.path.join(build_directory, each))
+            for each
+            in outputs
+        },
+    }
+
+def up_to_date(build_directory, output_file, inputs, resolve):
+    entry = load(build_directory).get(output_file)
+    if entry is None:
+        return False
+
+    try:
+        if entry['compiler'] != viuact.cache.compiler_fingerprint():
+            return False
+
+        if sorted(entry['inputs'].keys()) != sorted(inputs):
+            return False
+        for each, digest in entry['inputs'].items():
+            if file_digest_or_none(each) != digest:
+                return False
+
+        dependencies = {
+            import_path : tuple(each)
+            for import_path, each
+            in entry['interfaces'].items()
+        }
+        if not viuact.cache.dependencies_valid(dependencies, resolve):
+            return False
+
+        for each, digest in entry['outputs'].items():
+            path = os.path.join(build_directory, each)
+            if digest is None or file_digest_or_none(path) != digest:
+                return False
+    except (KeyError, AttributeError, TypeError, ValueError) as e:
+        viuact.util.log.debug('manifest: ignoring broken entry for %s: %s',
+            output_file,
+            e,
+        )
+        return False
+
+    return True
+
+def record(build_directory, output_file, entry):
+    # Other compilers may have updated the manifest since it was last read so
+    # it is read again, with the lock held, and only the entry for the given
+    # output file is replaced.
+    path = manifest_path(build_directory)
+    tmp_path = (path + '.tmp')
+    try:
+        os.makedirs(build_directory, exist_ok = True)
+        with Manifest_lock(build_directory):
+            artifacts = load(build_directory)
+            artifacts[output_file] = entry
+
+            # Write to a temporary file first and then move it in place so
+            # that compilers checking if their outputs are up to date (which
+            # do not take the lock) never see half-written manifests.
+            try:
+                with open(tmp_path, 'w') as ofstream:
+                    json.dump({
+                        'version': MANIFEST_VERSION,
+                        'artifacts': artifacts,
+                    }, ofstream, indent = 2, sort_keys = True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+    except OSError as e:
+        viuact.util.log.debug('manifest: could not record %s: %s',
+            output_file,
+            e,
+        )
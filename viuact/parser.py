@@ -1,10 +1,23 @@
+import concurrent.futures
+import copyreg
+import io
+import os
+import pickle
+
+import viuact.env
 import viuact.errors
 import viuact.lexemes
 import viuact.forms
+import viuact.util.memory
 
 from viuact.util.type_annotations import T, I, Alt
 
 
+PARSER_ONE_PASS = 'one-pass'
+PARSER_LEGACY = 'legacy'
+PARSER_PARALLEL = 'parallel'
+
+
 def strip_comments(tokens):
     return list(filter(
         lambda each: each.t() is not viuact.lexemes.Comment, tokens))
@@ -82,16 +95,16 @@ def wrap_infix(tokens):
         if do_wrap:
             prev = tmp.pop()
             x = Many()
-            x.append(One(viuact.lexemes.Left_paren(viuact.lexemes.Token(
-                    pos = prev.first().tok().at(),
+            x.append(One(viuact.lexemes.Left_paren(viuact.lexemes.Derived_token(
+                    base = prev.first().tok(),
                     text = '(',
             ))))
             x.append(One(each))
             x.append(prev)
             x.append(One(tokens[i]))
             i += 1
-            x.append(One(viuact.lexemes.Right_paren(viuact.lexemes.Token(
-                    pos = prev.first().tok().at(),
+            x.append(One(viuact.lexemes.Right_paren(viuact.lexemes.Derived_token(
+                    base = prev.first().tok(),
                     text = ')',
             ))))
             tmp.append(x)
@@ -111,31 +124,16 @@ def recategorise(tokens):
         if each.t() is viuact.lexemes.Mod_name:
             if toks[-1].t() is viuact.lexemes.Path_resolution:
                 if toks[-2].t() is viuact.lexemes.Name:
-                    toks.append(viuact.lexemes.Enum_ctor_name(
-                        viuact.lexemes.Token(
-                            pos = each.tok().at(),
-                            text = str(each),
-                        ),
-                    ))
+                    toks.append(viuact.lexemes.Enum_ctor_name(each.tok()))
                     continue
             if toks[-1].t() is viuact.lexemes.Exception_def:
-                toks.append(viuact.lexemes.Exception_name(
-                    viuact.lexemes.Token(
-                        pos = each.tok().at(),
-                        text = str(each),
-                    ),
-                ))
+                toks.append(viuact.lexemes.Exception_name(each.tok()))
                 continue
         if each.t() is viuact.lexemes.Name:
             if toks[-1].t() is viuact.lexemes.Operator_dot:
                 if toks[-2].t() is viuact.lexemes.Left_paren:
                     toks.pop()
-                    toks.append(viuact.lexemes.Record_ctor_field(
-                        viuact.lexemes.Token(
-                            pos = each.tok().at(),
-                            text = str(each),
-                        ),
-                    ))
+                    toks.append(viuact.lexemes.Record_ctor_field(each.tok()))
                     continue
         toks.append(each)
     return toks
@@ -145,13 +143,13 @@ class G:
     @staticmethod
     def resolve_token(g):
         if type(g) is Group:
+            if not len(g):
+                return g.tag().tok()
             return G.resolve_token(g.lead())
         elif type(g) is Element:
             return g.val().tok()
-
-    @staticmethod
-    def resolve_position(g):
-        return G.resolve_token(g).at()
+        elif isinstance(g, viuact.lexemes.Lexeme):
+            return g.tok()
 
 class Group(G):
     def __init__(self, value, tag):
@@ -243,7 +241,7 @@ def group_one(tokens, i, delim, sentinels):
         tag = viuact.lexemes.Curly_tag(token = tokens[i - 1].tok())
         g = [Element(tag)]
     else:
-        raise viuact.errors.Invalid_sentinel(tokens[i - 1].tok().at(), str(sentinel))
+        raise viuact.errors.Invalid_sentinel(tokens[i - 1].tok(), str(sentinel))
     sentinels.push(sentinel)
 
     while i < len(tokens):
@@ -256,7 +254,7 @@ def group_one(tokens, i, delim, sentinels):
         if each.t() in (
             viuact.lexemes.Right_paren, viuact.lexemes.Right_curly,) and each.t() is not sentinel:
             raise viuact.errors.Unbalanced_braces(
-                each.tok().at(),
+                each.tok(),
                 each,
             ).note('expected {}'.format(repr(
                 '}' if sentinels.top() is viuact.lexemes.Right_curly else ')'
@@ -280,7 +278,7 @@ def group(tokens):
         i, g = group_one(tokens, i + 1, tokens[i], s)
         if not s.empty():
             raise viuact.errors.Unbalanced_braces(
-                s.popped().tok().at(),
+                s.popped().tok(),
                 s.popped(),
             ).note('expected {}'.format(repr(
                 '}' if s.top() is viuact.lexemes.Right_curly else ')'
@@ -304,8 +302,7 @@ def parse_compound_expr(group):
 
     return viuact.forms.Compound_expr(expressions)
 
-def parse_enum_ctor_call(group):
-    to = group[0]
+def make_enum_ctor_path(to):
     enum_field = to[2].val()
 
     enum_name = None
@@ -325,22 +322,29 @@ def parse_enum_ctor_call(group):
                 break
             to = to[1]
 
-    if len(group) > 2:
+    return viuact.forms.Enum_ctor_path(
+        field = enum_field,
+        name = enum_name,
+        module_prefix = module_prefix,
+    )
+
+def check_enum_ctor_arity(to, path, no_of_args):
+    if no_of_args > 1:
         raise viuact.errors.Invalid_arity(
-            group.first_token(),
+            G.resolve_token(to),
             (
-                '{}::'.format('::'.join(map(str, module_prefix)))
-                if module_prefix else
+                '{}::'.format(path.module())
+                if path.module() is not None else
                 ''
-            ) + '{}::{}'.format(str(enum_name), str(enum_field))
+            ) + '{}::{}'.format(str(path.of_enum()), str(path.field()))
         ).note('enum ctor has at most 1 parameter')
 
+def parse_enum_ctor_call(group):
+    path = make_enum_ctor_path(group[0])
+    check_enum_ctor_arity(group[0], path, len(group) - 1)
+
     return viuact.forms.Enum_ctor_call(
-        to = viuact.forms.Enum_ctor_path(
-            field = enum_field,
-            name = enum_name,
-            module_prefix = module_prefix,
-        ),
+        to = path,
         value = (parse_expr(group[1]) if len(group) == 2 else None),
     )
 
@@ -363,7 +367,7 @@ def parse_fn_call(group):
     )
     if type(group[0]) is Element and group.lead().t() in call_kind_toks:
         offset = 1
-        raise viuact.errors.Unexpected_token(G.resolve_position(group[0]),
+        raise viuact.errors.Unexpected_token(G.resolve_token(group[0]),
             'call kinds are not implemented yet')
 
     name = group[0 + offset]
@@ -380,21 +384,22 @@ def parse_fn_call(group):
             )
         else:
             raise viuact.errors.Unexpected_token(
-                G.resolve_position(name),
+                G.resolve_token(name),
                 typeof(last),
             ).note('expected function or enum constructor name')
     elif type(name) is Element:
         name = parse_expr(name)
     else:
-        raise viuact.errors.Unexpected_token(G.resolve_position(name),
+        raise viuact.errors.Unexpected_token(G.resolve_token(name),
             'expected function name, or a call-kind marker')
 
     args = []
     for each in group[1 + offset:]:
         if type(each) is Element and each.t() is viuact.lexemes.Labelled_name:
-            tok = viuact.lexemes.Token(
-                pos = (each.val().tok().at()[0], each.val().tok().at()[1] + 1),
+            tok = viuact.lexemes.Derived_token(
+                base = each.val().tok(),
                 text = str(each.val().tok())[1:],
+                shift = 1,
             )
             args.append(viuact.forms.Argument_bind(
                 name = each.val(),
@@ -406,7 +411,7 @@ def parse_fn_call(group):
     if args and type(args[0]) is viuact.forms.Record_ctor:
         if len(args) > 1:
             raise viuact.errors.Record_ctor_received_more_than_one_argument(
-                name.first_token().at(),
+                name.first_token(),
                 str(name.name()),
                 no_of_args = len(args),
             )
@@ -421,26 +426,30 @@ def parse_fn_call(group):
         kind = viuact.forms.Fn_call.Kind.Call,
     )
 
+def make_simple_expr(lexeme):
+    if lexeme.t() is viuact.lexemes.Integer:
+        return viuact.forms.Primitive_literal(value = lexeme)
+    if lexeme.t() is viuact.lexemes.String:
+        return viuact.forms.Primitive_literal(value = lexeme)
+    if lexeme.t() is viuact.lexemes.Bool_literal:
+        return viuact.forms.Primitive_literal(value = lexeme)
+    if lexeme.t() is viuact.lexemes.Name:
+        return viuact.forms.Name_ref(name = lexeme)
+    if lexeme.t() is viuact.lexemes.Drop:
+        return viuact.forms.Drop(lexeme)
+    raise viuact.errors.Unexpected_token(
+        lexeme.tok(),
+        str(lexeme),
+    ).note('expected an expression')
+
 def parse_simple_expr(elem):
-    if elem.t() is viuact.lexemes.Integer:
-        return viuact.forms.Primitive_literal(value = elem.val())
-    if elem.t() is viuact.lexemes.String:
-        return viuact.forms.Primitive_literal(value = elem.val())
-    if elem.t() is viuact.lexemes.Bool_literal:
-        return viuact.forms.Primitive_literal(value = elem.val())
-    if elem.t() is viuact.lexemes.Name:
-        return viuact.forms.Name_ref(name = elem.val())
-    if elem.t() is viuact.lexemes.Drop:
-        return viuact.forms.Drop(elem.lead())
-    viuact.util.log.fixme('failed to parse simple expression: {} {}'.format(
-        typeof(elem.lead()), elem.lead()))
-    raise None  # parse simple expressions
+    return make_simple_expr(elem.val())
 
 def parse_let_binding(group):
     name = group[1].val()
     if type(name) is not viuact.lexemes.Name:
         raise viuact.errors.Unexpected_token(
-            name.tok().at(),
+            name.tok(),
             str(name),
         ).note('expected name')
     return viuact.forms.Let_binding(
@@ -463,8 +472,8 @@ def parse_match_arm(group):
         name = group[2].val()
         expr = group[3]
     else:
-        name = viuact.lexemes.Drop(viuact.lexemes.Token(
-            pos = tag.tok().at(),
+        name = viuact.lexemes.Drop(viuact.lexemes.Derived_token(
+            base = tag.tok(),
             text = '_',
         ))
         expr = group[2]
@@ -484,8 +493,8 @@ def parse_catch_arm(group):
         name = group[2].val()
         expr = group[3]
     else:
-        name = viuact.lexemes.Drop(viuact.lexemes.Token(
-            pos = tag.tok().at(),
+        name = viuact.lexemes.Drop(viuact.lexemes.Derived_token(
+            base = tag.tok(),
             text = '_',
         ))
         expr = group[2]
@@ -574,7 +583,7 @@ def parse_expr(group):
         if group.lead().t() is viuact.lexemes.Operator_ampersand:
             if len(group) != 2:
                 raise viuact.errors.Invalid_arity(
-                    pos = G.resolve_position(group),
+                    pos = G.resolve_token(group),
                     s = '&',
                     kind = viuact.errors.Invalid_arity.OPERATOR,
                 ).note('only one argument can be supplied to operator &')
@@ -582,11 +591,10 @@ def parse_expr(group):
                 operator = group.lead().val(),
                 expression = parse_expr(group[1]),
             )
-        viuact.util.log.raw('unrecognised leader: {} ({})'.format(
-            typeof(group.lead()),
-            group.lead().t(),
-        ))
-        raise None
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(group),
+            str(G.resolve_token(group)),
+        ).note('expected function name, or a call-kind marker')
     else:
         return parse_simple_expr(group)
 
@@ -595,7 +603,7 @@ def parse_fn_parameter(group):
         name = group.val()
         if name.t() not in (viuact.lexemes.Name, viuact.lexemes.Labelled_name,):
             raise viuact.errors.Unexpected_token(
-                pos = name.tok().at(),
+                pos = name.tok(),
                 s = str(name),
             ).note('expected a name or a labelled name')
 
@@ -607,7 +615,7 @@ def parse_fn_parameter(group):
     viuact.util.log.fixme(
         'defaulted parameters are not implemented', '<viuact>')
     raise viuact.errors.Unexpected_token(
-        pos = group.tag().tok().at(),
+        pos = group.tag().tok(),
         s = str(group.tag()),
     ).note('expected a defaulted parameter')
 
@@ -624,7 +632,7 @@ def parse_fn(group):
     )
     if name.t() not in valid_fn_name_types:
         raise viuact.errors.Unexpected_token(
-            pos = name.val().tok().at(),
+            pos = name.val().tok(),
             s = str(name.val()),
         ).note('expected a name')
 
@@ -634,7 +642,7 @@ def parse_fn(group):
             parameters.append(parse_fn_parameter(p))
         except viuact.errors.Error as e:
             raise e.then(viuact.errors.Info(
-                pos = G.resolve_position(p),
+                pos = G.resolve_token(p),
                 m = 'when parsing parameter {} of function {}'.format(
                     i, str(name.val()))))
 
@@ -664,7 +672,10 @@ def parse_type(group):
             return_type = return_type,
             parameter_types = [parse_parameter_type(x) for x in group[0]],
         )
-    raise None
+    raise viuact.errors.Unexpected_token(
+        G.resolve_token(group),
+        str(G.resolve_token(group)),
+    ).note('expected a type')
 
 def parse_parameter_type(group):
     if type(group) is Element:
@@ -683,8 +694,10 @@ def parse_parameter_type(group):
                 name = group[0].val(),
                 value = parse_type(group[1]),
             )
-        viuact.util.log.raw(typeof(group[0]))
-        raise None
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(group),
+            str(G.resolve_token(group)),
+        ).note('expected a type')
     if type(group) is Group and len(group) == 3:
         parameter_types = []
         for x in group[0]:
@@ -696,7 +709,10 @@ def parse_parameter_type(group):
             return_type = return_type,
             parameter_types = [parse_parameter_type(x) for x in group[0]],
         )
-    raise None
+    raise viuact.errors.Unexpected_token(
+        G.resolve_token(group),
+        str(G.resolve_token(group)),
+    ).note('expected a type')
 
 def parse_val_fn(group):
     offset = (0 if len(group) == 5 else 1)
@@ -705,8 +721,12 @@ def parse_val_fn(group):
     parameter_list = group[offset + 2]
     return_type = group[offset + 4]
 
-    if type(group[offset + 3].val()) is not viuact.lexemes.Arrow_right:
-        raise None
+    arrow = group[offset + 3]
+    if type(arrow) is not Element or arrow.val().t() is not viuact.lexemes.Arrow_right:
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(arrow),
+            str(G.resolve_token(arrow)),
+        ).note('expected {}'.format(repr('->')))
 
     name = name.val()
     template_parameters = list(map(parse_type, template_parameters))
@@ -725,12 +745,21 @@ def parse_val_var(group):
     name = None
     parameter_list = None
     return_type = None
-    raise None
+    raise viuact.errors.Fail(
+        G.resolve_token(group),
+        'FIXME val declarations of variables are not implemented',
+    )
 
 def parse_val(group):
     is_var = 4
     is_fn = 6
 
+    if len(group) < 2:
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(group),
+            str(G.resolve_token(group)),
+        ).note('expected a name')
+
     # The first element is not a list of type parameters so let's reduce the
     # length requirements.
     if type(group[1]) is Element:
@@ -742,7 +771,10 @@ def parse_val(group):
     if len(group) == is_fn:
         return parse_val_fn(group)
 
-    raise None
+    raise viuact.errors.Unexpected_token(
+        G.resolve_token(group),
+        str(G.resolve_token(group)),
+    ).note('expected a variable or a function declaration')
 
 def parse_enum_field(group):
     if type(group) is Element:
@@ -756,7 +788,7 @@ def parse_enum_field(group):
 
     if type(value) is not viuact.lexemes.Template_parameter:
         raise viuact.errors.Unexpected_token(
-            value.tok().at(),
+            value.tok(),
             str(value),
         ).note('requires template name, eg. \'a')
 
@@ -767,7 +799,10 @@ def parse_enum_field(group):
 
 def parse_enum(group):
     if len(group) != 3:
-        raise None
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(group),
+            str(G.resolve_token(group)),
+        ).note('expected enum name and a list of fields')
     name = group[1].val()
 
     fields = []
@@ -788,7 +823,7 @@ def parse_exception_definition(group):
     tag = group[1].val()
     if type(tag) is not viuact.lexemes.Exception_name:
         raise viuact.errors.Unexpected_token(
-            tag.tok().at(),
+            tag.tok(),
             str(tag),
         ).note('expected exception name')
 
@@ -798,12 +833,12 @@ def parse_exception_definition(group):
         if type(value) not in (viuact.lexemes.Template_parameter,
                 viuact.lexemes.Name,):
             raise viuact.errors.Unexpected_token(
-                value.tok().at(),
+                value.tok(),
                 str(value),
             ).note('expected type name or template parameter')
         if type(value) is not viuact.lexemes.Name:
             raise viuact.errors.Unexpected_token(
-                value.tok().at(),
+                value.tok(),
                 str(value),
             ).note('FIXME: only unqualified type names are supported now')
         value = viuact.forms.Type_name(name = value, template_parameters = ())
@@ -834,10 +869,15 @@ def parse_record_field(group):
     )
 
 def parse_record_definition(group):
+    if len(group) != 3:
+        raise viuact.errors.Unexpected_token(
+            G.resolve_token(group),
+            str(G.resolve_token(group)),
+        ).note('expected record name and a list of fields')
     tag = group[1].val()
     if type(tag) is not viuact.lexemes.Name:
         raise viuact.errors.Unexpected_token(
-            tag.tok().at(),
+            tag.tok(),
             str(tag),
         ).note('expected record name')
 
@@ -886,32 +926,35 @@ def parse_import(group):
         module = module,
     )
 
+def parse_top_level(g):
+    if g.lead().t() is viuact.lexemes.Let and len(g) == 4:
+        return parse_fn(g)
+    elif g.lead().t() is viuact.lexemes.Val:
+        return parse_val(g)
+    elif g.lead().t() is viuact.lexemes.Enum:
+        return parse_enum(g)
+    elif g.lead().t() is viuact.lexemes.Exception_def:
+        return parse_exception_definition(g)
+    elif g.lead().t() is viuact.lexemes.Type:
+        return parse_record_definition(g)
+    elif g.lead().t() is viuact.lexemes.Import:
+        return parse_import(g)
+    else:
+        tok = g.lead().val().tok()
+        raise viuact.errors.Unexpected_token(
+            tok,
+            str(tok),
+        ).note('token does not create a valid top-level construct')
+
 def parse_impl(groups):
     forms = []
 
     for g in groups:
-        if g.lead().t() is viuact.lexemes.Let and len(g) == 4:
-            forms.append(parse_fn(g))
-        elif g.lead().t() is viuact.lexemes.Val:
-            forms.append(parse_val(g))
-        elif g.lead().t() is viuact.lexemes.Enum:
-            forms.append(parse_enum(g))
-        elif g.lead().t() is viuact.lexemes.Exception_def:
-            forms.append(parse_exception_definition(g))
-        elif g.lead().t() is viuact.lexemes.Type:
-            forms.append(parse_record_definition(g))
-        elif g.lead().t() is viuact.lexemes.Import:
-            forms.append(parse_import(g))
-        else:
-            tok = g.lead().val().tok()
-            raise viuact.errors.Unexpected_token(
-                tok.at(),
-                str(tok),
-            ).note('token does not create a valid top-level construct')
+        forms.append(parse_top_level(g))
 
     return forms
 
-def parse(tokens):
+def parse_legacy(tokens):
     no_comments = strip_comments(tokens)
     toks = recategorise(no_comments)
     wrapped = wrap_infix(toks)
@@ -919,6 +962,750 @@ def parse(tokens):
     return parse_impl(groups)
 
 
+# The legacy parser above makes five passes over the tokens (strip comments,
+# recategorise, wrap infix operators, group, and parse) and builds a whole tree
+# of Group and Element objects just to throw it away once the forms are made.
+# The parser below goes from tokens straight to forms in one pass.
+#
+# Groups that are still open are kept on an explicit stack instead of Python's
+# call stack so deeply nested code does not run into the recursion limit. Every
+# group is reduced to a form as soon as its closing brace is seen; by that time
+# all of its children are already reduced so the reduction does not recurse.
+# What a group means (an expression, a list of match arms, etc.) depends on
+# where it appears so its role is decided when it is opened, by looking at the
+# lead of the enclosing group.
+#
+# Declarations (val, enum, type, exception, import) are shallow. They are still
+# collected into Group/Element trees and reduced by the same functions that the
+# legacy parser uses.
+class Open_group:
+    EXPR = 'expr'
+    DECLARATION = 'declaration'
+    MATCH_ARMS = 'match arms'
+    MATCH_ARM = 'match arm'
+    CATCH_ARMS = 'catch arms'
+    CATCH_ARM = 'catch arm'
+
+    # The third element of a (let ...) is either a list of parameters (in
+    # function definitions) or an expression (in let bindings). Which one it is
+    # is only known after the whole (let ...) is read so such groups are not
+    # reduced when they are closed, but when their parent is.
+    UNDECIDED = 'undecided'
+
+    def __init__(self, opening, role, top_level = False):
+        self.opening = opening
+        self.role = role
+        self.top_level = top_level
+        self.items = []
+
+        self._curly = (opening.t() is viuact.lexemes.Left_curly)
+
+    def curly(self):
+        return self._curly
+
+    def closing(self):
+        return (viuact.lexemes.Right_curly
+            if self._curly else viuact.lexemes.Right_paren)
+
+DECLARATIONS = (
+    viuact.lexemes.Val,
+    viuact.lexemes.Enum,
+    viuact.lexemes.Exception_def,
+    viuact.lexemes.Type,
+    viuact.lexemes.Import,
+)
+
+def one_pass_token(item, g):
+    if isinstance(item, viuact.lexemes.Lexeme):
+        return item.tok()
+    if isinstance(item, G):
+        return G.resolve_token(item)
+    if type(item) is Open_group:
+        return item.opening.tok()
+    tok = item.first_token()
+    if isinstance(tok, viuact.lexemes.Lexeme):
+        return tok.tok()
+    return (tok if tok is not None else g.opening.tok())
+
+def one_pass_child_role(parent):
+    if parent.role is Open_group.DECLARATION:
+        return Open_group.DECLARATION
+    if parent.role is Open_group.MATCH_ARMS:
+        return Open_group.MATCH_ARM
+    if parent.role is Open_group.CATCH_ARMS:
+        return Open_group.CATCH_ARM
+    if parent.top_level:
+        # Only the body of a function definition is an expression at the top
+        # level. Groups in anything else that can not be a function definition
+        # are kept as they are, so that the whole group is reported as not
+        # being a valid top-level construct (as by parse_top_level()) instead
+        # of by an error found inside it.
+        lead = (parent.items[0] if parent.items else None)
+        if (parent.curly() or not isinstance(lead, viuact.lexemes.Lexeme)
+                or lead.t() is not viuact.lexemes.Let
+                or len(parent.items) not in (2, 3,)):
+            return Open_group.DECLARATION
+    if parent.curly() or not parent.items:
+        return Open_group.EXPR
+
+    lead = parent.items[0]
+    if not isinstance(lead, viuact.lexemes.Lexeme) or len(parent.items) != 2:
+        return Open_group.EXPR
+    if lead.t() is viuact.lexemes.Let:
+        return Open_group.UNDECIDED
+    if lead.t() is viuact.lexemes.Match:
+        return Open_group.MATCH_ARMS
+    if lead.t() is viuact.lexemes.Try:
+        return Open_group.CATCH_ARMS
+    return Open_group.EXPR
+
+def one_pass_expr(item):
+    if isinstance(item, viuact.lexemes.Lexeme):
+        return make_simple_expr(item)
+    if type(item) is Group:
+        return parse_expr(item)
+    if type(item) is Open_group:
+        return one_pass_reduce_expr(item)
+    return item
+
+def one_pass_arms(item, g):
+    if type(item) is Open_group and item.role in (
+            Open_group.MATCH_ARMS, Open_group.CATCH_ARMS,):
+        return item.items
+    raise viuact.errors.Unexpected_token(
+        one_pass_token(item, g),
+        str(one_pass_token(item, g)),
+    ).note('expected a list of arms')
+
+def one_pass_require(g, n):
+    # Forms are made of items found at fixed positions in the group.
+    if len(g.items) < n:
+        tok = (one_pass_token(g.items[0], g)
+            if g.items else g.opening.tok())
+        raise viuact.errors.Unexpected_token(
+            tok,
+            str(tok),
+        ).note('expected {} more element(s) in the group'.format(
+            n - len(g.items)))
+
+def one_pass_arm(g):
+    one_pass_require(g, 3)
+    tag = g.items[1]
+
+    name = None
+    expr = None
+    if len(g.items) == 4:
+        name = g.items[2]
+        expr = g.items[3]
+    else:
+        name = viuact.lexemes.Drop(viuact.lexemes.Derived_token(
+            base = tag.tok(),
+            text = '_',
+        ))
+        expr = g.items[2]
+
+    arm = (viuact.forms.Match_arm
+        if g.role is Open_group.MATCH_ARM else viuact.forms.Catch_arm)
+    return arm(
+        tag = tag,
+        name = name,
+        expr = one_pass_expr(expr),
+    )
+
+def one_pass_fn_call(items):
+    name = items[0]
+    if type(name) is Group:
+        if (len(name) != 3 or type(name[0]) is not Element
+                or name[0].val().t() is not viuact.lexemes.Path_resolution
+                or type(name[2]) is not Element):
+            raise viuact.errors.Unexpected_token(
+                G.resolve_token(name),
+                str(G.resolve_token(name)),
+            ).note('expected function or enum constructor name')
+        last = name[2].val()
+        if last.t() is viuact.lexemes.Enum_ctor_name:
+            path = make_enum_ctor_path(name)
+            check_enum_ctor_arity(name, path, len(items) - 1)
+            return viuact.forms.Enum_ctor_call(
+                to = path,
+                value = (one_pass_expr(items[1]) if len(items) == 2 else None),
+            )
+        elif last.t() is viuact.lexemes.Name:
+            path = flatten_module_path(name)
+            name = viuact.forms.Name_path(
+                mod = path[:-1],
+                name = path[-1],
+            )
+        else:
+            raise viuact.errors.Unexpected_token(
+                G.resolve_token(name),
+                typeof(last),
+            ).note('expected function or enum constructor name')
+    else:
+        name = make_simple_expr(name)
+
+    args = []
+    for each in items[1:]:
+        if (isinstance(each, viuact.lexemes.Lexeme)
+                and each.t() is viuact.lexemes.Labelled_name):
+            tok = viuact.lexemes.Derived_token(
+                base = each.tok(),
+                text = str(each.tok())[1:],
+                shift = 1,
+            )
+            args.append(viuact.forms.Argument_bind(
+                name = each,
+                value = viuact.forms.Name_ref(name = viuact.lexemes.Name(tok)),
+            ))
+        else:
+            args.append(one_pass_expr(each))
+
+    if args and type(args[0]) is viuact.forms.Record_ctor:
+        if len(args) > 1:
+            raise viuact.errors.Record_ctor_received_more_than_one_argument(
+                name.first_token(),
+                str(name.name()),
+                no_of_args = len(args),
+            )
+        return viuact.forms.Record_ctor(
+            name = name,
+            fields = args[0].fields(),
+        )
+
+    return viuact.forms.Fn_call(
+        to = name,
+        arguments = args,
+        kind = viuact.forms.Fn_call.Kind.Call,
+    )
+
+def one_pass_fn_parameter(p, g):
+    if isinstance(p, viuact.lexemes.Lexeme):
+        if p.t() not in (viuact.lexemes.Name, viuact.lexemes.Labelled_name,):
+            raise viuact.errors.Unexpected_token(
+                pos = p.tok(),
+                s = str(p),
+            ).note('expected a name or a labelled name')
+
+        if p.t() is viuact.lexemes.Name:
+            return viuact.forms.Named_parameter(p)
+        else:
+            return viuact.forms.Labelled_parameter(p)
+
+    viuact.util.log.fixme(
+        'defaulted parameters are not implemented', '<viuact>')
+    raise viuact.errors.Unexpected_token(
+        pos = one_pass_token(p, g),
+        s = '(',
+    ).note('expected a defaulted parameter')
+
+def one_pass_fn(g):
+    items = g.items
+    name = items[1]
+
+    valid_fn_name_types = (
+        viuact.lexemes.Name,
+        viuact.lexemes.Operator_eq,
+    )
+    if (not isinstance(name, viuact.lexemes.Lexeme)
+            or name.t() not in valid_fn_name_types):
+        raise viuact.errors.Unexpected_token(
+            pos = one_pass_token(name, g),
+            s = str(one_pass_token(name, g)),
+        ).note('expected a name')
+
+    if type(items[2]) is not Open_group:
+        raise viuact.errors.Unexpected_token(
+            pos = one_pass_token(items[2], g),
+            s = str(one_pass_token(items[2], g)),
+        ).note('expected a parameter list')
+
+    parameters = []
+    for i, p in enumerate(items[2].items):
+        try:
+            parameters.append(one_pass_fn_parameter(p, items[2]))
+        except viuact.errors.Error as e:
+            raise e.then(viuact.errors.Info(
+                pos = one_pass_token(p, items[2]),
+                m = 'when parsing parameter {} of function {}'.format(
+                    i, str(name))))
+
+    return viuact.forms.Fn(
+        name = name,
+        parameters = parameters,
+        expression = one_pass_expr(items[3]),
+    )
+
+def one_pass_reduce_expr(g):
+    items = g.items
+
+    if g.curly():
+        expressions = [one_pass_expr(each) for each in items]
+        if expressions and type(expressions[0]) is viuact.forms.Record_ctor_field:
+            return viuact.forms.Record_ctor(
+                name = None,    # to be filled later
+                fields = expressions,
+            )
+        return viuact.forms.Compound_expr(expressions)
+
+    if not items:
+        raise viuact.errors.Unexpected_token(
+            g.opening.tok(),
+            str(g.opening),
+        ).note('expected an expression')
+
+    lead = items[0]
+    if type(lead) is Group:
+        return one_pass_fn_call(items)
+    if not isinstance(lead, viuact.lexemes.Lexeme):
+        raise viuact.errors.Unexpected_token(
+            one_pass_token(lead, g),
+            str(one_pass_token(lead, g)),
+        ).note('expected function name, or a call-kind marker')
+
+    t = lead.t()
+    if t is viuact.lexemes.Let and len(items) == 3:
+        name = items[1]
+        if type(name) is not viuact.lexemes.Name:
+            raise viuact.errors.Unexpected_token(
+                one_pass_token(name, g),
+                str(one_pass_token(name, g)),
+            ).note('expected name')
+        return viuact.forms.Let_binding(
+            name = name,
+            value = one_pass_expr(items[2]),
+        )
+    if t is viuact.lexemes.Let and len(items) == 4:
+        return one_pass_fn(g)
+    if t is viuact.lexemes.Labelled_name:
+        one_pass_require(g, 2)
+        return viuact.forms.Argument_bind(
+            name = lead,
+            value = one_pass_expr(items[1]),
+        )
+    if t is viuact.lexemes.If:
+        one_pass_require(g, 4)
+        return viuact.forms.If(
+            guard = one_pass_expr(items[1]),
+            if_true = one_pass_expr(items[2]),
+            if_false = one_pass_expr(items[3]),
+        )
+    if t is viuact.lexemes.Match:
+        one_pass_require(g, 3)
+        return viuact.forms.Match(
+            guard = one_pass_expr(items[1]),
+            arms = one_pass_arms(items[2], g),
+        )
+    if t is viuact.lexemes.Name:
+        return one_pass_fn_call(items)
+    if t is viuact.lexemes.Throw:
+        one_pass_require(g, 2)
+        return viuact.forms.Throw(
+            tag = items[1],
+            value = (one_pass_expr(items[2]) if len(items) > 2 else None),
+        )
+    if t is viuact.lexemes.Try:
+        one_pass_require(g, 3)
+        return viuact.forms.Try(
+            guard = one_pass_expr(items[1]),
+            arms = one_pass_arms(items[2], g),
+        )
+    if t is viuact.lexemes.Record_ctor_field:
+        one_pass_require(g, 2)
+        return viuact.forms.Record_ctor_field(
+            name = lead,
+            value = one_pass_expr(items[1]),
+        )
+    if t is viuact.lexemes.Operator_dot:
+        one_pass_require(g, 3)
+        return viuact.forms.Record_field_access(
+            base = one_pass_expr(items[1]),
+            field = items[2],
+        )
+    if t in OPERATORS:
+        return viuact.forms.Operator_call(
+            operator = lead,
+            arguments = [one_pass_expr(each) for each in items[1:]],
+        )
+    if t is viuact.lexemes.Operator_ampersand:
+        if len(items) != 2:
+            raise viuact.errors.Invalid_arity(
+                pos = lead.tok(),
+                s = '&',
+                kind = viuact.errors.Invalid_arity.OPERATOR,
+            ).note('only one argument can be supplied to operator &')
+        return viuact.forms.Inhibit_dereference(
+            operator = lead,
+            expression = one_pass_expr(items[1]),
+        )
+    raise viuact.errors.Unexpected_token(
+        lead.tok(),
+        str(lead),
+    ).note('expected function name, or a call-kind marker')
+
+def one_pass_group(g):
+    items = [
+        (Element(each) if isinstance(each, viuact.lexemes.Lexeme) else each)
+        for each in g.items
+    ]
+    if g.curly():
+        tag = viuact.lexemes.Curly_tag(token = g.opening.tok())
+        return Group([Element(tag)] + items, tag)
+    return Group(items, viuact.lexemes.Paren_tag(token = g.opening.tok()))
+
+def one_pass_reduce(g):
+    if g.role is Open_group.DECLARATION:
+        group = one_pass_group(g)
+        return (parse_top_level(group) if g.top_level else group)
+
+    if g.top_level:
+        lead = (g.items[0] if g.items else None)
+        if (lead is not None and not g.curly()
+                and isinstance(lead, viuact.lexemes.Lexeme)
+                and lead.t() is viuact.lexemes.Let and len(g.items) == 4):
+            return one_pass_fn(g)
+        tok = (one_pass_token(lead, g)
+            if (lead is not None and not g.curly()) else g.opening.tok())
+        raise viuact.errors.Unexpected_token(
+            tok,
+            str(tok),
+        ).note('token does not create a valid top-level construct')
+
+    if g.role in (Open_group.MATCH_ARM, Open_group.CATCH_ARM,):
+        return one_pass_arm(g)
+    if g.role in (
+            Open_group.UNDECIDED, Open_group.MATCH_ARMS, Open_group.CATCH_ARMS,):
+        return g
+    return one_pass_reduce_expr(g)
+
+def one_pass_closing(g, each):
+    if each.t() is not g.closing():
+        raise viuact.errors.Unbalanced_braces(
+            each.tok(),
+            each,
+        ).note('expected {}'.format(repr('}' if g.curly() else ')')))
+
+def one_pass_skip(stack, each):
+    # Only follow the braces, after an error was found. Return the group that
+    # was closed by the token, if any.
+    t = each.t()
+    if t in (viuact.lexemes.Left_paren, viuact.lexemes.Left_curly,):
+        stack.append(Open_group(each, Open_group.EXPR, top_level = not stack))
+        return None
+    if not stack:
+        raise viuact.errors.Invalid_sentinel(each.tok(), str(each))
+    if t in (viuact.lexemes.Right_paren, viuact.lexemes.Right_curly,):
+        one_pass_closing(stack[-1], each)
+        return stack.pop()
+    return None
+
+def iter_parse(tokens):
+    stack = []
+
+    # Last few tokens seen, after recategorisation. See recategorise().
+    recent = []
+
+    # Infix operator (:: or .) and its left operand, waiting for the right
+    # operand. See wrap_infix().
+    infix = None
+
+    # A dot directly after a left paren. If it is followed by a name then the
+    # two make a record constructor field, eg. (.x 42).
+    dot = None
+
+    # Groups are reduced as soon as they are closed, but errors in the
+    # structure of the input (ie, unbalanced braces) must take precedence over
+    # errors found by reducing groups, as they do in the legacy parser. The
+    # first such error is kept and reported at the end of input; until then
+    # the parser only follows the braces.
+    error = None
+
+    # Last closing brace of the current top-level group. An unclosed group is
+    # reported there, as in group().
+    closed = None
+
+    for each in tokens:
+        t = each.t()
+        if t is viuact.lexemes.Comment:
+            continue
+
+        if error is not None:
+            if not stack:
+                closed = None
+            if one_pass_skip(stack, each) is not None:
+                closed = each
+            continue
+
+        # Whether the token was already accounted for in the stack of groups.
+        consumed = False
+        try:
+            if t is viuact.lexemes.Mod_name and recent:
+                if recent[-1].t() is viuact.lexemes.Path_resolution:
+                    if len(recent) > 1 and recent[-2].t() is viuact.lexemes.Name:
+                        each = viuact.lexemes.Enum_ctor_name(each.tok())
+                elif recent[-1].t() is viuact.lexemes.Exception_def:
+                    each = viuact.lexemes.Exception_name(each.tok())
+
+            if dot is not None:
+                if t is not viuact.lexemes.Name:
+                    raise viuact.errors.Unexpected_token(
+                        each.tok(),
+                        str(each),
+                    ).note('expected a record field name')
+                recent.pop()
+                each = viuact.lexemes.Record_ctor_field(each.tok())
+                dot = None
+            elif (t is viuact.lexemes.Operator_dot and recent
+                    and recent[-1].t() is viuact.lexemes.Left_paren):
+                dot = each
+                recent.append(each)
+                continue
+
+            recent.append(each)
+            del recent[:-2]
+
+            t = each.t()
+            if infix is not None:
+                op, left = infix
+                infix = None
+                if t in (
+                    viuact.lexemes.Left_paren, viuact.lexemes.Left_curly,
+                    viuact.lexemes.Right_paren, viuact.lexemes.Right_curly,
+                    viuact.lexemes.Path_resolution, viuact.lexemes.Operator_dot,):
+                    raise viuact.errors.Unexpected_token(
+                        each.tok(),
+                        str(each),
+                    ).note('expected right operand of {}'.format(repr(str(op))))
+                base = (left.tag().tok() if type(left) is Group else left.tok())
+                stack[-1].items.append(Group([
+                    Element(op),
+                    (left if type(left) is Group else Element(left)),
+                    Element(each),
+                ], viuact.lexemes.Paren_tag(token = viuact.lexemes.Derived_token(
+                    base = base,
+                    text = '(',
+                ))))
+                continue
+
+            if t in (viuact.lexemes.Left_paren, viuact.lexemes.Left_curly,):
+                if stack:
+                    stack.append(Open_group(each, one_pass_child_role(stack[-1])))
+                else:
+                    stack.append(Open_group(each, Open_group.EXPR, top_level = True))
+                    closed = None
+                consumed = True
+                continue
+
+            if not stack:
+                raise viuact.errors.Invalid_sentinel(each.tok(), str(each))
+            g = stack[-1]
+
+            if t in (viuact.lexemes.Right_paren, viuact.lexemes.Right_curly,):
+                one_pass_closing(g, each)
+                stack.pop()
+                closed = each
+                consumed = True
+                form = one_pass_reduce(g)
+                if g.top_level:
+                    yield form
+                else:
+                    stack[-1].items.append(form)
+                continue
+
+            if t in (viuact.lexemes.Path_resolution, viuact.lexemes.Operator_dot,):
+                left = (g.items[-1] if g.items else None)
+                if not (isinstance(left, viuact.lexemes.Lexeme)
+                        or type(left) is Group):
+                    raise viuact.errors.Unexpected_token(
+                        each.tok(),
+                        str(each),
+                    ).note('expected left operand of {}'.format(repr(str(each))))
+                infix = (each, g.items.pop())
+                continue
+
+            if g.role in (Open_group.MATCH_ARMS, Open_group.CATCH_ARMS,):
+                raise viuact.errors.Unexpected_token(
+                    each.tok(),
+                    str(each),
+                ).note('expected a {} arm'.format(
+                    'match' if g.role is Open_group.MATCH_ARMS else 'catch'))
+
+            g.items.append(each)
+            if (len(g.items) == 1 and g.role is Open_group.EXPR and not g.curly()
+                    and t in DECLARATIONS):
+                g.role = Open_group.DECLARATION
+        except viuact.errors.Error as e:
+            error = e
+
+        if error is not None and not consumed:
+            if not stack:
+                closed = None
+            if one_pass_skip(stack, each) is not None:
+                closed = each
+
+    if stack:
+        at = (closed if closed is not None else stack[-1].opening)
+        raise viuact.errors.Unbalanced_braces(
+            at.tok(),
+            at,
+        ).note('expected {}'.format(repr('}' if stack[-1].curly() else ')')))
+    if error is not None:
+        raise error
+
+def parse_one_pass(tokens):
+    return list(iter_parse(tokens))
+
+
+# Parallel parser.
+#
+# Generated source files may contain tens of thousands of top-level forms. Each
+# of them can be parsed independently of the others so the token stream is cut
+# on the boundaries of top-level groups and the pieces are parsed by a pool of
+# worker processes.
+#
+# Workers get their own copy of the token table when they are started. Forms
+# produced by the workers are sent back with references to the worker's table
+# replaced by a reference to the table of the parent process, so positions in
+# the stitched forms are resolved exactly as if the parse was serial.
+#
+# If a piece fails to parse it is parsed again in the parent process. Pieces
+# before it were parsed successfully so the error raised (and its position) is
+# the same as in a serial parse.
+PARALLEL_MIN_FORMS = 64
+PARALLEL_PIECES_PER_JOB = 4
+
+def split_top_level(tokens):
+    patterns = viuact.lexemes.Lexeme.patterns
+    opening = (
+        patterns.index(viuact.lexemes.Left_paren),
+        patterns.index(viuact.lexemes.Left_curly),
+    )
+    closing = (
+        patterns.index(viuact.lexemes.Right_paren),
+        patterns.index(viuact.lexemes.Right_curly),
+    )
+    comment = patterns.index(viuact.lexemes.Comment)
+
+    # Spans of tokens [first, last) making up top-level groups. If the token
+    # stream is not a sequence of balanced groups (and comments) None is
+    # returned and the stream should just be parsed serially to get the errors
+    # right.
+    spans = []
+    depth = 0
+    first = 0
+    for i, kind in enumerate(tokens.kinds()):
+        if kind in opening:
+            if depth == 0:
+                first = i
+            depth += 1
+        elif kind in closing:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                spans.append((first, i + 1,))
+        elif depth == 0 and kind != comment:
+            return None
+
+    return (spans if depth == 0 else None)
+
+parallel_worker_table = None
+
+def parallel_worker_init(table):
+    global parallel_worker_table
+    parallel_worker_table = table
+
+def parallel_token_table():
+    return parallel_worker_table
+
+# Forms are pickled with the (worker's copy of) token table replaced by a call
+# to parallel_token_table(), which the unpickler resolves to the table of the
+# parent process. The table is memoised by the pickler so this only happens
+# once per piece.
+class Table_pickler(pickle.Pickler):
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        self.dispatch_table[viuact.lexemes.Token_table] = (
+            lambda table: (parallel_token_table, ()))
+
+class Table_unpickler(pickle.Unpickler):
+    def __init__(self, stream, table):
+        super().__init__(stream)
+        self._table = table
+
+    def find_class(self, module, name):
+        if module == __name__ and name == 'parallel_token_table':
+            return (lambda: self._table)
+        return super().find_class(module, name)
+
+def parallel_worker_parse(span):
+    table = parallel_worker_table
+    try:
+        with viuact.util.memory.Paused_gc():
+            forms = parse_one_pass(table.rows(*span))
+            stream = io.BytesIO()
+            Table_pickler(stream).dump(forms)
+            return stream.getvalue()
+    except Exception:
+        # Leave reporting the error to the parent process. This includes
+        # forms nested so deeply that they cannot be pickled.
+        return None
+
+def parallel_jobs():
+    # Processors this process is allowed to run on, which may be fewer than
+    # there are in the machine.
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return (os.cpu_count() or 1)
+
+def parse_parallel(tokens, jobs = None):
+    # With a single worker the pieces would just be parsed one after another,
+    # only with the cost of starting a process and pickling forms on top.
+    jobs = (jobs or parallel_jobs())
+    if jobs < 2:
+        return parse_one_pass(tokens)
+
+    spans = (split_top_level(tokens)
+        if type(tokens) is viuact.lexemes.Token_table else None)
+    if spans is None or len(spans) < PARALLEL_MIN_FORMS:
+        return parse_one_pass(tokens)
+
+    n = min(len(spans), jobs * PARALLEL_PIECES_PER_JOB)
+    pieces = []
+    for i in range(n):
+        a = spans[(i * len(spans)) // n]
+        b = spans[((i + 1) * len(spans)) // n - 1]
+        pieces.append((a[0], b[1],))
+
+    forms = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers = jobs,
+            initializer = parallel_worker_init,
+            initargs = (tokens,)) as executor:
+        for span, data in zip(pieces, executor.map(parallel_worker_parse, pieces)):
+            if data is None:
+                forms.extend(parse_one_pass(tokens.rows(*span)))
+                continue
+            with viuact.util.memory.Paused_gc():
+                forms.extend(Table_unpickler(io.BytesIO(data), tokens).load())
+
+    return forms
+
+PARSERS = {
+    PARSER_ONE_PASS: parse_one_pass,
+    PARSER_LEGACY: parse_legacy,
+    PARSER_PARALLEL: parse_parallel,
+}
+
+def parse(tokens, engine = None):
+    if engine is None:
+        engine = viuact.env.parser_engine(PARSER_ONE_PASS)
+    if engine not in PARSERS:
+        raise viuact.env.Invalid_environment_variable(
+            'VIUACT_PARSER', engine)
+    return PARSERS[engine](tokens)
+
+
 def to_data(forms):
     data = []
 
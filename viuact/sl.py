@@ -1,6 +1,12 @@
+import array
+import struct
+import sys
+import zlib
+
 import viuact.errors
 import viuact.lexemes
 import viuact.forms
+import viuact.util.memory
 
 
 def data_of_token(tok):
@@ -69,3 +75,280 @@ def data_of_form(form, tok_tags):
     return None
     # raise viuact.errors.Fail((0, 0,), 'cannot store form: {}'.format(
     #     form.__class__.__name__))
+
+
+# Binary format of forms.
+#
+# data_of_form() above produces JSON-friendly dictionaries for some forms, and
+# is only good for inspecting the output of the parser. The functions below
+# store complete forms (with positions of all lexemes) in a compact binary
+# format, and load them back, so that later stages of the compiler can start
+# from stored forms instead of lexing and parsing source code again.
+#
+# The format is a header followed by a zlib-compressed payload. The payload is
+# an array of unsigned integers followed by UTF-8 encoded texts of all lexemes.
+# The integers are:
+#
+#       <number of texts> <length of text>...   <instruction>...
+#
+# Instructions are a program for a stack machine which rebuilds the forms, with
+# children stored before their parents:
+#
+#       LEXEME <kind> <line> <character> <text>     push a lexeme
+#       NONE                                        push None
+#       KIND <value>                                push a Fn_call.Kind
+#       LIST <n>                                    pop n values, push a list
+#       TUPLE <n>                                   pop n values, push a tuple
+#       FORM <kind>                                 pop constructor arguments of
+#                                                   a form, push the form
+#
+# Neither storing nor loading is recursive, so there is no limit on how deeply
+# the forms may be nested.
+#
+# Version must be increased if the layout changes. Changes to lexemes and forms
+# are detected by a checksum of the schema below, which is stored in the header
+# alongside the version.
+FORMS_MAGIC = b'VTFS'
+FORMS_VERSION = 1
+
+OP_LEXEME = 0
+OP_NONE = 1
+OP_KIND = 2
+OP_LIST = 3
+OP_TUPLE = 4
+OP_FORM = 5
+
+class Invalid_forms_data(Exception):
+    pass
+
+FORMS_LEXEMES = [
+    each
+    for each
+    in vars(viuact.lexemes).values()
+    if isinstance(each, type) and issubclass(each, viuact.lexemes.Lexeme)
+]
+
+# Forms are rebuilt by calling their constructors, so for each form there is a
+# function returning arguments for its constructor.
+FORMS_SCHEMA = (
+    (viuact.forms.Fn, lambda f: (f.name(), f.parameters(), f.body(),)),
+    (viuact.forms.Named_parameter, lambda f: (f.name(),)),
+    (viuact.forms.Labelled_parameter, lambda f: (f.name(),)),
+    (viuact.forms.Defaulted_parameter, lambda f: (f.name(), f.val(),)),
+    (viuact.forms.Argument_bind, lambda f: (f.name(), f.val(),)),
+    (viuact.forms.Compound_expr, lambda f: (f.body(),)),
+    (viuact.forms.Fn_call, lambda f: (f.to(), f.arguments(), f._kind,)),
+    (viuact.forms.Operator_call, lambda f: (f.operator(), f.arguments(),)),
+    (viuact.forms.Enum_ctor_path,
+        lambda f: (f.field(), f.of_enum(), f._prefix,)),
+    (viuact.forms.Enum_ctor_call, lambda f: (f.to(), f.value(),)),
+    (viuact.forms.Enum_field, lambda f: (f.name(), f.value(),)),
+    (viuact.forms.Enum,
+        lambda f: (f.name(), f.fields(), f.template_parameters(),)),
+    (viuact.forms.Match_arm, lambda f: (f.tag(), f.name(), f.expr(),)),
+    (viuact.forms.Match, lambda f: (f.guard(), f.arms(),)),
+    (viuact.forms.Primitive_literal, lambda f: (f.value(),)),
+    (viuact.forms.Name_ref, lambda f: (f.name(),)),
+    (viuact.forms.Name_path, lambda f: (f.mod(), f.name(),)),
+    (viuact.forms.Let_binding, lambda f: (f.name(), f.val(),)),
+    (viuact.forms.If,
+        lambda f: (f.guard(), f.arm_true(), f.arm_false(),)),
+    (viuact.forms.Val_fn_spec, lambda f: (
+        f.name(),
+        f.template_parameters(),
+        f.parameter_types(),
+        f.return_type(),
+    )),
+    (viuact.forms.Type_name, lambda f: (f.name(), f.parameters(),)),
+    (viuact.forms.Fn_type,
+        lambda f: (f.return_type(), f.parameter_types(),)),
+    (viuact.forms.Exception_definition, lambda f: (f.tag(), f.value(),)),
+    (viuact.forms.Throw, lambda f: (f.tag(), f.value(),)),
+    (viuact.forms.Try, lambda f: (f.guard(), f.arms(),)),
+    (viuact.forms.Catch_arm, lambda f: (f.tag(), f.name(), f.expr(),)),
+    (viuact.forms.Record_definition, lambda f: (f.tag(), f.fields(),)),
+    (viuact.forms.Record_field_definition,
+        lambda f: (f.name(), f.type(),)),
+    (viuact.forms.Record_ctor_field, lambda f: (f.name(), f.value(),)),
+    (viuact.forms.Record_ctor, lambda f: (f.name(), f.fields(),)),
+    (viuact.forms.Record_field_access, lambda f: (f.base(), f.field(),)),
+
+    # Operator of the inhibited dereference and the drop lexeme are only kept
+    # as the first token of the form.
+    (viuact.forms.Inhibit_dereference, lambda f: (
+        viuact.lexemes.Operator_ampersand(f.first_token()),
+        f.expr(),
+    )),
+    (viuact.forms.Import, lambda f: (f.module(),)),
+    (viuact.forms.Drop, lambda f: (viuact.lexemes.Drop(f.first_token()),)),
+)
+
+def forms_schema_checksum():
+    names = [each.__name__ for each in FORMS_LEXEMES]
+    for each, _ in FORMS_SCHEMA:
+        code = each.__init__.__code__
+        names.append(each.__name__)
+        names.extend(code.co_varnames[1 : code.co_argcount])
+    names.extend(each.name for each in viuact.forms.Fn_call.Kind)
+    return zlib.crc32(' '.join(names).encode('utf-8'))
+
+FORMS_HEADER = struct.Struct('<4sHIcII')
+FORMS_CHECKSUM = forms_schema_checksum()
+
+def dump_forms(forms):
+    lexeme_kinds = { each: i for i, each in enumerate(FORMS_LEXEMES) }
+    form_kinds = {
+        each: (i, arguments,)
+        for i, (each, arguments)
+        in enumerate(FORMS_SCHEMA)
+    }
+    texts = {}
+
+    program = []
+    stack = [(forms, False,)]
+    while stack:
+        value, expanded = stack.pop()
+        t = type(value)
+
+        if value is None:
+            program.append(OP_NONE)
+        elif t in lexeme_kinds:
+            tok = value.tok()
+            line, character = tok.at()
+            text = str(tok)
+            if text not in texts:
+                texts[text] = len(texts)
+            program.extend((
+                OP_LEXEME,
+                lexeme_kinds[t],
+                line,
+                character,
+                texts[text],
+            ))
+        elif t is list or t is tuple:
+            if expanded:
+                program.extend(((OP_LIST if t is list else OP_TUPLE), len(value),))
+            else:
+                stack.append((value, True,))
+                stack.extend((each, False,) for each in reversed(value))
+        elif t is viuact.forms.Fn_call.Kind:
+            program.extend((OP_KIND, value.value,))
+        elif t in form_kinds:
+            kind, arguments = form_kinds[t]
+            if expanded:
+                program.extend((OP_FORM, kind,))
+            else:
+                stack.append((value, True,))
+                stack.extend((each, False,) for each in reversed(arguments(value)))
+        else:
+            raise viuact.errors.Fail((0, 0,), 'cannot store form: {}'.format(
+                t.__name__))
+
+    encoded = [text.encode('utf-8') for text in texts]
+    ints = [len(encoded)]
+    ints.extend(map(len, encoded))
+    ints.extend(program)
+
+    typecode = 'I'
+    for each in ('B', 'H',):
+        if max(ints) < (1 << (8 * array.array(each).itemsize)):
+            typecode = each
+            break
+    ints = array.array(typecode, ints)
+    if sys.byteorder != 'little':
+        ints.byteswap()
+
+    blob = b''.join(encoded)
+    return FORMS_HEADER.pack(
+        FORMS_MAGIC,
+        FORMS_VERSION,
+        FORMS_CHECKSUM,
+        typecode.encode('ascii'),
+        len(ints),
+        len(blob),
+    ) + zlib.compress(ints.tobytes() + blob)
+
+def run_forms_program(ints, i, texts):
+    lexemes = FORMS_LEXEMES
+    forms = [
+        (each, each.__init__.__code__.co_argcount - 1,)
+        for each, _
+        in FORMS_SCHEMA
+    ]
+    Token = viuact.lexemes.Token
+    Kind = viuact.forms.Fn_call.Kind
+
+    stack = []
+    n = len(ints)
+    while i < n:
+        op = ints[i]
+        if op == OP_LEXEME:
+            stack.append(lexemes[ints[i + 1]](Token(
+                pos = (ints[i + 2], ints[i + 3],),
+                text = texts[ints[i + 4]],
+            )))
+            i += 5
+        elif op == OP_FORM:
+            each, arity = forms[ints[i + 1]]
+            arguments = stack[-arity:]
+            del stack[-arity:]
+            stack.append(each(*arguments))
+            i += 2
+        elif op == OP_LIST or op == OP_TUPLE:
+            size = ints[i + 1]
+            value = (stack[-size:] if size else [])
+            if size:
+                del stack[-size:]
+            stack.append(value if op == OP_LIST else tuple(value))
+            i += 2
+        elif op == OP_NONE:
+            stack.append(None)
+            i += 1
+        elif op == OP_KIND:
+            stack.append(Kind(ints[i + 1]))
+            i += 2
+        else:
+            raise Invalid_forms_data('bad instruction: {}'.format(op))
+    return stack
+
+def load_forms(data):
+    if len(data) < FORMS_HEADER.size:
+        raise Invalid_forms_data('truncated header')
+    magic, version, checksum, typecode, n, blob_size = FORMS_HEADER.unpack_from(
+        data)
+    if magic != FORMS_MAGIC:
+        raise Invalid_forms_data('not a forms file')
+    if version != FORMS_VERSION or checksum != FORMS_CHECKSUM:
+        raise Invalid_forms_data('unsupported version: {}.{:08x}'.format(
+            version, checksum))
+
+    try:
+        payload = zlib.decompress(data[FORMS_HEADER.size:])
+        ints = array.array(typecode.decode('ascii'))
+    except (zlib.error, ValueError) as e:
+        raise Invalid_forms_data(str(e))
+    split = n * ints.itemsize
+    if len(payload) != split + blob_size:
+        raise Invalid_forms_data('bad payload size')
+    ints.frombytes(payload[:split])
+    if sys.byteorder != 'little':
+        ints.byteswap()
+
+    try:
+        # Lengths of texts are stored in bytes, so the blob is cut before the
+        # texts are decoded.
+        blob = payload[split:]
+        texts = []
+        offset = 0
+        for i in range(1, ints[0] + 1):
+            texts.append(blob[offset : offset + ints[i]].decode('utf-8'))
+            offset += ints[i]
+
+        with viuact.util.memory.Paused_gc():
+            stack = run_forms_program(ints, ints[0] + 1, texts)
+    except (IndexError, ValueError, TypeError, AttributeError) as e:
+        raise Invalid_forms_data('corrupted data: {}'.format(e))
+
+    if len(stack) != 1 or type(stack[0]) is not list:
+        raise Invalid_forms_data('corrupted data')
+    return stack[0]
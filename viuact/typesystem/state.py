@@ -44,7 +44,16 @@ class State:
         # followed by: a normal name (for ordinary template variables, ie. those
         # created by user code), an underscore (for template variables
         # synthesised by the compiler).
+        #
+        # Template variables form a union-find structure: variables mapped to
+        # other template variables are members of the same set, and a variable
+        # that is mapped to None or a type is the representative of its set
+        # (and holds the type inferred for the whole set). Paths to
+        # representatives are compressed when they are looked up, and ranks of
+        # representatives are tracked so that sets are merged in a way that
+        # keeps the paths short.
         self._variables = {}
+        self._ranks = {}
 
         # Named slots with types. A generic store for variable-type mapping for
         # the user language. The key is a variable name; the value is either a
@@ -83,6 +92,10 @@ class State:
 
             return t
         elif type(t) is viuact.typesystem.t.Value:
+            # Types without template variables do not need registering.
+            if t.closed():
+                return t
+
             # If the type describes a value we just have to register its templates,
             # and replace the original ones with the registered variant.
             registered_templates = []
@@ -94,6 +107,9 @@ class State:
                 templates = tuple(registered_templates),
             )
         elif type(t) is viuact.typesystem.t.Fn:
+            if t.closed():
+                return t
+
             # registered_return_type = register_type(state, t.return_type())
             # registered_parameter_types = ()
             registered_templates = []
@@ -128,8 +144,31 @@ class State:
 
     def let(self, x, value):
         self._variables[x] = value
+        if type(value) is viuact.typesystem.t.Template:
+            rank = self._ranks.get(x, 0) + 1
+            if rank > self._ranks.get(value, 0):
+                self._ranks[value] = rank
         return value
 
+    def find(self, x):
+        # Find the representative of the set the template variable belongs to,
+        # and make every variable on the way point directly to it.
+        root = x
+        while type(self._variables[root]) is viuact.typesystem.t.Template:
+            root = self._variables[root]
+        while x != root:
+            parent = self._variables[x]
+            self._variables[x] = root
+            x = parent
+        return root
+
+    def merge(self, left, right):
+        # Merge sets of two free template variables by putting the
+        # representative with lower rank under the other one.
+        if self._ranks.get(left, 0) < self._ranks.get(right, 0):
+            left, right = right, left
+        return self.let(right, left)
+
     def store(self, key, t):
         t = Alt(
             I(viuact.typesystem.t.Base),
@@ -146,10 +185,11 @@ class State:
 
     def stringify_type(self, t, human_readable = False):
         if type(t) is viuact.typesystem.t.Template:
-            if self.is_unknown(t):
-                return t.name(human_readable)
+            root = self.find(t)
+            if self.is_unknown(root):
+                return root.name(human_readable)
             else:
-                return self.stringify_type(self.variable(t), human_readable)
+                return self.stringify_type(self.variable(root), human_readable)
         elif isinstance(t, viuact.typesystem.t.Value):
             ts = [self.stringify_type(each, human_readable) for each in t.templates()]
             if ts:
@@ -210,19 +250,42 @@ def unify_impl(state, left, right):
             state.let(left, t)
             state.let(right, t)
             return t
+        # A variable may already be the representative of the other one's set.
+        # Binding it would create a cycle.
         if (not left_none) and right_none:
+            if state.find(left) == right:
+                return right
             return state.let(right, state.variable(left))
         if left_none and (not right_none):
+            if state.find(right) == left:
+                return left
             return state.let(left, state.variable(right))
         if (not left_none) and (not right_none):
-            l = state.variable(left)
-            r = state.variable(right)
+            # Both variables are bound, so unify whatever is bound to
+            # representatives of their sets.
+            left_root = state.find(left)
+            right_root = state.find(right)
+            l = state.variable(left_root)
+            r = state.variable(right_root)
+            if left_root == right_root:
+                return (left_root if l is None else l)
+            if l is None and r is None:
+                return state.merge(left_root, right_root)
+            if l is None:
+                state.let(left_root, right_root)
+                return r
+            if r is None:
+                state.let(right_root, left_root)
+                return l
             return unify_impl(state, l, r)
 
     if type(left) is viuact.typesystem.t.Template and type(right) is not viuact.typesystem.t.Template:
         if state.is_unknown(left):
             return state.let(left, right)
-        return unify_impl(state, state.variable(left), right)
+        root = state.find(left)
+        if state.is_unknown(root):
+            return state.let(root, right)
+        return unify_impl(state, state.variable(root), right)
 
     if type(left) is not viuact.typesystem.t.Template and type(right) is not viuact.typesystem.t.Template:
         # All types can be unified with void, but being unified with a void
@@ -4,7 +4,37 @@ import viuact.util.log
 
 from viuact.util.type_annotations import I
 
-class Template:
+
+# Types are interned (hash-consed): constructing a type structurally equal to
+# one that was already constructed returns the existing object instead of a new
+# one. Types are immutable so they can be shared freely, and their string forms
+# (used for comparisons, hashing, and error messages) are computed only once.
+# Comparing two types is then usually an identity check.
+#
+# Each interned class provides an intern_key() static method accepting the same
+# parameters as its constructor. The key is made of the constructor arguments,
+# and since component types are interned too comparing keys is cheap.
+#
+# The table lives as long as a compilation of one unit (see viuact.driver), so
+# that a process compiling many modules one after another does not keep types
+# of all of them. Types which outlive the table stay valid: they are equal to
+# the types constructed later, just not identical.
+interned_types = {}
+
+def forget_interned_types():
+    interned_types.clear()
+
+class Interned(type):
+    def __call__(cls, *args, **kwargs):
+        key = (cls, cls.intern_key(*args, **kwargs),)
+        t = interned_types.get(key)
+        if t is None:
+            t = super().__call__(*args, **kwargs)
+            interned_types[key] = t
+        return t
+
+
+class Template(metaclass = Interned):
     def __init__(self, name):
         if type(name) is not str:
             raise TypeError('cannot use {} as name of template variable'.format(
@@ -16,6 +46,14 @@ class Template:
             raise ValueError(
                 'name of template variable cannot start with the \' character')
         self._name = name
+        self._string = "'{}".format(name)
+
+    @staticmethod
+    def intern_key(name):
+        return name
+
+    def __reduce__(self):
+        return (type(self), (self._name,),)
 
     def __repr__(self):
         return '(template: [{}])'.format(self.to_string())
@@ -27,16 +65,16 @@ class Template:
             raise TypeError('cannot compare <template> with {}'.format(
                 type(other),
             ))
-        return (other.name() == self.name())
+        return (other is self) or (other.name() == self.name())
 
     def __hash__(self):
-        return hash(self.name())
+        return hash(self._string)
 
     def to_string(self):
         return self.name()
 
     def name(self, human_readable = False):
-        s = "'{}".format(self._name)
+        s = self._string
         if human_readable:
             s = s.split('~', maxsplit = 1)[0]
         return s
@@ -44,6 +82,9 @@ class Template:
     def polymorphic(self):
         return True
 
+    def closed(self):
+        return False
+
     def concretise(self, blueprint):
         return blueprint[self]
 
@@ -58,7 +99,7 @@ class Template:
 #     vectors, enums, etc.
 #   - a "function type" which is used to describe functions
 #
-class Base:
+class Base(metaclass = Interned):
     def __init__(self, templates = ()):
         def is_valid_template_variable(t):
             if type(t) in (Template, Value, Fn,):
@@ -71,12 +112,24 @@ class Base:
                 map(lambda _: str(type(_)), templates)))))
             raise TypeError('invalid template variable list: {}'.format(
                 templates,))
-        self._templates = templates
+        self._templates = tuple(templates)
+        self._string = None
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (self.to_string() == other.to_string())
 
+    def __hash__(self):
+        return hash(self.to_string())
+
     def to_string(self):
+        # Types are immutable so their string forms may be cached.
+        if self._string is None:
+            self._string = self.make_string()
+        return self._string
+
+    def make_string(self):
         raise TypeError('{} type cannot be stringified'.format(type(self)))
 
     def templates(self):
@@ -85,6 +138,12 @@ class Base:
     def polymorphic(self):
         return any(map(lambda _: _.polymorphic(), self.templates()))
 
+    # A type is closed if it does not mention any template variables. Closed
+    # types are not changed by concretisation so there is no need to rebuild
+    # them.
+    def closed(self):
+        return self._closed
+
     def cast_from(self, t):
         return False
 
@@ -92,11 +151,19 @@ class Base:
 class Void(Base):
     def __init__(self, templates = ()):
         super().__init__(templates)
+        self._closed = all(map(lambda _: _.closed(), templates))
+
+    @staticmethod
+    def intern_key(templates = ()):
+        return tuple(templates)
+
+    def __reduce__(self):
+        return (type(self), (self.templates(),),)
 
     def __repr__(self):
         return self.to_string()
 
-    def to_string(self):
+    def make_string(self):
         if self.templates():
             return '(({}) void)'.format(
                 ' '.join(list(map(lambda _: _.to_string(), self.templates()))),
@@ -115,6 +182,8 @@ class Void(Base):
         return True
 
     def concretise(self, blueprint):
+        if self.closed():
+            return self
         return Void(
             templates = tuple(map(
                 lambda _: _.concretise(blueprint),
@@ -139,11 +208,19 @@ class Value(Base):
             raise ValueError(
                 'name of type cannot start with the \' character')
         self._name = name
+        self._closed = all(map(lambda _: _.closed(), templates))
+
+    @staticmethod
+    def intern_key(name, templates = ()):
+        return (name, tuple(templates),)
+
+    def __reduce__(self):
+        return (type(self), (self.name(), self.templates(),),)
 
     def __repr__(self):
         return '(value: [{}])'.format(self.to_string())
 
-    def to_string(self):
+    def make_string(self):
         if self.templates():
             return '(({}) {})'.format(
                 ' '.join(list(map(lambda _: _.to_string(), self.templates()))),
@@ -159,6 +236,8 @@ class Value(Base):
         return (super().polymorphic() or self._name.startswith("'"))
 
     def concretise(self, blueprint):
+        if self.closed():
+            return self
         return Value(
             name = self.name(),
             templates = tuple(map(
@@ -172,11 +251,19 @@ class Pointer(Base):
     def __init__(self, to):
         super().__init__(())
         self._to = to
+        self._closed = to.closed()
+
+    @staticmethod
+    def intern_key(to):
+        return to
+
+    def __reduce__(self):
+        return (type(self), (self.to(),),)
 
     def __repr__(self):
         return '(pointer: [{}])'.format(self._to.to_string())
 
-    def to_string(self):
+    def make_string(self):
         return '*{}'.format(self._to.to_string())
 
     def name(self):
@@ -189,12 +276,20 @@ class Pointer(Base):
 # Function types are used to describe functions. They do not have a name and are
 # described by the types of their formal parameters and return type.
 class Fn(Base):
-    class Parameter:
-        pass
+    class Parameter(metaclass = Interned):
+        def closed(self):
+            return self.t().closed()
     class Positional_parameter(Parameter):
         def __init__(self, t):
             self._t = t
 
+        @staticmethod
+        def intern_key(t):
+            return t
+
+        def __reduce__(self):
+            return (type(self), (self.t(),),)
+
         def name(self):
             return None
 
@@ -205,12 +300,21 @@ class Fn(Base):
             return self.t().to_string()
 
         def concretise(self, blueprint):
+            if self.closed():
+                return self
             return Fn.Positional_parameter(self.t().concretise(blueprint))
     class Labelled_parameter(Parameter):
         def __init__(self, name, t):
             self._name = name
             self._t = t
 
+        @staticmethod
+        def intern_key(name, t):
+            return (name, t,)
+
+        def __reduce__(self):
+            return (type(self), (self.name(), self.t(),),)
+
         def name(self):
             return self._name
 
@@ -221,15 +325,36 @@ class Fn(Base):
             return '({} {})'.format(self.name(), self.t().to_string())
 
         def concretise(self, blueprint):
+            if self.closed():
+                return self
             return Fn.Labelled_parameter(self.name(), self.t().concretise(blueprint))
 
     def __init__(self, rt, pt = (), templates = ()):
         super().__init__(templates)
         all(map(lambda each: I(Fn.Parameter) | each, pt))
         self._return_type = rt
-        self._parameter_types = pt
+        self._parameter_types = tuple(pt)
+
+        # Functions with template parameters are not closed even if they do not
+        # use them, because concretisation removes them from the template list.
+        self._closed = (
+            (not templates)
+            and rt.closed()
+            and all(map(lambda _: _.closed(), pt))
+        )
 
-    def to_string(self):
+    @staticmethod
+    def intern_key(rt, pt = (), templates = ()):
+        return (rt, tuple(pt), tuple(templates),)
+
+    def __reduce__(self):
+        return (type(self), (
+            self.return_type(),
+            self.parameter_types(),
+            self.templates(),
+        ),)
+
+    def make_string(self):
         map_to_string = lambda seq: map(lambda _: _.to_string(), seq)
         if self.templates():
             return '(({}) ({}) -> {})'.format(
@@ -250,6 +375,10 @@ class Fn(Base):
         return self._parameter_types
 
     def concretise(self, blueprint):
+        # Monomorphic signatures (the vast majority of them) come out of
+        # concretisation unchanged.
+        if self.closed():
+            return self
         rt = self.return_type().concretise(blueprint)
         pt = tuple(map(
             lambda _: _.concretise(blueprint),
@@ -12,8 +12,90 @@ def means_enabled(value):
     return False
 
 
+# Diagnostic output (debug messages and traces) is leveled. The level is read
+# from VIUACT_DEBUG once, at startup, so that a disabled diagnostic costs only
+# a comparison:
+#
+#   - unset or false: no diagnostic output
+#   - true, on, or 1: debug messages
+#   - trace: debug messages, and detailed traces of what the compiler is doing
+#     (eg, candidates considered for every function call)
+#
+# Diagnostic messages are only formatted if they are going to be written. They
+# may be given as %-style format strings with arguments, or as callables
+# producing the message, so that expensive stringification (eg, of types) is
+# deferred too:
+#
+#   viuact.util.log.debug('cc.fn: blueprint = %s', blueprint)
+#   viuact.util.log.debug(lambda: 'fn.call: t = {}'.format(t.to_string()))
+#
+LEVEL_OFF = 0
+LEVEL_DEBUG = 1
+LEVEL_TRACE = 2
+
+def level_from_env():
+    value = os.environ.get('VIUACT_DEBUG')
+    if value == 'trace':
+        return LEVEL_TRACE
+    if means_enabled(value):
+        return LEVEL_DEBUG
+    return LEVEL_OFF
+
+log_level = level_from_env()
+
+def enabled(level):
+    return (log_level >= level)
+
+def render(s, args):
+    if callable(s):
+        s = s()
+    if args:
+        s = s % args
+    return s
+
+
+# Messages are written to standard error, unless they are being recorded. A
+# record is a list of messages (as written, ie. formatted and coloured) that can
+# be kept, eg. in the cache together with the function whose compilation
+# produced the messages, and replayed later:
+#
+#   records = []
+#   with viuact.util.log.Recorded(records):
+#       ...
+#   viuact.util.log.replay(records)
+#
+# Recording may be nested. Messages replayed while recording are recorded
+# again by the enclosing recording.
+current_records = None
+
+class Recorded:
+    def __init__(self, records):
+        self._records = records
+        self._enclosing = None
+
+    def __enter__(self):
+        global current_records
+        self._enclosing = current_records
+        current_records = self._records
+        return self._records
+
+    def __exit__(self, *args):
+        global current_records
+        current_records = self._enclosing
+
+def write(s):
+    if current_records is None:
+        sys.stderr.write(s)
+    else:
+        current_records.append(s)
+
+def replay(records):
+    for each in records:
+        write(each)
+
+
 def raw(*args):
-    sys.stderr.write('{}\n'.format(' '.join(map(str, args))))
+    write('{}\n'.format(' '.join(map(str, args))))
 
 def make_prefix(kind, path, pos):
     if path is not None and type(path) is not str:
@@ -26,6 +108,7 @@ def make_prefix(kind, path, pos):
     kinds = {
         'error': 'red',
         'debug': 'green',
+        'trace': 'blue',
         'warning': 'orange_red_1',
         'note': 'cyan',
         'fixme': 'yellow',
@@ -50,40 +133,48 @@ def make_prefix(kind, path, pos):
     return prefix
 
 def error(s, path = None, pos = None):
-    sys.stderr.write('{}: {}\n'.format(
+    write('{}: {}\n'.format(
         make_prefix('error', path, pos),
         s,
     ))
 
-def debug(s, path = None, pos = None):
-    if not means_enabled(os.environ.get('VIUACT_DEBUG')):
+def debug(s, *args, path = None, pos = None):
+    if log_level < LEVEL_DEBUG:
         return
-    sys.stderr.write('{}: {}\n'.format(
+    write('{}: {}\n'.format(
         make_prefix('debug', path, pos),
-        s,
+        render(s, args),
+    ))
+
+def trace(s, *args, path = None, pos = None):
+    if log_level < LEVEL_TRACE:
+        return
+    write('{}: {}\n'.format(
+        make_prefix('trace', path, pos),
+        render(s, args),
     ))
 
 def note(s, path = None, pos = None):
-    sys.stderr.write('{}: {}\n'.format(
+    write('{}: {}\n'.format(
         make_prefix('note', path, pos),
         s,
     ))
 
 def fixme(s, path = None, pos = None):
-    sys.stderr.write('{}: {}\n'.format(
+    write('{}: {}\n'.format(
         make_prefix('fixme', path, pos),
         s,
     ))
 
 def warning(s, path = None, pos = None):
-    sys.stderr.write('{}: {}\n'.format(
+    write('{}: {}\n'.format(
         make_prefix('warning', path, pos),
         s,
     ))
 
 def print(s, path = None, pos = None):
     p = make_prefix(None, path, pos)
-    sys.stderr.write('{}\n'.format(
+    write('{}\n'.format(
         '{}: {}'.format(p, s)
         if p else
         '{}'.format(s)
@@ -0,0 +1,16 @@
+import gc
+
+
+# Building big structures (eg, unpickling or loading forms) creates lots of
+# objects, none of which are garbage. This makes the cyclic garbage collector
+# run over and over again for nothing, so it is paused for the duration.
+class Paused_gc:
+    def __enter__(self):
+        self._enabled = gc.isenabled()
+        gc.disable()
+        return self
+
+    def __exit__(self, *args):
+        if self._enabled:
+            gc.enable()
+        return False
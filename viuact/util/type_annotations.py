@@ -1,3 +1,23 @@
+import os
+
+
+# Type annotations are runtime predicates used to check types of values passed
+# to constructors and functions, eg.:
+#
+#       self.slot = T(Slot) | slot
+#
+# They catch mistakes in the compiler (not in the compiled code) so they can be
+# turned off once the compiler is trusted, which makes compilation faster. They
+# are off when Python runs with optimisations enabled (python -O) or when
+# VIUACT_CHECKS environment variable is set to "off". Unchecked predicates pass
+# values through without looking at them.
+#
+# The mode is selected once, when this module is imported, as the predicates
+# are imported by name into other modules.
+def checks_enabled():
+    return (__debug__ and os.environ.get('VIUACT_CHECKS', 'on') != 'off')
+
+
 class Typing_pred:
     pass
 
@@ -12,6 +32,9 @@ class T(Typing_pred):
     def __init__(self, t):
         self._type = t
 
+    def matches(self, value):
+        return (type(value) is self._type)
+
     def match(self, value):
         if type(value) is not self._type:
             raise TypeError('actual <{}> is not declared <{}>'.format(
@@ -30,6 +53,9 @@ class I(Typing_pred):
     def __init__(self, t):
         self._type = t
 
+    def matches(self, value):
+        return isinstance(value, self._type)
+
     def match(self, value):
         if not isinstance(value, self._type):
             raise TypeError('actual <{}> is not declared <{}>'.format(
@@ -48,16 +74,11 @@ class Alt(Typing_pred):
     def __init__(self, *c):
         self._conditions = c
 
-    def try_match(self, pred, value):
-        try:
-            (pred | value)
-        except TypeError:
-            return False
-        return True
+    def matches(self, value):
+        return any(map(lambda pred: pred.matches(value), self._conditions))
 
     def match(self, value):
-        if any(map(lambda pred: self.try_match(pred, value),
-            self._conditions)):
+        if self.matches(value):
             return value
         else:
             raise TypeError('actual <{}> is not declared ...'.format(
@@ -69,3 +90,25 @@ class Alt(Typing_pred):
 
     def __or__(self, value):
         return self.match(value)
+
+
+class Unchecked(Typing_pred):
+    def matches(self, value):
+        return True
+
+    def match(self, value):
+        return value
+
+    def __contains__(self, value):
+        return value
+
+    def __or__(self, value):
+        return value
+
+UNCHECKED = Unchecked()
+
+def unchecked(*conditions):
+    return UNCHECKED
+
+if not checks_enabled():
+    T = I = Alt = unchecked